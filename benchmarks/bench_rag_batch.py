@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark wsadowego dodawania dokumentów do bazy wiedzy
+
+Uruchamia lokalny serwer HTTP udający backend RAG (stałe opóźnienie
+każdego żądania, np. narzut uwierzytelnienia i zapisu), generuje małe
+notatki Markdown i dodaje je przez RAGManager.add_documents - najpierw
+po jednym dokumencie na żądanie, potem pakowane do wspólnych żądań.
+Raportuje liczbę żądań i dokumentów na sekundę.
+
+Przykład:
+    python benchmarks/bench_rag_batch.py --docs 2000 --latency-ms 20 --chunks-per-request 64
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import structlog
+
+from console_app.config import Config
+from console_app.rag_manager import RAGManager
+
+WORDS = ['paragon', 'mleko', 'sklep', 'promocja', 'rabat', 'faktura', 'gwarancja', 'zwrot', 'karta', 'cena']
+
+
+def make_note(rng: random.Random, sentences: int) -> str:
+    """Syntetyczna notatka Markdown"""
+    lines = [f"# Notatka {rng.randint(1, 99999)}", ""]
+    for _ in range(sentences):
+        lines.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 15))).capitalize() + '.')
+    return '\n'.join(lines)
+
+
+async def stub_backend(latency: float, stats: dict, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Minimalny backend RAG (HTTP/1.1 keep-alive) - /add i /add_batch"""
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            path = head.split(b' ', 2)[1].decode()
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            data = json.loads(await reader.readexactly(length)) if length else {}
+            await asyncio.sleep(latency)
+
+            stats['requests'] += 1
+            if path.endswith('/add_batch'):
+                stats['documents'] += len(data['documents'])
+                body = {'results': [
+                    {'success': True, 'source_id': d['source_id'], 'processed_chunks': len(d['chunks'])}
+                    for d in data['documents']
+                ]}
+            else:
+                stats['documents'] += 1
+                body = {'source_id': data.get('source_id'), 'processed_chunks': len(data.get('chunks', []))}
+
+            payload = json.dumps(body).encode()
+            writer.write(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                b'Content-Length: ' + str(len(payload)).encode() + b'\r\n\r\n' + payload
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(mode: str, files: list, args, backend_url: str, data_dir: str) -> dict:
+    """Dodanie wszystkich notatek w wybranym trybie"""
+    os.environ.update({
+        'BACKEND_URL': backend_url,
+        'DATA_DIR': data_dir,
+        'RESULT_STORE_ENABLED': 'false',
+        'ADAPTIVE_CONCURRENCY': 'false',
+        'PROCESSING_WORKERS': str(args.workers),
+        'RAG_CHUNKS_PER_REQUEST': str(args.chunks_per_request),
+        # Limit 0 KB - każdy dokument wysyłany osobnym żądaniem
+        'RAG_REQUEST_MAX_KB': '0' if mode == 'single' else str(args.request_max_kb),
+    })
+    rag = RAGManager(Config())
+    try:
+        started = time.perf_counter()
+        results = await rag.add_documents(files)
+        elapsed = time.perf_counter() - started
+    finally:
+        await rag.close()
+    return {'elapsed': elapsed, 'successful': sum(r['success'] for r in results)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=2000, help='liczba notatek')
+    parser.add_argument('--sentences', type=int, default=8, help='zdań w notatce')
+    parser.add_argument('--latency-ms', type=float, default=20, help='opóźnienie backendu na żądanie (ms)')
+    parser.add_argument('--workers', type=int, default=8, help='równoległe żądania')
+    parser.add_argument('--chunks-per-request', type=int, default=64, help='limit fragmentów w żądaniu')
+    parser.add_argument('--request-max-kb', type=int, default=512, help='limit rozmiaru żądania (KB)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    stats = {'requests': 0, 'documents': 0}
+    server = await asyncio.start_server(
+        lambda r, w: stub_backend(args.latency_ms / 1000, stats, r, w), '127.0.0.1', 0
+    )
+    backend_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(args.docs):
+            path = Path(tmp) / f"notatka_{i:05d}.md"
+            path.write_text(make_note(rng, args.sentences), encoding='utf-8')
+            files.append(path)
+        total_kb = sum(path.stat().st_size for path in files) / 1024
+
+        print(f"📝 {args.docs} notatek ({total_kb:.0f} KB), opóźnienie backendu {args.latency_ms:.0f} ms, "
+              f"{args.workers} równoległych żądań")
+        for mode in ('single', 'batch'):
+            stats.update(requests=0, documents=0)
+            result = await run(mode, files, args, backend_url, str(Path(tmp) / f"data_{mode}"))
+            print(
+                f"{mode:>6}: {stats['requests']:6d} żądań  {stats['requests'] / result['elapsed']:8.1f} żądań/s  "
+                f"{result['successful'] / result['elapsed']:8.1f} dok./s  ({result['elapsed']:.2f}s)"
+            )
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark przepustowości parsera paragonów
+
+Generuje syntetyczne teksty paragonów (różne sieci, liczba pozycji,
+rabaty i stawki PTU), a następnie mierzy parsowanie w jednym wątku
+oraz partiami w puli procesów (ReceiptParser.parse_many).
+
+Przykład:
+    python benchmarks/bench_receipt_parser.py --receipts 20000 --items 25 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from console_app.receipt_parser import ReceiptParser, parse_receipt_text
+from console_app.workers import process_pool_size, shutdown_process_pool
+
+SHOPS = [
+    ('BIEDRONKA "JERONIMO MARTINS POLSKA" S.A.', '779-10-11-327'),
+    ('LIDL SP. Z O.O. SP.K.', '781-18-97-358'),
+    ('ŻABKA POLSKA SP. Z O.O.', '972-09-07-014'),
+    ('KAUFLAND POLSKA MARKETY SP. Z O.O.', '526-10-04-698'),
+]
+PRODUCTS = ['Mleko 3,2% 1L', 'Chleb żytni', 'Masło extra 200g', 'Jaja L 10szt', 'Pomidory luz',
+            'Ser gouda plastry', 'Woda niegaz. 1,5L', 'Kawa mielona 500g', 'Jabłka', 'Piwo jasne 0,5L']
+VAT = {'A': 23, 'B': 8, 'C': 5}
+
+
+def make_receipt(rng: random.Random, items: int) -> str:
+    """Syntetyczny tekst paragonu"""
+    shop, nip = rng.choice(SHOPS)
+    lines = [shop, 'ul. Przykładowa 1, 00-001 Warszawa', f'NIP {nip}',
+             f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}   nr wydr. {rng.randint(1, 99999)}',
+             'PARAGON FISKALNY']
+    groups = {}
+    for _ in range(items):
+        quantity = rng.randint(1, 4)
+        price = rng.randint(99, 2999) / 100
+        group = rng.choice(list(VAT))
+        value = round(quantity * price, 2)
+        lines.append(f'{rng.choice(PRODUCTS)}   {quantity} x{price:.2f}   {value:.2f} {group}'.replace('.', ','))
+        if rng.random() < 0.1:
+            lines.append(f'Rabat   -{min(1.0, value):.2f} {group}'.replace('.', ','))
+            value -= min(1.0, value)
+        groups[group] = groups.get(group, 0) + value
+    for group, amount in sorted(groups.items()):
+        tax = amount * VAT[group] / (100 + VAT[group])
+        lines.append(f'SPRZEDAŻ OPODATKOWANA {group}   {amount:.2f}'.replace('.', ','))
+        lines.append(f'PTU {group} {VAT[group]:.2f}%   {tax:.2f}'.replace('.', ','))
+    lines.append(f'SUMA PLN   {sum(groups.values()):.2f}'.replace('.', ','))
+    lines.append('KARTA   ' + f'{sum(groups.values()):.2f}'.replace('.', ','))
+    return '\n'.join(lines)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    texts = [make_receipt(rng, args.items) for _ in range(args.receipts)]
+    total_mb = sum(len(t.encode()) for t in texts) / 1024 / 1024
+    print(f"📄 {args.receipts} paragonów po {args.items} pozycji ({total_mb:.1f} MB tekstu)")
+
+    started = time.perf_counter()
+    records = [parse_receipt_text(text) for text in texts]
+    elapsed = time.perf_counter() - started
+    complete = sum(r['complete'] for r in records)
+    print(f"1 wątek:   {args.receipts / elapsed:9.0f} paragonów/s  {total_mb / elapsed:6.1f} MB/s  "
+          f"(zgodne sumy: {complete}/{args.receipts})")
+
+    config = SimpleNamespace(RECEIPT_PARSER_BATCH_SIZE=args.batch_size, PROCESS_POOL_WORKERS=args.workers)
+    parser = ReceiptParser(config)
+    await parser.parse_many(texts[:args.batch_size * 2])  # rozgrzanie puli procesów
+
+    started = time.perf_counter()
+    batch_records = await parser.parse_many(texts)
+    elapsed = time.perf_counter() - started
+    print(f"Partiami:  {args.receipts / elapsed:9.0f} paragonów/s  {total_mb / elapsed:6.1f} MB/s  "
+          f"({process_pool_size()} procesów, partie po {args.batch_size})")
+
+    if batch_records != records:
+        print("❌ Wyniki parsowania partiami różnią się od parsowania w jednym wątku")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--receipts', type=int, default=20000, help='liczba paragonów')
+    parser.add_argument('--items', type=int, default=25, help='pozycji na paragon')
+    parser.add_argument('--batch-size', type=int, default=500, help='paragonów w partii dla puli procesów')
+    parser.add_argument('--workers', type=int, default=0, help='procesy robocze (0 = liczba rdzeni)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(run(args)))
+    finally:
+        shutdown_process_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark pamięci przy równoległym wysyłaniu dużych plików
+
+Uruchamia lokalny serwer HTTP, który odczytuje i odrzuca ciało żądania,
+a następnie wysyła pliki równolegle - strumieniowo (MultipartFileUpload)
+albo z całym plikiem wczytanym do pamięci. Raportuje szczytowy przyrost
+RSS procesu względem stanu przed wysyłaniem.
+
+Przykład:
+    python benchmarks/bench_upload_memory.py --total-mb 100 --files 10 --workers 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from console_app.streaming_upload import MultipartFileUpload
+
+
+def current_rss_mb() -> float:
+    """Bieżące RSS procesu w MB (Linux)"""
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def drain_server(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Minimalny serwer HTTP/1.1 - odczytuje ciało i odpowiada 200"""
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            while length:
+                chunk = await reader.read(min(length, 1024 * 1024))
+                if not chunk:
+                    return
+                length -= len(chunk)
+            body = b'{"text": "", "message": "ok"}'
+            writer.write(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def sample_rss(peak: dict, stop: asyncio.Event):
+    """Próbkowanie RSS co 10 ms"""
+    while not stop.is_set():
+        peak['rss'] = max(peak['rss'], current_rss_mb())
+        await asyncio.sleep(0.01)
+
+
+async def run(mode: str, files: list, workers: int, url: str) -> dict:
+    """Wysłanie wszystkich plików w wybranym trybie"""
+    semaphore = asyncio.Semaphore(workers)
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=workers)) as client:
+        async def upload(path: Path):
+            async with semaphore:
+                if mode == 'stream':
+                    body = MultipartFileUpload(path, 'application/pdf', data={'auto_enhance': 'true'})
+                    response = await client.post(url, content=body, headers=body.headers)
+                else:
+                    files_field = {'file': (path.name, path.read_bytes(), 'application/pdf')}
+                    response = await client.post(url, files=files_field, data={'auto_enhance': 'true'})
+                response.raise_for_status()
+
+        baseline = current_rss_mb()
+        peak = {'rss': baseline}
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(peak, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(path) for path in files))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+
+    return {'baseline': baseline, 'peak': peak['rss'], 'elapsed': elapsed}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--total-mb', type=int, default=100, help='Łączny rozmiar plików (MB)')
+    parser.add_argument('--files', type=int, default=10, help='Liczba plików')
+    parser.add_argument('--workers', type=int, default=8, help='Liczba równoległych wysyłek')
+    parser.add_argument('--mode', choices=['stream', 'buffered', 'both'], default='both')
+    args = parser.parse_args()
+
+    server = await asyncio.start_server(drain_server, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    url = f'http://127.0.0.1:{port}/api/v1/receipts/upload'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_size = args.total_mb * 1024 * 1024 // args.files
+        files = []
+        for i in range(args.files):
+            path = Path(tmp) / f'skan_{i}.pdf'
+            with open(path, 'wb') as f:
+                f.write(b'%PDF-1.4\n')
+                f.write(os.urandom(file_size))
+            files.append(path)
+
+        print(f"📦 {args.files} plików x {file_size / 1024 / 1024:.1f} MB, {args.workers} równoległych wysyłek")
+        modes = ['stream', 'buffered'] if args.mode == 'both' else [args.mode]
+        for mode in modes:
+            result = await run(mode, files, args.workers, url)
+            throughput = args.total_mb / result['elapsed']
+            print(
+                f"{mode:>9}: szczytowy przyrost RSS {result['peak'] - result['baseline']:7.1f} MB, "
+                f"czas {result['elapsed']:.2f}s ({throughput:.0f} MB/s)"
+            )
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
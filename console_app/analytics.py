@@ -0,0 +1,107 @@
+"""
+Lokalne analizy wydatków na podstawie agregatów magazynu wyników (pandas)
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+
+from .result_store import ResultStore
+
+logger = structlog.get_logger()
+
+
+def histogram_percentiles(buckets: List[Tuple[str, float, int]], quantiles: List[float]) -> List[float]:
+    """Percentyle sum paragonów z histogramu kubełków po 1 zł.
+
+    W obrębie kubełka przyjmowany jest równomierny rozkład - błąd nie
+    przekracza szerokości kubełka.
+    """
+    lower = np.array([int(bucket) for bucket, _, _ in buckets], dtype='float64')
+    counts = np.array([count for _, _, count in buckets], dtype='float64')
+    order = np.argsort(lower)
+    lower, counts = lower[order], counts[order]
+    cumulative = np.cumsum(counts)
+
+    targets = np.asarray(quantiles) * cumulative[-1]
+    index = np.minimum(np.searchsorted(cumulative, targets, side='left'), len(lower) - 1)
+    before = np.where(index > 0, cumulative[index - 1], 0.0)
+    fraction = np.clip((targets - before) / counts[index], 0.0, 1.0)
+    return [float(value) for value in lower[index] + fraction]
+
+
+class SpendingAnalytics:
+    """Analizy wydatków liczone z agregatów magazynu wyników.
+
+    Sumy dzienne, miesięczne, sklepów i kategorii oraz histogram kwot
+    utrzymuje `ResultStore` przy każdym zapisie, więc koszt podsumowania
+    zależy od liczby kubełków, a nie paragonów. Pochodne (trend, udziały,
+    percentyle) liczone są wektorowo, a gotowe podsumowanie jest pamiętane
+    do następnego zapisu w magazynie.
+    """
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+        self._summary: Optional[Dict[str, Any]] = None
+        self._summary_id: Optional[int] = None
+
+    @staticmethod
+    def _frame(rows: List[Tuple[str, float, int]], count: str) -> pd.DataFrame:
+        return pd.DataFrame(rows, columns=['bucket', 'total', count]).set_index('bucket')
+
+    @staticmethod
+    def _rows(frame: pd.DataFrame, key: str) -> List[Dict[str, Any]]:
+        """Wiersze agregatu jako lista słowników (NaN jako None)"""
+        frame = frame.round(2).reset_index(names=key).astype(object)
+        return frame.where(frame.notna(), None).to_dict('records')
+
+    def summary(self) -> Dict[str, Any]:
+        """Podsumowanie wydatków (przeliczane tylko po zmianie danych)"""
+        last_id = self.store.last_receipt_id()
+        if self._summary is None or self._summary_id != last_id:
+            self._summary = self._compute_summary(self.store.rollups())
+            self._summary_id = last_id
+        return self._summary
+
+    def _compute_summary(self, rollups: Dict[str, List[Tuple[str, float, int]]]) -> Dict[str, Any]:
+        if not rollups['month']:
+            return {'receipts': 0, 'total_spent': 0.0, 'months': [], 'shops': [], 'categories': [],
+                    'percentiles': {}, 'trend': {}}
+
+        months = self._frame(rollups['month'], 'receipts').sort_index()
+        months['average'] = months['total'] / months['receipts']
+        months['change_pct'] = months['total'].pct_change() * 100
+        months['rolling_3m'] = months['total'].rolling(3, min_periods=1).mean()
+
+        shops = self._frame(rollups['shop'], 'receipts').sort_values('total', ascending=False)
+        shops['average'] = shops['total'] / shops['receipts']
+        shops['share_pct'] = shops['total'] / shops['total'].sum() * 100
+
+        categories = self._frame(rollups['category'], 'items').sort_values('total', ascending=False)
+        categories['share_pct'] = categories['total'] / categories['total'].sum() * 100
+
+        receipts = int(months['receipts'].to_numpy().sum())
+        total_spent = float(months['total'].to_numpy().sum())
+        p50, p90, p99 = histogram_percentiles(rollups['amount'], [0.5, 0.9, 0.99])
+        last_month = months.iloc[-1]
+        return {
+            'receipts': receipts,
+            'total_spent': round(total_spent, 2),
+            'months': self._rows(months, 'month'),
+            'shops': self._rows(shops, 'shop'),
+            'categories': self._rows(categories, 'category'),
+            'percentiles': {
+                'p50': round(p50, 2),
+                'p90': round(p90, 2),
+                'p99': round(p99, 2),
+                'mean': round(total_spent / receipts, 2),
+            },
+            'trend': {
+                'last_month': months.index[-1],
+                'last_month_total': round(float(last_month['total']), 2),
+                'change_pct': None if pd.isna(last_month['change_pct']) else round(float(last_month['change_pct']), 1),
+                'rolling_3m': round(float(last_month['rolling_3m']), 2),
+            }
+        }
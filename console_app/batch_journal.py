@@ -0,0 +1,169 @@
+"""
+Dziennik przetwarzania wsadowego - odporny na awarie zapis wyników plików
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class BatchJournal:
+    """Dziennik wsadu zapisywany w trybie dopisywania (JSON Lines).
+
+    Pierwsza linia opisuje wsad, kolejne to wyniki pojedynczych plików,
+    a linia `complete` oznacza zakończenie. Niedokończona ostatnia linia
+    (np. po awarii w trakcie zapisu) jest pomijana przy odczycie.
+    """
+
+    FSYNC_EVERY = 50
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.header: Dict[str, Any] = {}
+        self.outcomes: Dict[str, bool] = {}
+        self.completed = False
+        self._pending_sync = 0
+        self._handle = None
+        if self.path.exists():
+            self._load()
+
+    @classmethod
+    def create(cls, journal_dir: Path, source: str, total: int) -> 'BatchJournal':
+        """Utworzenie nowego dziennika dla katalogu źródłowego"""
+        journal_dir = Path(journal_dir)
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        journal = cls(journal_dir / f"batch_{timestamp}_{cls._source_id(source)}.jsonl")
+        journal.header = {
+            'type': 'batch',
+            'source': source,
+            'total': total,
+            'created_at': datetime.now().isoformat()
+        }
+        journal._write(journal.header)
+        journal.sync()
+        return journal
+
+    @classmethod
+    def latest(cls, journal_dir: Path, source: str, unfinished_only: bool = False) -> Optional['BatchJournal']:
+        """Najnowszy dziennik dla katalogu źródłowego"""
+        journal_dir = Path(journal_dir)
+        if not journal_dir.exists():
+            return None
+
+        pattern = f"batch_*_{cls._source_id(source)}.jsonl"
+        for path in sorted(journal_dir.glob(pattern), reverse=True):
+            journal = cls(path)
+            if unfinished_only and journal.completed:
+                continue
+            return journal
+        return None
+
+    @staticmethod
+    def _source_id(source: str) -> str:
+        """Krótki identyfikator katalogu źródłowego"""
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]
+
+    def _load(self):
+        """Odczyt dziennika - ostatni wynik danego pliku wygrywa"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Pominięto uszkodzony wpis dziennika {self.path.name}")
+                    continue
+                entry_type = entry.get('type')
+                if entry_type == 'batch':
+                    self.header = entry
+                elif entry_type == 'result':
+                    self.outcomes[entry['file']] = entry.get('success', False)
+                elif entry_type == 'complete':
+                    self.completed = True
+
+    def _write(self, entry: Dict[str, Any]):
+        """Dopisanie linii do dziennika"""
+        if self._handle is None:
+            torn_tail = self._has_torn_tail()
+            self._handle = open(self.path, 'a', encoding='utf-8')
+            if torn_tail:
+                # Odcięcie niedokończonej linii, aby nie skleiła się z nowym wpisem
+                self._handle.write("\n")
+        self._handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._handle.flush()
+        self._pending_sync += 1
+        if self._pending_sync >= self.FSYNC_EVERY:
+            self.sync()
+
+    def _has_torn_tail(self) -> bool:
+        """Czy plik kończy się niedokończoną linią"""
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return False
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def record(self, result: Dict[str, Any]):
+        """Zapisanie wyniku przetworzenia pliku"""
+        entry = {
+            'type': 'result',
+            'file': result.get('file'),
+            'success': result.get('success', False),
+            'cached': result.get('cached', False),
+            'timestamp': datetime.now().isoformat()
+        }
+        if result.get('file_hash'):
+            entry['file_hash'] = result['file_hash']
+        if not entry['success']:
+            entry['error'] = result.get('error', 'Nieznany błąd')
+        self._write(entry)
+        self.outcomes[entry['file']] = entry['success']
+
+    def mark_complete(self):
+        """Oznaczenie wsadu jako zakończonego"""
+        self._write({'type': 'complete', 'timestamp': datetime.now().isoformat()})
+        self.completed = True
+        self.sync()
+
+    def sync(self):
+        """Wymuszenie zapisu dziennika na dysk"""
+        if self._handle is not None:
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        self._pending_sync = 0
+
+    def close(self):
+        """Zamknięcie dziennika"""
+        if self._handle is not None:
+            self.sync()
+            self._handle.close()
+            self._handle = None
+
+    @property
+    def successful_files(self) -> set:
+        """Pliki przetworzone pomyślnie"""
+        return {path for path, success in self.outcomes.items() if success}
+
+    @property
+    def failed_files(self) -> set:
+        """Pliki, których ostatnia próba zakończyła się błędem"""
+        return {path for path, success in self.outcomes.items() if not success}
+
+    def summary(self) -> Dict[str, Any]:
+        """Podsumowanie stanu wsadu"""
+        return {
+            'journal': self.path.name,
+            'source': self.header.get('source'),
+            'total': self.header.get('total', 0),
+            'processed': len(self.outcomes),
+            'successful': len(self.successful_files),
+            'failed': len(self.failed_files),
+            'completed': self.completed
+        }
@@ -13,6 +13,9 @@ from rich.console import Console
 from rich.markdown import Markdown
 
 from .config import Config
+from .http_utils import (
+    RETRYABLE_STATUS_CODES, create_circuit_breakers, create_retry_policy, parse_retry_after, retry_async
+)
 
 logger = structlog.get_logger()
 console = Console()
@@ -77,6 +80,8 @@ class ChatAgent:
         self.history = ConversationHistory()
         self.session: Optional[aiohttp.ClientSession] = None
         self.history_file = Path("chat_history.json")
+        self.retry_policy = create_retry_policy(config)
+        self.breakers = create_circuit_breakers(config, probe=self._probe_backend)
         
         # Załaduj historię przy starcie
         self.history.import_from_file(self.history_file)
@@ -141,9 +146,10 @@ class ChatAgent:
             raise Exception("Sesja HTTP nie została zainicjalizowana")
         
         url = f"{self.config.BACKEND_URL}/api/v2/chat/conversation"
+        session = self.session
         
-        try:
-            async with self.session.post(
+        async def post_once():
+            async with session.post(
                 url,
                 json=payload,
                 headers={
@@ -152,15 +158,32 @@ class ChatAgent:
                 },
                 timeout=aiohttp.ClientTimeout(total=30)
             ) as response:
-                
+                retry_after = response.headers.get("Retry-After")
                 if response.status == 200:
-                    return await response.json()
-                else:
-                    error_text = await response.text()
-                    return {
-                        "success": False,
-                        "error": f"HTTP {response.status}: {error_text}"
-                    }
+                    return response.status, retry_after, await response.json()
+                return response.status, retry_after, await response.text()
+        
+        try:
+            # Wiadomość nie jest idempotentna - ponawiamy tylko, gdy backend jej
+            # nie przyjął (brak połączenia, 429/503)
+            status, _, body = await retry_async(
+                post_once,
+                self.retry_policy,
+                retry_on=(aiohttp.ClientConnectorError,),
+                retry_hint=self._rejected_retry_hint,
+                description="wiadomość czatu",
+                breaker=self.breakers.get(url),
+                park=False,
+                is_failure=lambda result: result[0] >= 500
+            )
+            
+            if status == 200 and isinstance(body, dict):
+                return body
+            else:
+                return {
+                    "success": False,
+                    "error": f"HTTP {status}: {body}"
+                }
                     
         except asyncio.TimeoutError:
             return {
@@ -173,6 +196,23 @@ class ChatAgent:
                 "error": f"Błąd połączenia: {str(e)}"
             }
     
+    async def _probe_backend(self) -> bool:
+        """Sonda zdrowia dla bezpieczników"""
+        if not self.session:
+            return False
+        url = f"{self.config.BACKEND_URL}/health"
+        async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            return response.status == 200
+    
+    @staticmethod
+    def _rejected_retry_hint(result) -> Optional[float]:
+        """Ponowienie tylko dla odpowiedzi odrzuconych przed przetworzeniem"""
+        status, retry_after, _ = result
+        if status not in (429, 503):
+            return None
+        delay = parse_retry_after(retry_after)
+        return -1.0 if delay is None else delay
+    
     async def get_suggested_questions(self) -> List[str]:
         """Pobranie sugerowanych pytań na podstawie kontekstu"""
         try:
@@ -277,8 +317,20 @@ class ChatAgent:
                 self.session = aiohttp.ClientSession()
             
             url = f"{self.config.BACKEND_URL}/health"
-            async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                return response.status == 200
+            session = self.session
+            
+            async def get_once():
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                    return response.status
+            
+            status = await retry_async(
+                get_once,
+                self.retry_policy,
+                retry_on=(aiohttp.ClientError, asyncio.TimeoutError),
+                retry_hint=lambda code: -1.0 if code in RETRYABLE_STATUS_CODES else None,
+                description="health check czatu"
+            )
+            return status == 200
                 
         except Exception as e:
             logger.error(f"Błąd sprawdzania połączenia: {e}")
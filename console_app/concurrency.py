@@ -0,0 +1,177 @@
+"""
+Adaptacyjne sterowanie współbieżnością żądań do backendu
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Any, Optional, Tuple, Type
+
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+# Kody HTTP sygnalizujące przeciążenie backendu
+OVERLOAD_STATUS_CODES = {429, 503}
+
+
+class RequestSlot:
+    """Wynik pojedynczego żądania wykonanego w ramach limitu"""
+
+    def __init__(self):
+        self.overloaded = False
+        self.succeeded = False
+
+    def record_status(self, status_code: int):
+        """Zapisanie kodu odpowiedzi HTTP"""
+        self.succeeded = status_code < 400
+        if status_code in OVERLOAD_STATUS_CODES:
+            self.overloaded = True
+
+    def mark_overloaded(self):
+        """Oznaczenie żądania jako odrzuconego z powodu przeciążenia"""
+        self.overloaded = True
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limiter liczby równoległych żądań typu AIMD sterowany opóźnieniem.
+
+    Po każdym udanym żądaniu limit rośnie addytywnie (ok. +1 na "rundę"
+    żądań), o ile wygładzone opóźnienie nie przekracza `latency_tolerance`
+    razy opóźnienia bazowego (i o więcej niż `min_latency_delta`
+    sekund). Odpowiedzi 429/503, przekroczenia czasu
+    oraz wzrost opóźnienia powodują multiplikatywne zmniejszenie limitu,
+    najwyżej raz na okres równy bieżącemu opóźnieniu. Opóźnienie bazowe
+    i wygładzone liczone jest tylko z udanych odpowiedzi - szybkie błędy
+    (odmowa połączenia, 4xx) nie mówią nic o obciążeniu backendu.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        backoff_ratio: float = 0.7,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        min_latency_delta: float = 0.05,
+        overload_exceptions: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError,)
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.min_latency_delta = min_latency_delta
+        self.overload_exceptions = overload_exceptions
+
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self.smoothed_latency: Optional[float] = None
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        """Bieżący limit równoległych żądań"""
+        return int(self.limit)
+
+    async def acquire(self):
+        """Oczekiwanie na wolne miejsce w limicie"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.current_limit)
+            self.in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool, succeeded: bool = True):
+        """Zwolnienie miejsca i aktualizacja limitu na podstawie pomiaru"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._update(latency, overloaded, succeeded)
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[RequestSlot]:
+        """Wykonanie żądania w ramach limitu z pomiarem opóźnienia"""
+        await self.acquire()
+        request_slot = RequestSlot()
+        started = time.monotonic()
+        try:
+            yield request_slot
+        except self.overload_exceptions:
+            request_slot.mark_overloaded()
+            raise
+        finally:
+            await self.release(time.monotonic() - started, request_slot.overloaded, request_slot.succeeded)
+
+    def _update(self, latency: float, overloaded: bool, succeeded: bool = True):
+        """Algorytm AIMD z gradientem opóźnienia"""
+        if not overloaded:
+            if not succeeded:
+                # Nieudane żądanie bez oznak przeciążenia - pomijamy w statystykach
+                return
+            if self.baseline_latency is None or latency < self.baseline_latency:
+                self.baseline_latency = latency
+            else:
+                # Powolny dryf w górę, aby baza nadążała za zmianą warunków
+                self.baseline_latency *= 1.001
+            if self.smoothed_latency is None:
+                self.smoothed_latency = latency
+            else:
+                self.smoothed_latency += self.smoothing * (latency - self.smoothed_latency)
+
+        congested = (
+            self.baseline_latency is not None
+            and self.smoothed_latency is not None
+            and self.smoothed_latency > self.baseline_latency * self.latency_tolerance
+            # Pomijamy szum przy bardzo krótkich czasach odpowiedzi
+            and self.smoothed_latency - self.baseline_latency > self.min_latency_delta
+        )
+
+        if overloaded or congested:
+            now = time.monotonic()
+            if now - self._last_decrease >= (self.smoothed_latency or 0.0):
+                previous = self.current_limit
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+                self._last_decrease = now
+                self.decreases += 1
+                if self.current_limit != previous:
+                    logger.info(f"Zmniejszono limit współbieżności: {previous} -> {self.current_limit}")
+        elif (self.in_flight + 1) * 2 >= self.current_limit:
+            # Zwiększamy tylko, gdy limit jest wykorzystywany co najmniej w połowie
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Stan limitera do wyświetlenia"""
+        return {
+            'limit': self.current_limit,
+            'in_flight': self.in_flight,
+            'baseline_latency': round(self.baseline_latency or 0.0, 4),
+            'smoothed_latency': round(self.smoothed_latency or 0.0, 4),
+            'decreases': self.decreases
+        }
+
+
+def create_limiter(config) -> AdaptiveConcurrencyLimiter:
+    """Limiter skonfigurowany według ustawień aplikacji.
+    
+    Przy wyłączonym ADAPTIVE_CONCURRENCY limit jest stały i równy
+    PROCESSING_WORKERS.
+    """
+    overload_exceptions = (httpx.TimeoutException, asyncio.TimeoutError)
+    if not config.ADAPTIVE_CONCURRENCY:
+        return AdaptiveConcurrencyLimiter(
+            initial_limit=config.PROCESSING_WORKERS,
+            min_limit=config.PROCESSING_WORKERS,
+            max_limit=config.PROCESSING_WORKERS,
+            overload_exceptions=overload_exceptions
+        )
+    return AdaptiveConcurrencyLimiter(
+        initial_limit=config.PROCESSING_WORKERS,
+        min_limit=config.ADAPTIVE_MIN_CONCURRENCY,
+        max_limit=config.ADAPTIVE_MAX_CONCURRENCY,
+        latency_tolerance=config.ADAPTIVE_LATENCY_TOLERANCE,
+        overload_exceptions=overload_exceptions
+    )
@@ -18,19 +18,99 @@ class Config:
         # Katalogi danych
         self.PARAGONY_DIR = os.getenv('PARAGONY_DIR', '/home/marcin/Dokumenty/PROJEKT/AGENTY/PARAGONY')
         self.WIEDZA_RAG_DIR = os.getenv('WIEDZA_RAG_DIR', '/home/marcin/Dokumenty/PROJEKT/AGENTY/WIEDZA_RAG')
+        self.DATA_DIR = os.getenv('DATA_DIR', './data')
         
         # Ustawienia OCR
         self.OCR_TIMEOUT = int(os.getenv('OCR_TIMEOUT', '30'))
         self.OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'pol')
+        # backend - OCR w backendzie, local - lokalny Tesseract, auto - lokalnie, jeśli dostępny
+        self.OCR_ENGINE = os.getenv('OCR_ENGINE', 'backend').lower()
+        self.RECEIPT_COMBINED_UPLOAD = os.getenv('RECEIPT_COMBINED_UPLOAD', 'true').lower() == 'true'
+        self.RECEIPT_MAX_FILE_SIZE_MB = int(os.getenv('RECEIPT_MAX_FILE_SIZE_MB', '50'))
+        self.UPLOAD_CHUNK_SIZE_KB = int(os.getenv('UPLOAD_CHUNK_SIZE_KB', '256'))
+        
+        # Wstępne przetwarzanie zdjęć przed wysłaniem
+        self.PREPROCESS_IMAGES = os.getenv('PREPROCESS_IMAGES', 'false').lower() == 'true'
+        self.PREPROCESS_MAX_DIMENSION = int(os.getenv('PREPROCESS_MAX_DIMENSION', '2400'))
+        self.PREPROCESS_GRAYSCALE = os.getenv('PREPROCESS_GRAYSCALE', 'true').lower() == 'true'
+        self.PREPROCESS_JPEG_QUALITY = int(os.getenv('PREPROCESS_JPEG_QUALITY', '85'))
+        
+        # PDF z warstwą tekstową (e-faktury) - odczyt tekstu bez OCR
+        self.PDF_TEXT_FAST_PATH = os.getenv('PDF_TEXT_FAST_PATH', 'true').lower() == 'true'
+        self.PDF_TEXT_MIN_CHARS = int(os.getenv('PDF_TEXT_MIN_CHARS', '20'))
+        
+        # Wielostronicowe PDF - podział na strony przetwarzane równolegle
+        self.PDF_SPLIT_PAGES = os.getenv('PDF_SPLIT_PAGES', 'false').lower() == 'true'
+        self.PDF_RASTER_DPI = int(os.getenv('PDF_RASTER_DPI', '300'))
+        self.PDF_PAGE_WORKERS = int(os.getenv('PDF_PAGE_WORKERS', '4'))
+        
+        # Lokalna ocena jakości zdjęć przed wysłaniem
+        self.QUALITY_CHECK_ENABLED = os.getenv('QUALITY_CHECK_ENABLED', 'false').lower() == 'true'
+        self.QUALITY_MIN_SHARPNESS = float(os.getenv('QUALITY_MIN_SHARPNESS', '50'))
+        self.QUALITY_MIN_CONTRAST = int(os.getenv('QUALITY_MIN_CONTRAST', '40'))
+        self.QUALITY_MIN_RESOLUTION = int(os.getenv('QUALITY_MIN_RESOLUTION', '400'))
         
         # Ustawienia RAG
         self.RAG_CHUNK_SIZE = int(os.getenv('RAG_CHUNK_SIZE', '1000'))
         self.RAG_OVERLAP = int(os.getenv('RAG_OVERLAP', '200'))
         self.RAG_SIMILARITY_THRESHOLD = float(os.getenv('RAG_SIMILARITY_THRESHOLD', '0.65'))
+        # Limit jednego żądania dodawania: liczba fragmentów i rozmiar (małe
+        # dokumenty pakowane są po kilka do jednego żądania)
+        self.RAG_CHUNKS_PER_REQUEST = int(os.getenv('RAG_CHUNKS_PER_REQUEST', '32'))
+        self.RAG_REQUEST_MAX_KB = int(os.getenv('RAG_REQUEST_MAX_KB', '512'))
+        # Wysyłanie tylko nowych i zmienionych dokumentów (manifest w DATA_DIR)
+        self.RAG_INCREMENTAL_SYNC = os.getenv('RAG_INCREMENTAL_SYNC', 'true').lower() == 'true'
         
         # Ustawienia HTTP
         self.HTTP_TIMEOUT = int(os.getenv('HTTP_TIMEOUT', '30'))
         self.HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+        self.HTTP_RETRY_BASE_DELAY = float(os.getenv('HTTP_RETRY_BASE_DELAY', '0.5'))
+        self.HTTP_RETRY_MAX_DELAY = float(os.getenv('HTTP_RETRY_MAX_DELAY', '30'))
+        self.HTTP_RETRY_BUDGET_RATIO = float(os.getenv('HTTP_RETRY_BUDGET_RATIO', '0.2'))
+        
+        # Bezpieczniki (circuit breaker) endpointów backendu
+        self.CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+        self.CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '15'))
+        self.CIRCUIT_PARK_TIMEOUT = float(os.getenv('CIRCUIT_PARK_TIMEOUT', '600'))
+        
+        # Ustawienia przetwarzania wsadowego
+        self.PROCESSING_WORKERS = int(os.getenv('PROCESSING_WORKERS', '4'))
+        self.PROCESSING_QUEUE_SIZE = int(os.getenv('PROCESSING_QUEUE_SIZE', '16'))
+        self.BATCH_RESULTS_IN_MEMORY = int(os.getenv('BATCH_RESULTS_IN_MEMORY', '500'))
+        # 0 - liczba rdzeni procesora
+        self.PROCESS_POOL_WORKERS = int(os.getenv('PROCESS_POOL_WORKERS', '0'))
+        
+        # Skanowanie katalogów z paragonami i dokumentami (także podkatalogi)
+        self.SCAN_RECURSIVE = os.getenv('SCAN_RECURSIVE', 'true').lower() == 'true'
+        
+        # Tryb obserwowania katalogu paragonów (--watch)
+        self.WATCH_DEBOUNCE_SECONDS = float(os.getenv('WATCH_DEBOUNCE_SECONDS', '1.0'))
+        self.WATCH_POLL_INTERVAL = float(os.getenv('WATCH_POLL_INTERVAL', '1.0'))
+        self.WATCH_USE_INOTIFY = os.getenv('WATCH_USE_INOTIFY', 'true').lower() == 'true'
+        
+        # Adaptacyjna współbieżność żądań do backendu
+        self.ADAPTIVE_CONCURRENCY = os.getenv('ADAPTIVE_CONCURRENCY', 'true').lower() == 'true'
+        self.ADAPTIVE_MIN_CONCURRENCY = int(os.getenv('ADAPTIVE_MIN_CONCURRENCY', '1'))
+        self.ADAPTIVE_MAX_CONCURRENCY = int(os.getenv('ADAPTIVE_MAX_CONCURRENCY', '16'))
+        self.ADAPTIVE_LATENCY_TOLERANCE = float(os.getenv('ADAPTIVE_LATENCY_TOLERANCE', '2.0'))
+        
+        # Ustawienia cache wyników
+        self.RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+        self.RESULT_CACHE_MAX_SIZE_MB = int(os.getenv('RESULT_CACHE_MAX_SIZE_MB', '500'))
+        self.RESULT_CACHE_MAX_AGE_DAYS = int(os.getenv('RESULT_CACHE_MAX_AGE_DAYS', '90'))
+        
+        # Ustawienia wykrywania powtórnych zdjęć paragonów (hash percepcyjny)
+        self.DUPLICATE_DETECTION = os.getenv('DUPLICATE_DETECTION', 'false').lower() == 'true'
+        self.DUPLICATE_HASH_SIZE = int(os.getenv('DUPLICATE_HASH_SIZE', '16'))
+        self.DUPLICATE_MAX_DISTANCE = int(os.getenv('DUPLICATE_MAX_DISTANCE', '32'))
+        
+        # Ustawienia parsowania paragonów
+        self.RECEIPT_PARSING_ENABLED = os.getenv('RECEIPT_PARSING_ENABLED', 'true').lower() == 'true'
+        self.RECEIPT_PARSER_BATCH_SIZE = int(os.getenv('RECEIPT_PARSER_BATCH_SIZE', '500'))
+        
+        # Ustawienia magazynu wyników (SQLite)
+        self.RESULT_STORE_ENABLED = os.getenv('RESULT_STORE_ENABLED', 'true').lower() == 'true'
+        self.RESULT_STORE_BATCH_SIZE = int(os.getenv('RESULT_STORE_BATCH_SIZE', '100'))
         
         # Ustawienia logowania
         self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -47,14 +127,39 @@ class Config:
         """Walidacja katalogów"""
         paragony_path = Path(self.PARAGONY_DIR)
         wiedza_path = Path(self.WIEDZA_RAG_DIR)
+        data_path = Path(self.DATA_DIR)
         
         # Tworzenie katalogów jeśli nie istnieją
         paragony_path.mkdir(parents=True, exist_ok=True)
         wiedza_path.mkdir(parents=True, exist_ok=True)
+        data_path.mkdir(parents=True, exist_ok=True)
         
         # Aktualizacja ścieżek na absolutne
         self.PARAGONY_DIR = str(paragony_path.absolute())
         self.WIEDZA_RAG_DIR = str(wiedza_path.absolute())
+        self.DATA_DIR = str(data_path.absolute())
+    
+    def get_result_cache_dir(self) -> Path:
+        """Katalog cache wyników przetwarzania paragonów"""
+        return Path(self.DATA_DIR) / "result_cache"
+    
+    def get_result_store_path(self) -> Path:
+        """Plik bazy magazynu wyników"""
+        return Path(self.DATA_DIR) / "results.db"
+    
+    def get_rag_manifest_path(self) -> Path:
+        """Plik manifestu dokumentów bazy wiedzy"""
+        return Path(self.DATA_DIR) / "rag_manifest.json"
+    
+    def get_max_concurrency(self) -> int:
+        """Górna granica równoległych żądań (liczba zadań potoku)"""
+        if self.ADAPTIVE_CONCURRENCY:
+            return max(self.PROCESSING_WORKERS, self.ADAPTIVE_MAX_CONCURRENCY)
+        return self.PROCESSING_WORKERS
+    
+    def get_journal_dir(self) -> Path:
+        """Katalog dzienników przetwarzania wsadowego"""
+        return Path(self.DATA_DIR) / "journals"
     
     def get_backend_health_url(self) -> str:
         """URL do sprawdzenia stanu backendu"""
@@ -68,6 +173,10 @@ class Config:
         """URL do walidacji paragonów"""
         return f"{self.BACKEND_URL}/api/v1/receipts/validate"
     
+    def get_receipt_process_url(self) -> str:
+        """URL do uploadu z walidacją w jednym żądaniu"""
+        return f"{self.BACKEND_URL}/api/v1/receipts/process"
+    
     def get_rag_search_url(self) -> str:
         """URL do wyszukiwania RAG"""
         return f"{self.BACKEND_URL}/api/v2/rag/search"
@@ -76,6 +185,14 @@ class Config:
         """URL do dodawania dokumentów RAG"""
         return f"{self.BACKEND_URL}/api/v2/rag/add"
     
+    def get_rag_add_batch_url(self) -> str:
+        """URL do dodawania wielu dokumentów RAG w jednym żądaniu"""
+        return f"{self.BACKEND_URL}/api/v2/rag/add_batch"
+    
+    def get_rag_documents_url(self) -> str:
+        """URL do listowania i usuwania dokumentów RAG"""
+        return f"{self.BACKEND_URL}/api/v2/rag/documents"
+    
     def get_statistics_url(self) -> str:
         """URL do statystyk"""
         return f"{self.BACKEND_URL}/api/v1/analytics/statistics"
@@ -87,13 +204,62 @@ class Config:
             'ollama_url': self.OLLAMA_URL,
             'paragony_dir': self.PARAGONY_DIR,
             'wiedza_rag_dir': self.WIEDZA_RAG_DIR,
+            'data_dir': self.DATA_DIR,
             'ocr_timeout': self.OCR_TIMEOUT,
             'ocr_language': self.OCR_LANGUAGE,
+            'ocr_engine': self.OCR_ENGINE,
+            'receipt_combined_upload': self.RECEIPT_COMBINED_UPLOAD,
+            'receipt_max_file_size_mb': self.RECEIPT_MAX_FILE_SIZE_MB,
+            'upload_chunk_size_kb': self.UPLOAD_CHUNK_SIZE_KB,
+            'preprocess_images': self.PREPROCESS_IMAGES,
+            'preprocess_max_dimension': self.PREPROCESS_MAX_DIMENSION,
+            'preprocess_grayscale': self.PREPROCESS_GRAYSCALE,
+            'preprocess_jpeg_quality': self.PREPROCESS_JPEG_QUALITY,
+            'pdf_text_fast_path': self.PDF_TEXT_FAST_PATH,
+            'pdf_text_min_chars': self.PDF_TEXT_MIN_CHARS,
+            'pdf_split_pages': self.PDF_SPLIT_PAGES,
+            'pdf_raster_dpi': self.PDF_RASTER_DPI,
+            'pdf_page_workers': self.PDF_PAGE_WORKERS,
+            'quality_check_enabled': self.QUALITY_CHECK_ENABLED,
+            'quality_min_sharpness': self.QUALITY_MIN_SHARPNESS,
+            'quality_min_contrast': self.QUALITY_MIN_CONTRAST,
+            'quality_min_resolution': self.QUALITY_MIN_RESOLUTION,
             'rag_chunk_size': self.RAG_CHUNK_SIZE,
             'rag_overlap': self.RAG_OVERLAP,
             'rag_similarity_threshold': self.RAG_SIMILARITY_THRESHOLD,
+            'rag_chunks_per_request': self.RAG_CHUNKS_PER_REQUEST,
+            'rag_request_max_kb': self.RAG_REQUEST_MAX_KB,
+            'rag_incremental_sync': self.RAG_INCREMENTAL_SYNC,
             'http_timeout': self.HTTP_TIMEOUT,
             'http_retries': self.HTTP_RETRIES,
+            'http_retry_base_delay': self.HTTP_RETRY_BASE_DELAY,
+            'http_retry_max_delay': self.HTTP_RETRY_MAX_DELAY,
+            'http_retry_budget_ratio': self.HTTP_RETRY_BUDGET_RATIO,
+            'circuit_failure_threshold': self.CIRCUIT_FAILURE_THRESHOLD,
+            'circuit_reset_timeout': self.CIRCUIT_RESET_TIMEOUT,
+            'circuit_park_timeout': self.CIRCUIT_PARK_TIMEOUT,
+            'processing_workers': self.PROCESSING_WORKERS,
+            'processing_queue_size': self.PROCESSING_QUEUE_SIZE,
+            'batch_results_in_memory': self.BATCH_RESULTS_IN_MEMORY,
+            'process_pool_workers': self.PROCESS_POOL_WORKERS,
+            'scan_recursive': self.SCAN_RECURSIVE,
+            'watch_debounce_seconds': self.WATCH_DEBOUNCE_SECONDS,
+            'watch_poll_interval': self.WATCH_POLL_INTERVAL,
+            'watch_use_inotify': self.WATCH_USE_INOTIFY,
+            'adaptive_concurrency': self.ADAPTIVE_CONCURRENCY,
+            'adaptive_min_concurrency': self.ADAPTIVE_MIN_CONCURRENCY,
+            'adaptive_max_concurrency': self.ADAPTIVE_MAX_CONCURRENCY,
+            'adaptive_latency_tolerance': self.ADAPTIVE_LATENCY_TOLERANCE,
+            'result_cache_enabled': self.RESULT_CACHE_ENABLED,
+            'result_cache_max_size_mb': self.RESULT_CACHE_MAX_SIZE_MB,
+            'result_cache_max_age_days': self.RESULT_CACHE_MAX_AGE_DAYS,
+            'duplicate_detection': self.DUPLICATE_DETECTION,
+            'duplicate_hash_size': self.DUPLICATE_HASH_SIZE,
+            'duplicate_max_distance': self.DUPLICATE_MAX_DISTANCE,
+            'receipt_parsing_enabled': self.RECEIPT_PARSING_ENABLED,
+            'receipt_parser_batch_size': self.RECEIPT_PARSER_BATCH_SIZE,
+            'result_store_enabled': self.RESULT_STORE_ENABLED,
+            'result_store_batch_size': self.RESULT_STORE_BATCH_SIZE,
             'log_level': self.LOG_LEVEL,
             'ui_theme': self.UI_THEME,
             'ui_language': self.UI_LANGUAGE,
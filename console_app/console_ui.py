@@ -69,7 +69,8 @@ class ConsoleUI:
         menu_items = [
             "[1] 🔄 Przetwarzaj wszystkie pliki",
             "[2] 📁 Wybierz konkretny plik",
-            "[3] ↩️  Powrót"
+            "[3] 🔁 Ponów pliki z błędami z ostatniego wsadu",
+            "[4] ↩️  Powrót"
         ]
         
         for item in menu_items:
@@ -79,7 +80,7 @@ class ConsoleUI:
         
         return Prompt.ask(
             "[bold blue]Wybierz opcję",
-            choices=["1", "2", "3"],
+            choices=["1", "2", "3", "4"],
             default="1"
         )
     
@@ -141,15 +142,25 @@ class ConsoleUI:
             default="1"
         )
     
-    async def show_processing_results(self, results: List[Dict[str, Any]]):
-        """Wyświetlenie wyników przetwarzania"""
-        if not results:
+    async def show_processing_results(self, results: List[Dict[str, Any]],
+                                      stats: Optional[Dict[str, Any]] = None):
+        """Wyświetlenie wyników przetwarzania
+        
+        `stats` (z ProcessingStats.to_dict) nadpisuje liczniki, gdy `results`
+        zawiera tylko część wyników dużego wsadu.
+        """
+        if not results and not stats:
             return
         
         self.console.print("\n[bold blue]📊 Wyniki przetwarzania:[/bold blue]")
         
-        successful = sum(1 for r in results if r.get('success', False))
-        failed = len(results) - successful
+        if stats:
+            successful = stats.get('successful_files', 0)
+            failed = stats.get('failed_files', 0)
+        else:
+            successful = sum(1 for r in results if r.get('success', False))
+            failed = len(results) - successful
+        total = max(successful + failed, 1)
         
         # Podsumowanie
         summary_table = Table(title="Podsumowanie")
@@ -157,12 +168,27 @@ class ConsoleUI:
         summary_table.add_column("Liczba", style="bold")
         summary_table.add_column("Procent", style="bold")
         
-        summary_table.add_row("✅ Pomyślne", str(successful), f"{(successful/len(results)*100):.1f}%")
-        summary_table.add_row("❌ Błędne", str(failed), f"{(failed/len(results)*100):.1f}%")
-        summary_table.add_row("📄 Wszystkie", str(len(results)), "100%")
+        summary_table.add_row("✅ Pomyślne", str(successful), f"{(successful/total*100):.1f}%")
+        summary_table.add_row("❌ Błędne", str(failed), f"{(failed/total*100):.1f}%")
+        summary_table.add_row("📄 Wszystkie", str(successful + failed), "100%")
         
         self.console.print(summary_table)
         
+        if stats and stats.get('fast_path_files'):
+            self.console.print(
+                f"[cyan]⚡ Bez OCR (warstwa tekstowa PDF): {stats['fast_path_files']} "
+                f"({stats.get('fast_path_rate', 0) * 100:.0f}%)[/cyan]"
+            )
+        
+        if stats and stats.get('saved_bytes'):
+            saved_mb = stats['saved_bytes'] / (1024 * 1024)
+            self.console.print(f"[cyan]📉 Zmniejszenie zdjęć zaoszczędziło {saved_mb:.1f} MB wysyłanych danych[/cyan]")
+        
+        if stats and stats.get('duplicate_files'):
+            self.console.print(
+                f"[cyan]🔗 Powtórne zdjęcia paragonów (bez OCR): {stats['duplicate_files']}[/cyan]"
+            )
+        
         # Szczegóły błędów
         if failed > 0:
             self.console.print("\n[bold red]❌ Szczegóły błędów:[/bold red]")
@@ -199,12 +225,43 @@ class ConsoleUI:
         
         self.console.print(info_table)
         
+        # Dane odczytane z paragonu
+        receipt = result.get('receipt')
+        if receipt:
+            self._show_parsed_receipt(receipt)
+        
         # Tekst z OCR
         text = result.get('text', '')
         if text:
             self.console.print("\n[bold blue]📝 Wyekstrahowany tekst:[/bold blue]")
             self.console.print(Panel(text, title="OCR Text", border_style="green"))
     
+    def _show_parsed_receipt(self, receipt: Dict[str, Any]):
+        """Tabela pozycji odczytanych z paragonu"""
+        title = " · ".join(str(v) for v in (receipt.get('shop'), receipt.get('date')) if v) or "Paragon"
+        items_table = Table(title=title)
+        items_table.add_column("Pozycja")
+        items_table.add_column("Ilość", justify="right")
+        items_table.add_column("Cena", justify="right")
+        items_table.add_column("Wartość", justify="right")
+        items_table.add_column("PTU", justify="center")
+        
+        for item in receipt.get('items', []):
+            value = item['total'] + item.get('discount', 0.0)
+            items_table.add_row(
+                item['name'], f"{item['quantity']:g}", f"{item['unit_price']:.2f}",
+                f"{value:.2f}", item.get('vat_group') or "-"
+            )
+        
+        if receipt.get('total') is not None:
+            items_table.add_row("[bold]SUMA[/bold]", "", "", f"[bold]{receipt['total']:.2f}[/bold]", "")
+        self.console.print(items_table)
+        
+        if receipt.get('nip'):
+            self.console.print(f"[dim]NIP: {receipt['nip']}[/dim]")
+        if not receipt.get('complete'):
+            self.console.print("[yellow]⚠️  Suma pozycji nie zgadza się z sumą paragonu[/yellow]")
+    
     async def show_search_results(self, results: List[Dict[str, Any]]):
         """Wyświetlenie wyników wyszukiwania"""
         if not results:
@@ -257,7 +314,7 @@ class ConsoleUI:
         
         self.console.print(table)
     
-    async def show_statistics(self, stats: Dict[str, Any]):
+    async def show_statistics(self, stats: Dict[str, Any], title: str = "Statystyki"):
         """Wyświetlenie statystyk"""
         if 'error' in stats:
             self.console.print(f"[red]❌ Błąd pobierania statystyk: {stats['error']}[/red]")
@@ -265,7 +322,7 @@ class ConsoleUI:
         
         self.console.print("\n[bold blue]📊 Statystyki systemu:[/bold blue]")
         
-        stats_table = Table(title="Statystyki")
+        stats_table = Table(title=title)
         stats_table.add_column("Metryka", style="bold")
         stats_table.add_column("Wartość", style="bold")
         
@@ -276,6 +333,51 @@ class ConsoleUI:
         
         self.console.print(stats_table)
     
+    async def show_spending_summary(self, summary: Dict[str, Any]):
+        """Wyświetlenie lokalnych analiz wydatków"""
+        if not summary.get('receipts'):
+            self.console.print("[yellow]📭 Brak sparsowanych paragonów do analizy[/yellow]")
+            return
+        
+        percentiles = summary['percentiles']
+        trend = summary['trend']
+        self.console.print("\n[bold blue]📊 Analiza wydatków:[/bold blue]")
+        self.console.print(
+            f"Paragonów: {summary['receipts']}, łącznie {summary['total_spent']:.2f} zł "
+            f"(średnio {percentiles['mean']:.2f}, mediana {percentiles['p50']:.2f}, "
+            f"p90 {percentiles['p90']:.2f}, p99 {percentiles['p99']:.2f})"
+        )
+        if trend.get('change_pct') is not None:
+            arrow = "📈" if trend['change_pct'] > 0 else "📉"
+            self.console.print(
+                f"{arrow} {trend['last_month']}: {trend['last_month_total']:.2f} zł "
+                f"({trend['change_pct']:+.1f}% m/m, średnia 3 mies. {trend['rolling_3m']:.2f} zł)"
+            )
+        
+        months_table = Table(title="Miesiące")
+        for column in ("Miesiąc", "Suma", "Paragony", "Średnio", "Zmiana"):
+            months_table.add_column(column, justify="left" if column == "Miesiąc" else "right")
+        for row in summary['months'][-12:]:
+            change = f"{row['change_pct']:+.1f}%" if row['change_pct'] is not None else "-"
+            months_table.add_row(row['month'], f"{row['total']:.2f}", str(row['receipts']),
+                                 f"{row['average']:.2f}", change)
+        self.console.print(months_table)
+        
+        shops_table = Table(title="Sklepy")
+        for column in ("Sklep", "Suma", "Paragony", "Udział"):
+            shops_table.add_column(column, justify="left" if column == "Sklep" else "right")
+        for row in summary['shops'][:10]:
+            shops_table.add_row(row['shop'], f"{row['total']:.2f}", str(row['receipts']), f"{row['share_pct']:.1f}%")
+        self.console.print(shops_table)
+        
+        categories_table = Table(title="Kategorie")
+        for column in ("Kategoria", "Suma", "Pozycje", "Udział"):
+            categories_table.add_column(column, justify="left" if column == "Kategoria" else "right")
+        for row in summary['categories']:
+            categories_table.add_row(row['category'], f"{row['total']:.2f}", str(row['items']),
+                                     f"{row['share_pct']:.1f}%")
+        self.console.print(categories_table)
+    
     async def show_help(self):
         """Wyświetlenie pomocy"""
         help_text = """
@@ -0,0 +1,114 @@
+"""
+Jednoprzebiegowe skanowanie katalogów z filtrem rozszerzeń
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set, Tuple, Union
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Obsługiwane rozszerzenia plików paragonów
+RECEIPT_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.pdf'})
+
+# Obsługiwane rozszerzenia dokumentów bazy wiedzy RAG
+DOCUMENT_EXTENSIONS = frozenset({'.txt', '.md', '.pdf', '.docx', '.html'})
+
+
+class ScannedFile:
+    """Plik znaleziony podczas skanowania z zapamiętanym wynikiem stat.
+
+    Zachowuje się jak ścieżka przy `str()` i `os.fspath()`. Dla ścieżek
+    spoza skanera stat jest wykonywany leniwie przy pierwszym użyciu.
+    """
+
+    __slots__ = ('path', '_stat')
+
+    def __init__(self, path: Path, stat: Optional[os.stat_result] = None):
+        self.path = Path(path)
+        self._stat = stat
+
+    @classmethod
+    def of(cls, item: Union['ScannedFile', Path, str]) -> 'ScannedFile':
+        """Opakowanie ścieżki (lub zwrócenie gotowego wpisu)"""
+        return item if isinstance(item, cls) else cls(Path(item))
+
+    @property
+    def stat(self) -> os.stat_result:
+        """Wynik stat pliku"""
+        if self._stat is None:
+            self._stat = self.path.stat()
+        return self._stat
+
+    @property
+    def size(self) -> int:
+        """Rozmiar pliku w bajtach (0, jeśli plik zniknął)"""
+        try:
+            return self.stat.st_size
+        except OSError:
+            return 0
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def suffix(self) -> str:
+        return self.path.suffix
+
+    def __fspath__(self) -> str:
+        return str(self.path)
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+    def __repr__(self) -> str:
+        return f"ScannedFile({str(self.path)!r})"
+
+
+def scan_directory(
+    directory: Path,
+    extensions: Iterable[str],
+    recursive: bool = True
+) -> Iterator[ScannedFile]:
+    """Leniwe przejście katalogu jednym przebiegiem `os.scandir`.
+
+    Zwraca pliki o podanych rozszerzeniach (bez względu na wielkość liter)
+    od razu po znalezieniu, bez wcześniejszego listowania całego drzewa.
+    Pliki i katalogi ukryte są pomijane, dowiązania do katalogów nie są
+    odwiedzane, a ten sam plik (np. przez dowiązanie) zwracany jest raz.
+    """
+    extensions = {ext.lower() for ext in extensions}
+    seen: Set[Tuple[int, int]] = set()
+    pending = [os.fspath(directory)]
+
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                pending.append(entry.path)
+                            continue
+                        if os.path.splitext(entry.name)[1].lower() not in extensions:
+                            continue
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+
+                    key = (stat.st_dev, stat.st_ino)
+                    if stat.st_ino:
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    yield ScannedFile(Path(entry.path), stat)
+        except OSError as e:
+            logger.warning(f"Nie można odczytać katalogu {current}: {e}")
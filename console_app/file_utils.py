@@ -0,0 +1,37 @@
+"""
+Narzędzia pomocnicze do operacji na plikach
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_file_hash(file_path: Path, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Obliczenie skrótu SHA-256 zawartości pliku (czytanego porcjami)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(file_path: Path, data: Any):
+    """Atomowy zapis JSON - plik tymczasowy i zamiana nazwy"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,394 @@
+"""
+Wspólna warstwa HTTP - ponawianie żądań i bezpieczniki (circuit breaker)
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar('T')
+
+# Kody HTTP, po których ponowienie żądania idempotentnego ma sens
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Błędy transportowe httpx uznawane za przejściowe
+HTTPX_TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    httpx.RemoteProtocolError,
+)
+
+# Kody HTTP, przy których backend odrzucił żądanie przed jego przetworzeniem
+REJECTED_STATUS_CODES = {429, 503}
+
+# Błędy httpx, przy których żądanie na pewno nie dotarło do backendu -
+# tylko te można ponawiać dla żądań nieidempotentnych (np. uploadu)
+HTTPX_NOT_SENT_ERRORS: Tuple[Type[BaseException], ...] = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Odczyt nagłówka Retry-After (liczba sekund lub data HTTP)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class RetryBudget:
+    """Budżet ponowień dla wsadu.
+
+    Każde pierwsze żądanie dokłada `ratio` żetonu, każde ponowienie zużywa
+    jeden. Przy awarii backendu liczba ponowień nie przekroczy więc
+    `min_retries + ratio * liczba_żądań`, zamiast mnożyć ruch
+    przez HTTP_RETRIES.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.reset()
+
+    def reset(self):
+        """Nowy wsad - odnowienie budżetu"""
+        self._tokens = float(self.min_retries)
+        self.retries = 0
+        self.exhausted = 0
+
+    def record_request(self):
+        """Zarejestrowanie pierwszej próby żądania"""
+        self._tokens += self.ratio
+
+    def try_consume(self) -> bool:
+        """Pobranie żetonu na ponowienie"""
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+class RetryPolicy:
+    """Polityka ponowień: wykładnicze opóźnienie z limitem i pełnym jitterem"""
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        budget: Optional[RetryBudget] = None
+    ):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Opóźnienie przed ponowieniem numer `attempt` (od 0)"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+def httpx_retry_hint(response: httpx.Response) -> Optional[float]:
+    """Czy odpowiedź httpx kwalifikuje się do ponowienia.
+
+    Zwraca None dla odpowiedzi ostatecznej, w przeciwnym razie sugerowane
+    opóźnienie z Retry-After (lub -1, gdy go brak).
+    """
+    if response.status_code not in RETRYABLE_STATUS_CODES:
+        return None
+    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+    return -1.0 if retry_after is None else retry_after
+
+
+def httpx_rejected_retry_hint(response: httpx.Response) -> Optional[float]:
+    """Jak `httpx_retry_hint`, ale tylko dla odpowiedzi odrzuconych przed przetworzeniem (429/503)"""
+    if response.status_code not in REJECTED_STATUS_CODES:
+        return None
+    return httpx_retry_hint(response)
+
+
+class CircuitOpenError(Exception):
+    """Żądanie odrzucone - bezpiecznik endpointu jest otwarty"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Backend niedostępny ({name}) - ponowna próba za {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Bezpiecznik endpointu: stany zamknięty / otwarty / półotwarty.
+
+    Po `failure_threshold` kolejnych błędach (transport, 5xx) obwód się
+    otwiera i nowe żądania nie trafiają do backendu. Co `reset_timeout`
+    sekund wykonywana jest sonda zdrowia; jej sukces przełącza obwód w stan
+    półotwarty, w którym przepuszczane jest jedno żądanie próbne. Żądania
+    mogą w tym czasie czekać ("parkować") maksymalnie `park_timeout` sekund
+    od początku awarii - później są odrzucane od razu.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 15.0,
+        park_timeout: Optional[float] = 600.0,
+        half_open_max_calls: int = 1,
+        probe: Optional[Callable[[], Awaitable[bool]]] = None
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.park_timeout = park_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.probe = probe
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self._retry_at = 0.0
+        self._outage_started: Optional[float] = None
+        self._trials = 0
+        self._probing = False
+        self._changed = asyncio.Event()
+
+    def _set_state(self, state: str):
+        """Zmiana stanu i wybudzenie czekających żądań"""
+        if state == self.state:
+            return
+        logger.warning(f"Bezpiecznik {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == self.OPEN:
+            self._retry_at = time.monotonic() + self.reset_timeout
+            self.opened_count += 1
+            if self._outage_started is None:
+                self._outage_started = time.monotonic()
+        elif state == self.CLOSED:
+            self.failures = 0
+            self._outage_started = None
+        self._trials = 0
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _run_probe(self):
+        """Sonda zdrowia backendu (wykonywana przez jedno żądanie naraz)"""
+        assert self.probe is not None, "_run_probe wymaga sondy"
+        self._probing = True
+        try:
+            healthy = await self.probe()
+        except Exception as e:
+            logger.debug(f"Sonda bezpiecznika {self.name} nieudana: {e}")
+            healthy = False
+        finally:
+            self._probing = False
+
+        if self.state != self.OPEN:
+            return
+        if healthy:
+            self._set_state(self.HALF_OPEN)
+        else:
+            self._retry_at = time.monotonic() + self.reset_timeout
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def acquire(self, park: bool = True) -> bool:
+        """Zgoda na wykonanie żądania; zwraca True dla żądania próbnego"""
+        while True:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return False
+
+            if self.state == self.OPEN and now >= self._retry_at:
+                if self.probe is None:
+                    self._set_state(self.HALF_OPEN)
+                elif not self._probing:
+                    await self._run_probe()
+                    continue
+
+            if self.state == self.HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+
+            retry_in = max(0.0, self._retry_at - now)
+            parked_for = now - (self._outage_started or now)
+            if not park or (self.park_timeout is not None and parked_for >= self.park_timeout):
+                raise CircuitOpenError(self.name, retry_in)
+
+            # Przy trwającej sondzie czekamy na zmianę stanu, a nie na termin
+            wait = retry_in if self.state == self.OPEN and not self._probing else self.reset_timeout
+            if self.park_timeout is not None:
+                wait = min(wait, self.park_timeout - parked_for)
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=max(wait, 0.01))
+            except asyncio.TimeoutError:
+                pass
+
+    def record_success(self, trial: bool = False):
+        """Udane żądanie"""
+        if trial and self._trials > 0:
+            self._trials -= 1
+        if self.state == self.HALF_OPEN:
+            self._set_state(self.CLOSED)
+        else:
+            self.failures = 0
+
+    def record_failure(self, trial: bool = False):
+        """Nieudane żądanie (błąd transportu lub 5xx)"""
+        if trial and self._trials > 0:
+            self._trials -= 1
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            self._set_state(self.OPEN)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Stan bezpiecznika"""
+        return {
+            'name': self.name,
+            'state': self.state,
+            'failures': self.failures,
+            'opened_count': self.opened_count
+        }
+
+
+class CircuitBreakerRegistry:
+    """Bezpieczniki tworzone osobno dla każdego endpointu (host + ścieżka)"""
+
+    def __init__(self, probe: Optional[Callable[[], Awaitable[bool]]] = None, **breaker_options):
+        self.probe = probe
+        self.breaker_options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        """Bezpiecznik dla adresu URL"""
+        parts = urlsplit(url)
+        key = f"{parts.netloc}{parts.path}"
+        if key not in self._breakers:
+            self._breakers[key] = CircuitBreaker(key, probe=self.probe, **self.breaker_options)
+        return self._breakers[key]
+
+    def open_endpoints(self) -> list:
+        """Endpointy z otwartym lub półotwartym obwodem"""
+        return [key for key, breaker in self._breakers.items() if breaker.state != CircuitBreaker.CLOSED]
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Stan wszystkich bezpieczników"""
+        return {key: breaker.to_dict() for key, breaker in self._breakers.items()}
+
+
+def _is_server_failure(result: Any) -> bool:
+    """Domyślna klasyfikacja odpowiedzi jako awarii backendu (5xx)"""
+    return getattr(result, 'status_code', 0) >= 500
+
+
+async def retry_async(
+    operation: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    retry_on: Tuple[Type[BaseException], ...] = HTTPX_TRANSIENT_ERRORS,
+    retry_hint: Optional[Callable[[T], Optional[float]]] = None,
+    description: str = "żądanie",
+    breaker: Optional[CircuitBreaker] = None,
+    park: bool = True,
+    is_failure: Callable[[T], bool] = _is_server_failure
+) -> T:
+    """Wykonanie operacji z ponowieniami.
+
+    `operation` musi tworzyć żądanie od nowa przy każdym wywołaniu (np.
+    ponownie otwierać plik). Ponawiane są wyjątki z `retry_on` oraz wyniki,
+    dla których `retry_hint` zwraca wartość różną od None. Jeśli podano
+    `breaker`, każda próba wymaga jego zgody (przy otwartym obwodzie
+    żądanie czeka lub dostaje CircuitOpenError), a jej wynik jest w nim
+    rejestrowany.
+    """
+    if policy.budget is not None:
+        policy.budget.record_request()
+
+    attempt = 0
+
+    def may_retry() -> bool:
+        return attempt < policy.max_retries and (
+            policy.budget is None or policy.budget.try_consume()
+        )
+
+    while True:
+        retry_after: Optional[float] = None
+        trial = await breaker.acquire(park) if breaker is not None else False
+        try:
+            result = await operation()
+        except retry_on as e:
+            if breaker is not None:
+                breaker.record_failure(trial)
+            if not may_retry():
+                raise
+            reason = f"{type(e).__name__}: {e}"
+        except BaseException:
+            if breaker is not None and trial:
+                breaker.record_failure(trial)
+            raise
+        else:
+            if breaker is not None:
+                if is_failure(result):
+                    breaker.record_failure(trial)
+                else:
+                    breaker.record_success(trial)
+            hint = retry_hint(result) if retry_hint else None
+            if hint is None or not may_retry():
+                return result
+            retry_after = hint if hint >= 0 else None
+            reason = f"odpowiedź do ponowienia ({getattr(result, 'status_code', result)})"
+
+        delay = policy.compute_delay(attempt, retry_after)
+        attempt += 1
+        logger.warning(
+            f"Ponawianie ({attempt}/{policy.max_retries}) - {description}: {reason}; "
+            f"oczekiwanie {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+
+def create_retry_policy(config) -> RetryPolicy:
+    """Polityka ponowień według ustawień aplikacji"""
+    return RetryPolicy(
+        max_retries=config.HTTP_RETRIES,
+        base_delay=config.HTTP_RETRY_BASE_DELAY,
+        max_delay=config.HTTP_RETRY_MAX_DELAY,
+        budget=RetryBudget(ratio=config.HTTP_RETRY_BUDGET_RATIO)
+    )
+
+
+def create_circuit_breakers(config, probe: Optional[Callable[[], Awaitable[bool]]] = None) -> CircuitBreakerRegistry:
+    """Rejestr bezpieczników według ustawień aplikacji"""
+    return CircuitBreakerRegistry(
+        probe=probe,
+        failure_threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=config.CIRCUIT_RESET_TIMEOUT,
+        park_timeout=config.CIRCUIT_PARK_TIMEOUT
+    )
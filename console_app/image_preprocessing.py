@@ -0,0 +1,136 @@
+"""
+Wstępne zmniejszanie zdjęć paragonów przed wysłaniem do OCR
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+import structlog
+
+from .workers import run_in_process
+
+logger = structlog.get_logger()
+
+# Formaty rastrowe, które można bezpiecznie przekodować do JPEG
+PREPROCESSABLE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+
+# Kopia jest używana tylko, gdy jest mniejsza od oryginału co najmniej o ten ułamek
+MIN_SAVING_RATIO = 0.1
+
+
+def shrink_image(source: str, target: str, max_dimension: int, grayscale: bool, quality: int) -> Dict[str, Any]:
+    """Zmniejszenie, konwersja do skali szarości i ponowna kompresja obrazu.
+
+    Funkcja uruchamiana w osobnym procesie - przyjmuje i zwraca proste typy.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        original_width, original_height = image.size
+        target_mode = 'L' if grayscale else image.mode
+        if (image.format == 'JPEG' and image.mode == target_mode
+                and max(original_width, original_height) <= max_dimension):
+            # Obraz spełnia już wymagania - ponowna kompresja tylko pogorszy jakość
+            return {'skipped': True}
+        if image.format == 'JPEG':
+            # Dekodowanie JPEG od razu w zmniejszonej skali (1/2, 1/4, 1/8)
+            image.draft('L' if grayscale else 'RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if grayscale:
+            image = image.convert('L')
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        image.save(target, 'JPEG', quality=quality, optimize=True)
+        width, height = image.size
+
+    return {
+        'original_width': original_width,
+        'original_height': original_height,
+        'width': width,
+        'height': height,
+        'processed_size': Path(target).stat().st_size
+    }
+
+
+class ImagePreprocessor:
+    """Etap wstępnego przetwarzania obrazów w puli procesów.
+
+    Zdjęcie jest zmniejszane tak, aby dłuższy bok nie przekraczał
+    PREPROCESS_MAX_DIMENSION pikseli (ok. 300 DPI dla paragonu), opcjonalnie
+    konwertowane do skali szarości i zapisywane jako JPEG. Jeśli kopia nie
+    jest wyraźnie mniejsza (MIN_SAVING_RATIO), wysyłany jest oryginał.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.max_dimension = config.PREPROCESS_MAX_DIMENSION
+        self.grayscale = config.PREPROCESS_GRAYSCALE
+        self.quality = config.PREPROCESS_JPEG_QUALITY
+        self.temp_root = Path(config.DATA_DIR) / "preprocess_tmp"
+
+    def settings(self) -> Dict[str, Any]:
+        """Ustawienia wpływające na wysyłany obraz - część klucza cache"""
+        return {
+            'max_dimension': self.max_dimension,
+            'grayscale': self.grayscale,
+            'quality': self.quality
+        }
+
+    def can_preprocess(self, file_path: Path) -> bool:
+        """Czy plik jest obrazem, który można przetworzyć"""
+        return file_path.suffix.lower() in PREPROCESSABLE_EXTENSIONS
+
+    async def preprocess(self, file_path: Path) -> Dict[str, Any]:
+        """Przygotowanie pliku do wysłania.
+
+        Zwraca słownik z kluczem 'path' (plik do wysłania), rozmiarami przed
+        i po oraz 'applied' - czy użyto przetworzonej kopii. Przetworzoną
+        kopię należy usunąć przez `cleanup`.
+        """
+        original_size = file_path.stat().st_size
+        result = {
+            'path': file_path,
+            'applied': False,
+            'original_size': original_size,
+            'processed_size': original_size
+        }
+        if not self.can_preprocess(file_path):
+            return result
+
+        self.temp_root.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(dir=self.temp_root))
+        target = work_dir / f"{file_path.stem}.jpg"
+        try:
+            info = await run_in_process(
+                shrink_image, str(file_path), str(target),
+                self.max_dimension, self.grayscale, self.quality,
+                max_workers=self.config.PROCESS_POOL_WORKERS
+            )
+        except Exception as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            logger.warning(f"Nie udało się przetworzyć obrazu {file_path.name}, wysyłam oryginał: {e}")
+            return result
+
+        if info.get('skipped') or info['processed_size'] > original_size * (1 - MIN_SAVING_RATIO):
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return result
+
+        return {
+            **result,
+            **info,
+            'path': target,
+            'applied': True
+        }
+
+    def cleanup(self, preprocessing: Dict[str, Any]):
+        """Usunięcie przetworzonej kopii"""
+        if preprocessing.get('applied'):
+            shutil.rmtree(Path(preprocessing['path']).parent, ignore_errors=True)
+
+    @staticmethod
+    def bytes_saved(preprocessing: Dict[str, Any]) -> int:
+        """Liczba bajtów zaoszczędzonych na wysyłaniu"""
+        return max(0, preprocessing.get('original_size', 0) - preprocessing.get('processed_size', 0))
@@ -0,0 +1,146 @@
+"""
+Lokalny silnik OCR (Tesseract) działający bez backendu
+"""
+
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import structlog
+
+from .workers import process_pool_size, run_in_process
+
+logger = structlog.get_logger()
+
+# Obsługiwane rozszerzenia (PDF przez pdf2image)
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+PDF_EXTENSIONS = {'.pdf'}
+
+# Tryb segmentacji strony dla paragonów - pojedynczy blok tekstu o zmiennej wielkości
+TESSERACT_CONFIG = '--psm 4'
+
+
+def _prepare_worker():
+    """Tesseract w procesie roboczym korzysta z jednego wątku.
+
+    Równoległość zapewnia pula procesów - wielowątkowość OpenMP w każdym
+    procesie prowadziłaby do nadsubskrypcji rdzeni.
+    """
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+
+def ocr_image(source: str, language: str, timeout: int) -> Dict[str, Any]:
+    """Rozpoznanie tekstu z obrazu (uruchamiane w osobnym procesie)"""
+    import pytesseract
+    from PIL import Image
+
+    _prepare_worker()
+    started = time.monotonic()
+    with Image.open(source) as image:
+        text = pytesseract.image_to_string(image, lang=language, config=TESSERACT_CONFIG, timeout=timeout)
+    return {'text': text, 'pages': 1, 'duration': time.monotonic() - started}
+
+
+def ocr_pdf(source: str, language: str, timeout: int, dpi: int = 300) -> Dict[str, Any]:
+    """Rasteryzacja PDF i rozpoznanie tekstu kolejnych stron (osobny proces)"""
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    _prepare_worker()
+    started = time.monotonic()
+    pages = convert_from_path(source, dpi=dpi, grayscale=True, timeout=timeout)
+    texts = [
+        pytesseract.image_to_string(page, lang=language, config=TESSERACT_CONFIG, timeout=timeout)
+        for page in pages
+    ]
+    return {'text': "\n\n".join(texts), 'pages': len(pages), 'duration': time.monotonic() - started}
+
+
+class LocalOCREngine:
+    """Lokalny OCR zgodny z wynikiem `ReceiptProcessor._upload_and_process`.
+
+    Zwraca słownik z kluczami 'text', 'message' i 'processing_info' albo
+    'error'. Rozpoznawanie odbywa się we wspólnej puli procesów
+    (PROCESS_POOL_WORKERS, domyślnie liczba rdzeni) z językiem OCR_LANGUAGE
+    i limitem czasu OCR_TIMEOUT na stronę.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.language = config.OCR_LANGUAGE
+        self.timeout = config.OCR_TIMEOUT
+        self._available: Optional[bool] = None
+
+    def is_available(self) -> bool:
+        """Czy Tesseract (i wymagany język) jest zainstalowany"""
+        if self._available is None:
+            self._available = self._detect()
+        return self._available
+
+    def _detect(self) -> bool:
+        """Wykrycie instalacji Tesseracta"""
+        try:
+            import pytesseract
+        except ImportError:
+            logger.warning("Brak pakietu pytesseract - lokalny OCR niedostępny")
+            return False
+
+        if shutil.which(pytesseract.pytesseract.tesseract_cmd) is None:
+            logger.warning("Nie znaleziono programu tesseract - lokalny OCR niedostępny")
+            return False
+
+        try:
+            languages = pytesseract.get_languages(config='')
+        except Exception as e:
+            logger.warning(f"Nie można odczytać języków Tesseracta: {e}")
+            return False
+
+        missing = [lang for lang in self.language.split('+') if lang not in languages]
+        if missing:
+            logger.warning(f"Brak danych językowych Tesseracta: {', '.join(missing)}")
+            return False
+        return True
+
+    def settings(self) -> Dict[str, Any]:
+        """Ustawienia wpływające na wynik - część klucza cache"""
+        return {'engine': 'tesseract', 'config': TESSERACT_CONFIG}
+
+    async def process(self, file_path: Path) -> Dict[str, Any]:
+        """Rozpoznanie tekstu z pliku paragonu"""
+        if not self.is_available():
+            return {'error': 'Lokalny OCR niedostępny - zainstaluj Tesseract z danymi języka ' + self.language}
+
+        suffix = file_path.suffix.lower()
+        if suffix in IMAGE_EXTENSIONS:
+            worker = ocr_image
+        elif suffix in PDF_EXTENSIONS:
+            worker = ocr_pdf
+        else:
+            return {'error': f'Nieobsługiwany typ pliku dla lokalnego OCR: {file_path.suffix}'}
+
+        try:
+            result = await run_in_process(
+                worker, str(file_path), self.language, self.timeout,
+                max_workers=self.config.PROCESS_POOL_WORKERS
+            )
+        except RuntimeError as e:
+            # pytesseract zgłasza przekroczenie czasu jako RuntimeError
+            logger.error(f"Błąd lokalnego OCR pliku {file_path}: {e}")
+            return {'error': f'Lokalny OCR przerwany: {e}'}
+        except Exception as e:
+            logger.error(f"Błąd lokalnego OCR pliku {file_path}: {e}")
+            return {'error': str(e)}
+
+        return {
+            'text': result['text'].strip(),
+            'message': 'Przetworzono lokalnie (Tesseract)',
+            'processing_info': {
+                'engine': 'tesseract',
+                'language': self.language,
+                'pages': result['pages'],
+                'duration': round(result['duration'], 3),
+                'workers': process_pool_size()
+            }
+        }
@@ -13,15 +13,20 @@ import click
 import structlog
 from rich.console import Console
 from rich.panel import Panel
-from rich.prompt import Prompt
+from rich.prompt import Confirm, Prompt
 from rich.table import Table
 
+from .analytics import SpendingAnalytics
+from .batch_journal import BatchJournal
 from .config import Config
+from .file_scanner import RECEIPT_EXTENSIONS, ScannedFile, scan_directory
+from .pipeline import ProcessingStats
 from .receipt_processor import ReceiptProcessor
 from .rag_manager import RAGManager
 from .export_manager import ExportManager
 from .console_ui import ConsoleUI
 from .chat_agent import ChatAgent
+from .watcher import DirectoryWatcher
 
 # Konfiguracja logowania
 structlog.configure(
@@ -49,13 +54,16 @@ console = Console()
 class AgentyConsoleApp:
     """Główna klasa aplikacji konsolowej"""
     
-    def __init__(self):
+    def __init__(self, force: bool = False):
         self.config = Config()
         self.ui = ConsoleUI()
-        self.receipt_processor = ReceiptProcessor(self.config)
+        self.receipt_processor = ReceiptProcessor(self.config, force=force)
         self.rag_manager = RAGManager(self.config)
         self.export_manager = ExportManager()
         self.chat_agent = None
+        self.analytics = None
+        if self.receipt_processor.store is not None:
+            self.analytics = SpendingAnalytics(self.receipt_processor.store)
         
     async def initialize(self):
         """Inicjalizacja aplikacji"""
@@ -64,13 +72,20 @@ class AgentyConsoleApp:
             
             # Sprawdzenie połączenia z backendem
             if not await self.receipt_processor.check_backend_connection():
-                console.print("[bold red]❌ Nie można połączyć się z backendem![/bold red]")
-                return False
+                if not self.receipt_processor.uses_local_ocr:
+                    console.print("[bold red]❌ Nie można połączyć się z backendem![/bold red]")
+                    return False
+                console.print("[yellow]⚠️  Backend niedostępny - paragony będą przetwarzane lokalnie (Tesseract)[/yellow]")
                 
             # Sprawdzenie katalogów
             if not self._check_directories():
                 return False
             
+            # Rekordy paragonów zapisane przez starszą wersję parsera
+            reparsed = await self.receipt_processor.reparse_stored_receipts()
+            if reparsed:
+                console.print(f"[blue]🧾 Zaktualizowano {reparsed} zapisanych paragonów po zmianie parsera[/blue]")
+            
             # Inicjalizacja chat agenta
             self.chat_agent = ChatAgent(self.config)
                 
@@ -137,16 +152,9 @@ class AgentyConsoleApp:
         """Przetwarzanie paragonów"""
         try:
             paragony_dir = Path(self.config.PARAGONY_DIR)
-            files = list(paragony_dir.glob("*"))
-            
-            if not files:
-                console.print("[yellow]📁 Katalog paragonów jest pusty![/yellow]")
-                return
-                
-            console.print(f"[bold blue]📄 Znaleziono {len(files)} plików do przetworzenia[/bold blue]")
             
-            # Filtruj tylko pliki obrazów i PDF
-            image_files = [f for f in files if f.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.pdf']]
+            # Tylko pliki obrazów i PDF - jeden przebieg po katalogu
+            image_files = list(scan_directory(paragony_dir, RECEIPT_EXTENSIONS, recursive=self.config.SCAN_RECURSIVE))
             
             if not image_files:
                 console.print("[yellow]📁 Brak plików obrazów lub PDF do przetworzenia[/yellow]")
@@ -162,10 +170,13 @@ class AgentyConsoleApp:
                 await self._process_all_receipts(image_files)
             elif choice == "2":
                 # Wybierz konkretny plik
-                selected_file = await self.ui.select_file(image_files)
+                selected_file = await self.ui.select_file([entry.path for entry in image_files])
                 if selected_file:
                     await self._process_single_receipt(selected_file)
             elif choice == "3":
+                # Ponów pliki z błędami
+                await self._retry_failed_receipts(image_files)
+            elif choice == "4":
                 # Powrót
                 return
                 
@@ -173,22 +184,63 @@ class AgentyConsoleApp:
             logger.error(f"Błąd przetwarzania paragonów: {e}")
             console.print(f"[bold red]❌ Błąd: {e}[/bold red]")
     
-    async def _process_all_receipts(self, files: list[Path]):
+    async def _process_all_receipts(self, files: list[ScannedFile]):
         """Przetwarzanie wszystkich paragonów"""
+        journal_dir = self.config.get_journal_dir()
+        journal = BatchJournal.latest(journal_dir, self.config.PARAGONY_DIR, unfinished_only=True)
+        
+        if journal:
+            summary = journal.summary()
+            resume = Confirm.ask(
+                f"[bold yellow]Znaleziono niedokończone przetwarzanie "
+                f"({summary['processed']}/{summary['total']} plików). Wznowić?",
+                default=True
+            )
+            if not resume:
+                journal.mark_complete()
+                journal.close()
+                journal = None
+        
+        if journal is None:
+            journal = BatchJournal.create(journal_dir, self.config.PARAGONY_DIR, total=len(files))
+        
         console.print("[bold blue]🔄 Przetwarzanie wszystkich paragonów...[/bold blue]")
+        await self._run_receipt_batch(files, journal)
+    
+    async def _retry_failed_receipts(self, files: list[ScannedFile]):
+        """Ponowne przetworzenie plików z błędami z ostatniego wsadu"""
+        journal_dir = self.config.get_journal_dir()
+        journal = BatchJournal.latest(journal_dir, self.config.PARAGONY_DIR)
+        
+        if journal and journal.failed_files:
+            console.print(f"[bold blue]🔁 Ponawianie {len(journal.failed_files)} plików z błędami...[/bold blue]")
+            await self._run_receipt_batch(files, journal, retry_failed_only=True)
+            return
+        
+        # Brak błędów w dzienniku - ostatnie wyniki plików z magazynu
+        store = self.receipt_processor.store
+        failed = set(store.failed_files([str(f) for f in files])) if store is not None else set()
+        if not failed:
+            console.print("[yellow]📭 Brak plików z błędami do ponowienia[/yellow]")
+            return
+        
+        retry_files = [f for f in files if str(f) in failed]
+        journal = BatchJournal.create(journal_dir, self.config.PARAGONY_DIR, total=len(retry_files))
+        console.print(f"[bold blue]🔁 Ponawianie {len(retry_files)} plików z błędami...[/bold blue]")
+        await self._run_receipt_batch(retry_files, journal)
+    
+    async def _run_receipt_batch(self, files: list[ScannedFile], journal: BatchJournal, retry_failed_only: bool = False):
+        """Uruchomienie wsadu z dziennikiem i wyświetlenie wyników"""
+        batch = await self.receipt_processor.run_batch(files, journal, retry_failed_only=retry_failed_only)
         
-        results = []
-        for i, file in enumerate(files, 1):
-            console.print(f"[blue]📄 Przetwarzanie {i}/{len(files)}: {file.name}[/blue]")
-            result = await self.receipt_processor.process_file(file)
-            results.append(result)
-            
         # Podsumowanie
-        successful = sum(1 for r in results if r.get('success', False))
-        console.print(f"[bold green]✅ Przetworzono {successful}/{len(files)} paragonów[/bold green]")
+        journal_summary = batch['journal']
+        console.print(
+            f"[bold green]✅ Przetworzono {journal_summary['successful']}/{len(files)} paragonów[/bold green]"
+        )
         
         # Pokaż szczegóły
-        await self.ui.show_processing_results(results)
+        await self.ui.show_processing_results(batch['results'], batch['stats'])
     
     async def _process_single_receipt(self, file: Path):
         """Przetwarzanie pojedynczego paragonu"""
@@ -221,33 +273,22 @@ class AgentyConsoleApp:
             console.print(f"[bold red]❌ Błąd: {e}[/bold red]")
     
     async def _add_rag_documents(self):
-        """Dodawanie dokumentów do RAG"""
+        """Synchronizacja katalogu wiedzy z bazą RAG (tylko nowe i zmienione pliki)"""
         console.print("[bold blue]📚 Dodawanie dokumentów do bazy wiedzy...[/bold blue]")
         
-        wiedza_dir = Path(self.config.WIEDZA_RAG_DIR)
-        files = list(wiedza_dir.glob("*"))
-        
-        if not files:
-            console.print("[yellow]📁 Katalog wiedzy RAG jest pusty![/yellow]")
-            return
-            
-        # Filtruj pliki tekstowe
-        text_files = [f for f in files if f.suffix.lower() in ['.txt', '.md', '.pdf', '.docx']]
-        
-        if not text_files:
-            console.print("[yellow]📁 Brak plików tekstowych do dodania[/yellow]")
-            return
-            
-        console.print(f"[bold blue]📄 Znaleziono {len(text_files)} plików do dodania[/bold blue]")
-        
-        # Dodaj wszystkie pliki
-        for file in text_files:
-            console.print(f"[blue]📄 Dodawanie: {file.name}[/blue]")
-            result = await self.rag_manager.add_document(file)
-            if result.get('success', False):
-                console.print(f"[green]✅ Dodano: {file.name}[/green]")
+        result = await self.rag_manager.add_directory(Path(self.config.WIEDZA_RAG_DIR))
+        if not result.get('success', False):
+            console.print(f"[red]❌ {result.get('error', 'Nieznany błąd')}[/red]")
+        elif not result['total_files'] and not result['removed']:
+            if result['unchanged']:
+                console.print(f"[green]✅ Baza wiedzy aktualna ({result['unchanged']} dokumentów bez zmian)[/green]")
             else:
-                console.print(f"[red]❌ Błąd dodawania: {file.name}[/red]")
+                console.print("[yellow]📁 Brak plików tekstowych do dodania[/yellow]")
+        else:
+            console.print(
+                f"[green]✅ Dodano: {result['successful']}, błędy: {result['failed']}, "
+                f"bez zmian: {result['unchanged']}, usunięto: {result['removed']}[/green]"
+            )
     
     async def _search_rag_knowledge(self):
         """Wyszukiwanie w bazie wiedzy"""
@@ -274,13 +315,21 @@ class AgentyConsoleApp:
             console.print("[yellow]📭 Baza wiedzy jest pusta[/yellow]")
     
     async def show_statistics(self):
-        """Wyświetlanie statystyk"""
+        """Wyświetlanie statystyk (lokalne analizy, bez zapytania do backendu)"""
         try:
-            stats = await self.receipt_processor.get_statistics()
-            await self.ui.show_statistics(stats)
+            if self.analytics is not None:
+                summary = await asyncio.to_thread(self.analytics.summary)
+                await self.ui.show_spending_summary(summary)
+            else:
+                stats = await self.receipt_processor.get_statistics()
+                await self.ui.show_statistics(stats)
         except Exception as e:
             logger.error(f"Błąd pobierania statystyk: {e}")
             console.print(f"[bold red]❌ Błąd: {e}[/bold red]")
+        
+        local_stats = self.receipt_processor.local_statistics()
+        if local_stats:
+            await self.ui.show_statistics(local_stats, title="Lokalne wyniki")
     
     async def manage_exports(self):
         """Zarządzanie eksportami"""
@@ -313,9 +362,8 @@ class AgentyConsoleApp:
     
     async def _export_receipt_results(self):
         """Eksport wyników przetwarzania paragonów"""
-        # Tutaj można dodać logikę do pobrania ostatnich wyników
-        # Na razie używamy pustej listy jako przykład
-        results = []
+        store = self.receipt_processor.store
+        results = store.receipt_results(latest_only=True) if store is not None else []
         
         if not results:
             console.print("[yellow]📭 Brak wyników do eksportu[/yellow]")
@@ -332,9 +380,8 @@ class AgentyConsoleApp:
     
     async def _export_rag_results(self):
         """Eksport wyników wyszukiwania RAG"""
-        # Tutaj można dodać logikę do pobrania ostatnich wyników
-        # Na razie używamy pustej listy jako przykład
-        results = []
+        store = self.rag_manager.store
+        results = store.rag_results() if store is not None else []
         
         if not results:
             console.print("[yellow]📭 Brak wyników do eksportu[/yellow]")
@@ -381,12 +428,58 @@ class AgentyConsoleApp:
     async def show_help(self):
         """Wyświetlanie pomocy"""
         await self.ui.show_help()
+    
+    async def _is_new_receipt(self, file_path: Path) -> bool:
+        """Czy plik zastany przy starcie obserwatora nie był jeszcze przetworzony"""
+        try:
+            return not await self.receipt_processor.is_processed(file_path)
+        except OSError:
+            return False
+    
+    async def watch_receipts(self):
+        """Tryb bez menu - przetwarzanie paragonów pojawiających się w katalogu"""
+        if not await self.initialize():
+            return
+        
+        paragony_dir = Path(self.config.PARAGONY_DIR)
+        watcher = DirectoryWatcher(
+            paragony_dir,
+            RECEIPT_EXTENSIONS,
+            debounce=self.config.WATCH_DEBOUNCE_SECONDS,
+            poll_interval=self.config.WATCH_POLL_INTERVAL,
+            use_inotify=self.config.WATCH_USE_INOTIFY,
+            recursive=self.config.SCAN_RECURSIVE,
+            existing_filter=self._is_new_receipt
+        )
+        journal = BatchJournal.create(self.config.get_journal_dir(), f"watch:{paragony_dir}", total=0)
+        stats = ProcessingStats()
+        
+        def on_result(result: dict):
+            journal.record(result)
+            name = Path(result.get('file', '')).name
+            if result.get('success', False):
+                console.print(f"[green]✅ {name}[/green] [dim]({stats.format_throughput()})[/dim]")
+            else:
+                console.print(f"[red]❌ {name}: {result.get('error', 'Nieznany błąd')}[/red]")
+        
+        console.print(f"[bold blue]👀 Obserwowanie katalogu {paragony_dir} (Ctrl+C kończy)[/bold blue]")
+        try:
+            await self.receipt_processor.process_stream(watcher.watch(), on_result, stats=stats)
+        finally:
+            journal.mark_complete()
+            journal.close()
+            console.print(
+                f"[bold blue]📊 Przetworzono {stats.processed_files} plików "
+                f"({stats.successful_files} pomyślnie, {stats.failed_files} z błędami)[/bold blue]"
+            )
 
 
 @click.command()
 @click.option('--config', '-c', help='Ścieżka do pliku konfiguracyjnego')
 @click.option('--debug', '-d', is_flag=True, help='Tryb debug')
-def main(config: Optional[str], debug: bool):
+@click.option('--force', '-f', is_flag=True, help='Przetwarzaj ponownie z pominięciem cache wyników')
+@click.option('--watch', '-w', is_flag=True, help='Tryb bez menu: przetwarzaj nowe paragony z PARAGONY_DIR')
+def main(config: Optional[str], debug: bool, force: bool, watch: bool):
     """Aplikacja konsolowa do przetwarzania paragonów z AI"""
     
     if debug:
@@ -398,10 +491,10 @@ def main(config: Optional[str], debug: bool):
         border_style="blue"
     ))
     
-    app = AgentyConsoleApp()
+    app = AgentyConsoleApp(force=force)
     
     try:
-        asyncio.run(app.run())
+        asyncio.run(app.watch_receipts() if watch else app.run())
     except KeyboardInterrupt:
         console.print("\n[bold blue]👋 Do widzenia![/bold blue]")
     except Exception as e:
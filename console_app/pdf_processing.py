@@ -0,0 +1,203 @@
+"""
+Przetwarzanie PDF - warstwa tekstowa oraz równoległe przetwarzanie stron
+"""
+
+import asyncio
+import shutil
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+import structlog
+
+from .pipeline import run_ordered
+from .workers import get_process_pool, run_in_process
+
+logger = structlog.get_logger()
+
+
+def extract_pdf_text(source: str, min_chars_per_page: int = 0) -> Optional[Dict[str, Any]]:
+    """Odczyt warstwy tekstowej PDF (pdfplumber).
+
+    Przy `min_chars_per_page` > 0 funkcja sprawdza, czy dokument ma
+    użyteczną warstwę tekstową - zwraca None, gdy mniej znaków ma ponad
+    połowa stron (np. skan), przerywając odczyt, gdy wynik jest już
+    przesądzony. Pojedyncza pusta strona (np. regulamin na końcu
+    e-faktury) nie kieruje więc całego dokumentu do OCR.
+    """
+    import pdfplumber
+
+    started = time.monotonic()
+    texts = []
+    short_pages = 0
+    with pdfplumber.open(source) as pdf:
+        page_count = len(pdf.pages)
+        for page in pdf.pages:
+            text = page.extract_text() or ''
+            if min_chars_per_page and len(''.join(text.split())) < min_chars_per_page:
+                short_pages += 1
+                if short_pages * 2 > page_count:
+                    return None
+            if text:
+                texts.append(text)
+            page.close()
+
+    return {
+        'text': "\n".join(texts).strip(),
+        'pages': page_count,
+        'duration': time.monotonic() - started
+    }
+
+
+def count_pdf_pages(source: str) -> int:
+    """Liczba stron dokumentu PDF"""
+    import pdfplumber
+
+    with pdfplumber.open(source) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_pages(source: str, first_page: int, page_count: int) -> List[str]:
+    """Tekst kolejnych stron PDF od `first_page` (numeracja od 0, osobny proces)"""
+    import pdfplumber
+
+    texts = []
+    with pdfplumber.open(source, pages=list(range(first_page + 1, first_page + page_count + 1))) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or '')
+            page.close()
+    return texts
+
+
+def iter_pdf_text(
+    source: str,
+    pages_per_task: int = 16,
+    max_workers: int = 0,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Iterator[str]:
+    """Tekst PDF strona po stronie (generator blokujący - do użycia w wątku).
+
+    Strony odczytywane są zakresami po `pages_per_task` w puli procesów,
+    z wyprzedzeniem jednego zakresu, więc w pamięci jest najwyżej kilka
+    zakresów stron naraz. `progress(strona, liczba_stron)` wywoływane
+    jest po każdej stronie.
+    """
+    pool = get_process_pool(max_workers)
+    total = pool.submit(count_pdf_pages, source).result()
+    ranges = iter(range(0, total, max(1, pages_per_task)))
+    pending: Deque = deque()
+
+    def submit_next():
+        first_page = next(ranges, None)
+        if first_page is not None:
+            count = min(pages_per_task, total - first_page)
+            pending.append(pool.submit(extract_pdf_pages, source, first_page, count))
+
+    submit_next()
+    submit_next()
+    done = 0
+    try:
+        while pending:
+            texts = pending.popleft().result()
+            submit_next()
+            for text in texts:
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+                if text:
+                    yield text + "\n"
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def render_pdf_page(source: str, page_index: int, target: str, dpi: int) -> Dict[str, Any]:
+    """Rasteryzacja jednej strony PDF do PNG w skali szarości (osobny proces)"""
+    import pdfplumber
+
+    started = time.monotonic()
+    with pdfplumber.open(source, pages=[page_index + 1]) as pdf:
+        image = pdf.pages[0].to_image(resolution=dpi).original.convert('L')
+        image.save(target, 'PNG', optimize=False)
+        width, height = image.size
+    return {'width': width, 'height': height, 'duration': time.monotonic() - started}
+
+
+class PdfPageProcessor:
+    """Podział PDF na strony, równoległa rasteryzacja i rozpoznawanie.
+
+    Strony są rasteryzowane we wspólnej puli procesów, a następnie
+    przekazywane do funkcji rozpoznającej (lokalny OCR lub upload do
+    backendu) - do PDF_PAGE_WORKERS stron jednego dokumentu naraz. Tekst
+    składany jest w kolejności stron.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.dpi = config.PDF_RASTER_DPI
+        self.page_workers = max(1, config.PDF_PAGE_WORKERS)
+        self.temp_root = Path(config.DATA_DIR) / "pdf_pages_tmp"
+
+    def settings(self) -> Dict[str, Any]:
+        """Ustawienia wpływające na wynik - część klucza cache"""
+        return {'dpi': self.dpi}
+
+    async def process(
+        self,
+        file_path: Path,
+        recognize_page: Callable[[Path], Awaitable[Dict[str, Any]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Przetworzenie dokumentu strona po stronie.
+
+        Zwraca None dla dokumentów jednostronicowych (podział nic nie daje),
+        w przeciwnym razie słownik jak z `_upload_and_process`.
+        """
+        page_count = await asyncio.to_thread(count_pdf_pages, str(file_path))
+        if page_count <= 1:
+            return None
+
+        self.temp_root.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(dir=self.temp_root))
+        started = time.monotonic()
+
+        async def handle_page(page_index: int) -> Dict[str, Any]:
+            page_path = work_dir / f"{file_path.stem}_strona_{page_index + 1:04d}.png"
+            await run_in_process(
+                render_pdf_page, str(file_path), page_index, str(page_path), self.dpi,
+                max_workers=self.config.PROCESS_POOL_WORKERS
+            )
+            try:
+                return await recognize_page(page_path)
+            finally:
+                page_path.unlink(missing_ok=True)
+
+        texts = []
+        failed_pages = []
+        try:
+            async for page_index, _, page_result in run_ordered(range(page_count), handle_page, self.page_workers):
+                if 'error' in page_result:
+                    failed_pages.append(f"{page_index + 1}: {page_result['error']}")
+                else:
+                    texts.append(page_result.get('text', ''))
+        except Exception as e:
+            logger.error(f"Błąd przetwarzania stron PDF {file_path}: {e}")
+            return {'error': f'Błąd przetwarzania stron PDF: {e}'}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        if failed_pages:
+            return {'error': 'Nie udało się przetworzyć stron ' + '; '.join(failed_pages)}
+
+        logger.info(f"Przetworzono PDF {file_path.name}: {page_count} stron")
+        return {
+            'text': "\n\n".join(texts),
+            'message': f'Przetworzono {page_count} stron',
+            'processing_info': {
+                'pages': page_count,
+                'page_mode': True,
+                'page_workers': self.page_workers,
+                'duration': round(time.monotonic() - started, 3)
+            }
+        }
@@ -0,0 +1,166 @@
+"""
+Wykrywanie powtórnych zdjęć tego samego paragonu (hash percepcyjny)
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from .workers import run_in_process
+
+logger = structlog.get_logger()
+
+# Formaty, dla których liczony jest hash (PDF-y pomijane)
+HASHABLE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+
+
+def _crop_to_paper(image):
+    """Przycięcie zdjęcia do jasnego obszaru paragonu (bez tła stołu)"""
+    scale = max(image.size) / 256
+    small = image.resize((max(1, int(image.width / scale)), max(1, int(image.height / scale))))
+    pixels = np.asarray(small, dtype=np.float32)
+    low, high = np.percentile(pixels, [5, 95])
+    paper = pixels > (low + high) / 2
+    rows = np.flatnonzero(paper.mean(axis=1) > 0.5)
+    cols = np.flatnonzero(paper.mean(axis=0) > 0.5)
+    if not len(rows) or not len(cols):
+        return image
+    return image.crop((
+        int(cols[0] * scale), int(rows[0] * scale),
+        int((cols[-1] + 1) * scale), int((rows[-1] + 1) * scale)
+    ))
+
+
+def difference_hash(source: str, hash_size: int = 16) -> int:
+    """dHash obrazu (osobny proces).
+
+    Zdjęcie jest przycinane do paragonu, zmniejszane do
+    (hash_size + 1) x hash_size w skali szarości, a każdy bit mówi, czy
+    piksel jest jaśniejszy od prawego sąsiada. Hash jest odporny na
+    skalowanie, kadrowanie, kompresję i zmianę jasności.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        if image.format == 'JPEG':
+            image.draft('L', (hash_size * 32, hash_size * 32))
+        image = ImageOps.exif_transpose(image).convert('L')
+        image = ImageOps.autocontrast(_crop_to_paper(image))
+        small = image.resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Liczba ustawionych bitów w każdym bajcie (NumPy < 2.0 bez bitwise_count)"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values]
+
+
+class HashIndex:
+    """Indeks hashy z wyszukiwaniem w promieniu odległości Hamminga.
+
+    Hashe trzymane są jako macierz bajtów, a zapytanie to jedna operacja
+    XOR i zliczenie bitów na całej macierzy (NumPy). Przy promieniu
+    potrzebnym dla ponownie sfotografowanych paragonów (~1/8 bitów)
+    drzewa BK i indeksy wielokrotne sprawdzają większość archiwum, więc
+    wektorowe przeszukanie jest od nich szybsze.
+    """
+
+    def __init__(self, hash_bytes: int, capacity: int = 1024):
+        self.hash_bytes = hash_bytes
+        self._matrix = np.zeros((capacity, hash_bytes), dtype=np.uint8)
+        self._values: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value_hash: int, value: Any):
+        """Dodanie hasha"""
+        size = len(self._values)
+        if size == len(self._matrix):
+            grown = np.zeros((size * 2, self.hash_bytes), dtype=np.uint8)
+            grown[:size] = self._matrix
+            self._matrix = grown
+        self._matrix[size] = np.frombuffer(value_hash.to_bytes(self.hash_bytes, 'big'), dtype=np.uint8)
+        self._values.append(value)
+
+    def search(self, value_hash: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """Wartości w odległości co najwyżej `max_distance`: (odległość, wartość)"""
+        size = len(self._values)
+        if not size:
+            return []
+        query = np.frombuffer(value_hash.to_bytes(self.hash_bytes, 'big'), dtype=np.uint8)
+        distances = _popcount(self._matrix[:size] ^ query).sum(axis=1, dtype=np.int32)
+        hits = np.flatnonzero(distances <= max_distance)
+        return [(int(distances[i]), self._values[i]) for i in hits]
+
+
+class DuplicateDetector:
+    """Wykrywanie zdjęć paragonów podobnych do już przetworzonych.
+
+    Hashe przetworzonych obrazów są zapisywane w magazynie wyników
+    i wczytywane do indeksu przy pierwszym użyciu. Za duplikat uznawany
+    jest obraz, którego hash różni się od istniejącego o najwyżej
+    DUPLICATE_MAX_DISTANCE bitów.
+    """
+
+    def __init__(self, config, store=None):
+        self.config = config
+        self.store = store
+        self.hash_size = config.DUPLICATE_HASH_SIZE
+        self.max_distance = config.DUPLICATE_MAX_DISTANCE
+        self._index_cache: Optional[HashIndex] = None
+        self._lock = threading.Lock()
+
+    def _index(self) -> HashIndex:
+        """Indeks hashy (wczytywany z magazynu przy pierwszym użyciu)"""
+        if self._index_cache is None:
+            index = HashIndex(self.hash_size * self.hash_size // 8)
+            if self.store is not None:
+                for file, value_hash in self.store.image_hashes(self.hash_size):
+                    index.add(value_hash, file)
+            self._index_cache = index
+            logger.info(f"Indeks duplikatów: {len(index)} obrazów")
+        return self._index_cache
+
+    async def fingerprint(self, file_path: Path) -> Optional[int]:
+        """Hash percepcyjny obrazu albo None dla nieobsługiwanych plików"""
+        if file_path.suffix.lower() not in HASHABLE_EXTENSIONS:
+            return None
+        try:
+            return await run_in_process(
+                difference_hash, str(file_path), self.hash_size,
+                max_workers=self.config.PROCESS_POOL_WORKERS
+            )
+        except Exception as e:
+            logger.warning(f"Nie można obliczyć hasha obrazu {file_path}: {e}")
+            return None
+
+    def find(self, value_hash: int, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Najbliższy wcześniej przetworzony obraz (inny niż `file_path`)"""
+        with self._lock:
+            matches: List[Tuple[int, str]] = [
+                (distance, file) for distance, file in self._index().search(value_hash, self.max_distance)
+                if file != str(file_path)
+            ]
+        if not matches:
+            return None
+        distance, file = min(matches)
+        return {'file': file, 'distance': distance}
+
+    def register(self, file_path: Path, value_hash: int):
+        """Zapamiętanie hasha przetworzonego obrazu"""
+        with self._lock:
+            self._index().add(value_hash, str(file_path))
+        if self.store is not None:
+            self.store.add_image_hash(str(file_path), value_hash, self.hash_size)
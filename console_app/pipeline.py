@@ -0,0 +1,188 @@
+"""
+Moduł potokowego przetwarzania plików z ograniczoną współbieżnością
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class ProcessingStats:
+    """Statystyki przepustowości przetwarzania wsadowego"""
+
+    def __init__(self, total_files: int = 0):
+        self.total_files = total_files
+        self.processed_files = 0
+        self.successful_files = 0
+        self.failed_files = 0
+        self.cached_files = 0
+        self.processed_bytes = 0
+        self.saved_bytes = 0
+        self.fast_path_files = 0
+        self.duplicate_files = 0
+        self.started_at = time.monotonic()
+
+    def record(self, size_bytes: int, success: bool, cached: bool = False, saved_bytes: int = 0,
+               fast_path: bool = False, duplicate: bool = False):
+        """Zarejestrowanie przetworzonego pliku"""
+        self.processed_files += 1
+        if duplicate:
+            self.duplicate_files += 1
+        self.saved_bytes += saved_bytes
+        if fast_path:
+            self.fast_path_files += 1
+        if cached:
+            self.cached_files += 1
+        self.processed_bytes += size_bytes
+        if success:
+            self.successful_files += 1
+        else:
+            self.failed_files += 1
+
+    @property
+    def elapsed(self) -> float:
+        """Czas przetwarzania w sekundach"""
+        return max(time.monotonic() - self.started_at, 1e-9)
+
+    @property
+    def files_per_second(self) -> float:
+        """Liczba plików na sekundę"""
+        return self.processed_files / self.elapsed
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Liczba bajtów na sekundę"""
+        return self.processed_bytes / self.elapsed
+
+    @property
+    def fast_path_rate(self) -> float:
+        """Udział plików odczytanych bez OCR (warstwa tekstowa PDF)"""
+        return self.fast_path_files / self.processed_files if self.processed_files else 0.0
+
+    def format_throughput(self) -> str:
+        """Sformatowana przepustowość do wyświetlenia w postępie"""
+        text = f"{self.files_per_second:.2f} plików/s, {_format_bytes(self.bytes_per_second)}/s"
+        if self.cached_files:
+            text += f", z cache: {self.cached_files}"
+        if self.saved_bytes:
+            text += f", zaoszczędzono: {_format_bytes(self.saved_bytes)}"
+        if self.fast_path_files:
+            text += f", bez OCR: {self.fast_path_files}"
+        if self.duplicate_files:
+            text += f", duplikaty: {self.duplicate_files}"
+        return text
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Konwersja statystyk do słownika"""
+        return {
+            'total_files': self.total_files,
+            'processed_files': self.processed_files,
+            'successful_files': self.successful_files,
+            'failed_files': self.failed_files,
+            'cached_files': self.cached_files,
+            'processed_bytes': self.processed_bytes,
+            'saved_bytes': self.saved_bytes,
+            'fast_path_files': self.fast_path_files,
+            'fast_path_rate': round(self.fast_path_rate, 3),
+            'duplicate_files': self.duplicate_files,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'files_per_second': round(self.files_per_second, 3),
+            'bytes_per_second': round(self.bytes_per_second, 1),
+        }
+
+
+def _format_bytes(size: float) -> str:
+    """Formatowanie liczby bajtów"""
+    for unit in ['B', 'KB', 'MB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GB"
+
+
+async def run_ordered(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+    workers: int = 4,
+    queue_size: int = 16,
+) -> AsyncIterator[Tuple[int, T, R]]:
+    """Współbieżne przetwarzanie elementów z zachowaniem kolejności wyników.
+
+    Producent wrzuca elementy do ograniczonej kolejki, z której korzysta
+    `workers` zadań. Liczba elementów pobranych, a jeszcze nie oddanych
+    konsumentowi, nie przekracza `workers + queue_size`, więc bufor
+    porządkujący wyniki również jest ograniczony.
+    """
+    workers = max(1, workers)
+    queue_size = max(1, queue_size)
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    window = asyncio.Semaphore(workers + queue_size)
+    done: Dict[int, Tuple[T, Any, Optional[BaseException]]] = {}
+    ready = asyncio.Condition()
+    state: Dict[str, Any] = {'count': 0, 'finished': False, 'error': None}
+
+    async def producer():
+        try:
+            for index, item in enumerate(items):
+                await window.acquire()
+                await queue.put((index, item))
+                state['count'] = index + 1
+        except Exception as e:
+            state['error'] = e
+        state['finished'] = True
+        async with ready:
+            ready.notify_all()
+        if state['error'] is None:
+            for _ in range(workers):
+                await queue.put(None)
+
+    async def consume():
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            index, item = entry
+            try:
+                outcome = (item, await worker(item), None)
+            except Exception as e:
+                logger.error(f"Błąd przetwarzania elementu {index}: {e}")
+                outcome = (item, None, e)
+            async with ready:
+                done[index] = outcome
+                ready.notify_all()
+
+    tasks = [asyncio.create_task(producer())]
+    tasks.extend(asyncio.create_task(consume()) for _ in range(workers))
+
+    try:
+        next_index = 0
+        while True:
+            async with ready:
+                await ready.wait_for(
+                    lambda: next_index in done
+                    or (state['finished'] and next_index >= state['count'])
+                    or state['error'] is not None
+                )
+                if state['error'] is not None:
+                    raise state['error']
+                if next_index not in done:
+                    break
+                item, result, error = done.pop(next_index)
+
+            window.release()
+            if error is not None:
+                raise error
+            yield next_index, item, result
+            next_index += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
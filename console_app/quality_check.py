@@ -0,0 +1,127 @@
+"""
+Lokalna ocena jakości zdjęć paragonów (ostrość, kontrast, rozdzielczość)
+"""
+
+from pathlib import Path
+from typing import Any, Dict
+
+import structlog
+
+from .workers import run_in_process
+
+logger = structlog.get_logger()
+
+# Formaty rastrowe podlegające ocenie jakości
+CHECKABLE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+
+# Dłuższy bok obrazu analizowanego - progi ostrości nie zależą od rozdzielczości zdjęcia
+ANALYSIS_DIMENSION = 1000
+
+
+def measure_image_quality(source: str, analysis_dimension: int = ANALYSIS_DIMENSION) -> Dict[str, Any]:
+    """Pomiar ostrości, kontrastu i rozdzielczości obrazu.
+
+    Ostrość to wariancja laplasjanu, a kontrast to rozpiętość jasności
+    między 2. a 98. percentylem histogramu. Obie miary liczone są na kopii
+    w skali szarości zmniejszonej do `analysis_dimension`. Funkcja jest
+    uruchamiana w osobnym procesie.
+    """
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        width, height = image.size
+        if image.format == 'JPEG':
+            image.draft('L', (analysis_dimension, analysis_dimension))
+        image = ImageOps.exif_transpose(image).convert('L')
+        image.thumbnail((analysis_dimension, analysis_dimension), Image.Resampling.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32)
+
+    if pixels.shape[0] < 3 or pixels.shape[1] < 3:
+        sharpness = 0.0
+    else:
+        laplacian = (
+            pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+            - 4.0 * pixels[1:-1, 1:-1]
+        )
+        sharpness = float(laplacian.var())
+
+    histogram = np.bincount(pixels.astype(np.uint8).ravel(), minlength=256)
+    cumulative = np.cumsum(histogram) / max(int(histogram.sum()), 1)
+    low = int(np.searchsorted(cumulative, 0.02))
+    high = int(np.searchsorted(cumulative, 0.98))
+
+    return {
+        'width': width,
+        'height': height,
+        'sharpness': round(sharpness, 2),
+        'contrast': high - low,
+        'brightness': round(float(pixels.mean()), 2)
+    }
+
+
+class ImageQualityChecker:
+    """Lokalna bramka jakości przed wysłaniem pliku do backendu.
+
+    Odrzuca zdjęcia rozmazane, o zbyt niskim kontraście lub zbyt małej
+    rozdzielczości. Wynik ma postać słownika walidacji (`can_process`,
+    `issues`), tak jak walidacja backendu i lokalna walidacja formatu.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.min_sharpness = config.QUALITY_MIN_SHARPNESS
+        self.min_contrast = config.QUALITY_MIN_CONTRAST
+        self.min_resolution = config.QUALITY_MIN_RESOLUTION
+
+    def can_check(self, file_path: Path) -> bool:
+        """Czy plik jest obrazem, który można ocenić"""
+        return file_path.suffix.lower() in CHECKABLE_EXTENSIONS
+
+    def evaluate(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Ocena zmierzonych parametrów względem progów"""
+        issues = []
+        if min(metrics['width'], metrics['height']) < self.min_resolution:
+            issues.append(
+                f"Zbyt niska rozdzielczość: {metrics['width']}x{metrics['height']} "
+                f"(minimum {self.min_resolution} px na krótszym boku)"
+            )
+        if metrics['sharpness'] < self.min_sharpness:
+            issues.append(f"Zdjęcie jest rozmazane (ostrość {metrics['sharpness']:.0f} < {self.min_sharpness:.0f})")
+        if metrics['contrast'] < self.min_contrast:
+            issues.append(f"Zbyt niski kontrast ({metrics['contrast']} < {self.min_contrast})")
+
+        ratios = [
+            min(metrics['width'], metrics['height']) / max(self.min_resolution, 1),
+            metrics['sharpness'] / max(self.min_sharpness, 1e-9),
+            metrics['contrast'] / max(self.min_contrast, 1)
+        ]
+        quality_score = sum(min(ratio, 2.0) for ratio in ratios) / (2.0 * len(ratios))
+
+        return {
+            'can_process': not issues,
+            'source': 'local',
+            'quality_score': round(quality_score, 3),
+            'issues': issues,
+            'metrics': metrics
+        }
+
+    async def check(self, file_path: Path) -> Dict[str, Any]:
+        """Ocena jakości pliku w puli procesów.
+
+        Plików innych niż obrazy oraz plików, których nie da się odczytać,
+        nie odrzucamy - decyzję pozostawiamy dalszej walidacji.
+        """
+        if not self.can_check(file_path):
+            return {'can_process': True, 'source': 'local', 'issues': []}
+
+        try:
+            metrics = await run_in_process(
+                measure_image_quality, str(file_path),
+                max_workers=self.config.PROCESS_POOL_WORKERS
+            )
+        except Exception as e:
+            logger.warning(f"Nie udało się ocenić jakości {file_path.name}: {e}")
+            return {'can_process': True, 'source': 'local', 'issues': []}
+
+        return self.evaluate(metrics)
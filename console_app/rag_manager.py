@@ -3,18 +3,30 @@ Moduł do zarządzania RAG (Retrieval-Augmented Generation)
 """
 
 import asyncio
+import json
 import structlog
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
 
 import httpx
 from rich.console import Console
 
+from .concurrency import create_limiter
 from .config import Config
+from .file_scanner import DOCUMENT_EXTENSIONS, ScannedFile, scan_directory
+from .file_utils import compute_file_hash
+from .http_utils import create_circuit_breakers, create_retry_policy, httpx_retry_hint, retry_async
+from .pdf_processing import iter_pdf_text
+from .pipeline import run_ordered
+from .rag_manifest import RAGManifest
+from .result_store import ResultStore
+from .text_chunker import batched, chunk_text, iter_file_text
 
 logger = structlog.get_logger()
 console = Console()
 
+T = TypeVar('T')
+
 
 class RAGManager:
     """Klasa do zarządzania bazą wiedzy RAG"""
@@ -23,75 +35,412 @@ class RAGManager:
         self.config = config
         self.client = httpx.AsyncClient(
             timeout=self.config.HTTP_TIMEOUT,
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+            limits=httpx.Limits(
+                max_keepalive_connections=5,
+                max_connections=max(10, self.config.get_max_concurrency())
+            )
         )
+        self.limiter = create_limiter(self.config)
+        self.retry_policy = create_retry_policy(self.config)
+        self.breakers = create_circuit_breakers(self.config, probe=self._probe_backend)
+        
+        self.store: Optional[ResultStore] = None
+        if self.config.RESULT_STORE_ENABLED:
+            self.store = ResultStore(
+                self.config.get_result_store_path(), self.config.RESULT_STORE_BATCH_SIZE
+            )
+        
+        self.manifest: Optional[RAGManifest] = None
+        if self.config.RAG_INCREMENTAL_SYNC:
+            self.manifest = RAGManifest(self.config.get_rag_manifest_path())
+        # None - nieznane, False - backend nie ma endpointu /rag/add_batch
+        self._batch_supported: Optional[bool] = None
+        # None - nieznane, False - backend /rag/add przyjmuje tylko całe `content`
+        self._chunks_supported: Optional[bool] = None
+        # None - nieznane, False - backend nie obsługuje DELETE /rag/documents
+        self._delete_supported: Optional[bool] = None
+    
+    async def _probe_backend(self) -> bool:
+        """Sonda zdrowia dla bezpieczników - pojedyncze, krótkie żądanie"""
+        response = await self.client.get(self.config.get_backend_health_url(), timeout=5)
+        return response.status_code == 200
+    
+    async def _request(self, method: str, url: str, description: str,
+                       park: bool = True, **kwargs) -> httpx.Response:
+        """Żądanie do backendu w ramach limitu współbieżności, z ponowieniami.
+        
+        Przy otwartym bezpieczniku żądanie czeka na powrót backendu
+        (`park=True`) lub od razu kończy się CircuitOpenError.
+        """
+        async def send() -> httpx.Response:
+            async with self.limiter.slot() as slot:
+                response = await self.client.request(method, url, **kwargs)
+                slot.record_status(response.status_code)
+                return response
+        
+        return await retry_async(
+            send, self.retry_policy, retry_hint=httpx_retry_hint, description=description,
+            breaker=self.breakers.get(url), park=park
+        )
+    
+    def _check_document(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Wynik błędu dla pliku, którego nie można dodać (None, gdy plik jest poprawny)"""
+        if not file_path.exists():
+            return {
+                'success': False,
+                'error': f'Plik nie istnieje: {file_path}',
+                'file': str(file_path)
+            }
+        
+        # Sprawdzenie typu pliku
+        if not self._is_supported_document(file_path):
+            return {
+                'success': False,
+                'error': f'Nieobsługiwany typ dokumentu: {file_path.suffix}',
+                'file': str(file_path)
+            }
+        return None
+    
+    def _document_metadata(self, file_path: Path) -> Dict[str, Any]:
+        """Metadane dokumentu wysyłane razem z fragmentami"""
+        return {
+            'filename': file_path.name,
+            'file_path': str(file_path),
+            'file_size': file_path.stat().st_size,
+            'file_type': file_path.suffix.lower(),
+            'chunk_size': self.config.RAG_CHUNK_SIZE,
+            'chunk_overlap': self.config.RAG_OVERLAP
+        }
+    
+    @staticmethod
+    def _chunk_payload(source_id: str, start: int, chunks: List[str]) -> List[Dict[str, Any]]:
+        """Fragmenty ze stabilnymi identyfikatorami `source_id#numer`"""
+        return [
+            {'id': f"{source_id}#{start + i}", 'index': start + i, 'content': chunk}
+            for i, chunk in enumerate(chunks)
+        ]
     
-    async def add_document(self, file_path: Path) -> Dict[str, Any]:
-        """Dodawanie dokumentu do bazy wiedzy"""
+    async def add_document(self, file_path: Path,
+                           progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Dodawanie dokumentu do bazy wiedzy (fragmentami, partiami żądań).
+        
+        Dla PDF `progress(strona, liczba_stron)` wywoływane jest po odczycie
+        każdej strony (z wątku roboczego).
+        """
         try:
-            if not file_path.exists():
-                return {
-                    'success': False,
-                    'error': f'Plik nie istnieje: {file_path}',
-                    'file': str(file_path)
+            error = self._check_document(file_path)
+            if error is not None:
+                return error
+            
+            chunks = chunk_text(
+                self._document_blocks(file_path, progress),
+                self.config.RAG_CHUNK_SIZE, self.config.RAG_OVERLAP
+            )
+            try:
+                return await self._send_chunks(file_path, batched(chunks, self.config.RAG_CHUNKS_PER_REQUEST))
+            finally:
+                chunks.close()
+                
+        except Exception as e:
+            logger.error(f"Błąd dodawania dokumentu {file_path}: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'file': str(file_path)
+            }
+    
+    async def _send_chunks(self, file_path: Path, batches: Iterator[List[str]]) -> Dict[str, Any]:
+        """Wysłanie fragmentów dokumentu partiami po RAG_CHUNKS_PER_REQUEST.
+        
+        Identyfikator fragmentu to `source_id#numer`, więc ponowne wysłanie
+        dokumentu (np. po przerwanej wysyłce) nadpisuje te same fragmenty.
+        Kolejna partia jest czytana z pliku w trakcie wysyłania bieżącej.
+        Starszy backend, który odrzuca pierwszą partię (400/415/422), dostaje
+        cały dokument jako `content` (`_send_content`).
+        """
+        url = self.config.get_rag_add_url()
+        source_id = str(file_path)
+        if self._chunks_supported is False:
+            return await self._send_content(file_path, source_id)
+        metadata = self._document_metadata(file_path)
+        
+        batch = await asyncio.to_thread(next, batches, None)
+        if not batch:
+            return {
+                'success': False,
+                'error': 'Nie można wczytać zawartości pliku',
+                'file': str(file_path)
+            }
+        
+        sent = processed = 0
+        backend_id = source_id
+        while batch:
+            following = asyncio.create_task(asyncio.to_thread(next, batches, None))
+            try:
+                data = {
+                    'source_id': source_id,
+                    'chunks': self._chunk_payload(source_id, sent, batch),
+                    'metadata': metadata
                 }
+                response = await self._request("POST", url, f"dodawanie {file_path.name}", json=data)
+            finally:
+                next_batch = await following
             
-            # Sprawdzenie typu pliku
-            if not self._is_supported_document(file_path):
+            if sent == 0 and self._chunks_supported is None and response.status_code in (400, 415, 422):
+                logger.info("Backend nie przyjmuje fragmentów - wysyłanie dokumentów jako całe `content`")
+                self._chunks_supported = False
+                return await self._send_content(file_path, source_id)
+            if response.status_code != 200:
+                logger.error(f"Błąd dodawania dokumentu: {response.status_code} - {response.text}")
                 return {
                     'success': False,
-                    'error': f'Nieobsługiwany typ dokumentu: {file_path.suffix}',
-                    'file': str(file_path)
+                    'error': response.text,
+                    'file': str(file_path),
+                    'sent_chunks': sent
                 }
+            self._chunks_supported = True
+            result = response.json()
+            processed += result.get('processed_chunks', len(batch))
+            backend_id = result.get('source_id', backend_id)
+            sent += len(batch)
+            batch = next_batch
+        
+        return {
+            'success': True,
+            'file': str(file_path),
+            'processed_chunks': processed,
+            'source_id': backend_id
+        }
+    
+    def _document_text(self, file_path: Path) -> str:
+        """Cały tekst dokumentu (wywoływane w wątku roboczym)"""
+        separator = "\n" if file_path.suffix.lower() == '.pdf' else ""
+        return separator.join(self._document_blocks(file_path)).strip()
+    
+    async def _send_content(self, file_path: Path, source_id: str) -> Dict[str, Any]:
+        """Wysłanie całego dokumentu w jednym polu `content` (backend bez obsługi fragmentów)"""
+        content = await asyncio.to_thread(self._document_text, file_path)
+        if not content:
+            return {
+                'success': False,
+                'error': 'Nie można wczytać zawartości pliku',
+                'file': str(file_path)
+            }
+        
+        data = {
+            'content': content,
+            'source_id': source_id,
+            'metadata': self._document_metadata(file_path)
+        }
+        response = await self._request(
+            "POST", self.config.get_rag_add_url(), f"dodawanie {file_path.name}", json=data
+        )
+        if response.status_code != 200:
+            logger.error(f"Błąd dodawania dokumentu: {response.status_code} - {response.text}")
+            return {
+                'success': False,
+                'error': response.text,
+                'file': str(file_path)
+            }
+        result = response.json()
+        return {
+            'success': True,
+            'file': str(file_path),
+            'processed_chunks': result.get('processed_chunks', 0),
+            'source_id': result.get('source_id', source_id)
+        }
+    
+    async def add_documents(self, file_paths: Iterable[Path]) -> List[Dict[str, Any]]:
+        """Dodawanie wielu dokumentów - wynik dla każdego pliku, w kolejności `file_paths`.
+        
+        Małe dokumenty są pakowane do wspólnych żądań (najwyżej
+        RAG_CHUNKS_PER_REQUEST fragmentów lub RAG_REQUEST_MAX_KB), większe
+        wysyłane są strumieniowo jak w `add_document`.
+        """
+        paths = (Path(file_path) for file_path in file_paths)
+        return [result async for _, _, result in self._add_many(paths, self._prepare_document)]
+    
+    async def _prepare_document(self, file_path: Path) -> Dict[str, Any]:
+        """Dokument gotowy do spakowania z innymi (`document`) albo wynik, gdy wysłano go osobno"""
+        try:
+            error = self._check_document(file_path)
+            if error is not None:
+                return error
+            if file_path.stat().st_size > self.config.RAG_REQUEST_MAX_KB * 1024:
+                return await self.add_document(file_path)
             
-            # Wczytanie zawartości pliku
-            content = await self._read_file_content(file_path)
-            if not content:
+            blocks = self._document_blocks(file_path)
+            chunks = await asyncio.to_thread(
+                list, chunk_text(blocks, self.config.RAG_CHUNK_SIZE, self.config.RAG_OVERLAP)
+            )
+            if not chunks:
                 return {
                     'success': False,
                     'error': 'Nie można wczytać zawartości pliku',
                     'file': str(file_path)
                 }
+            if len(chunks) > self.config.RAG_CHUNKS_PER_REQUEST:
+                return await self._send_chunks(file_path, batched(chunks, self.config.RAG_CHUNKS_PER_REQUEST))
             
-            # Dodanie do bazy wiedzy
-            url = self.config.get_rag_add_url()
-            data = {
-                'content': content,
-                'source_id': str(file_path),
-                'metadata': {
-                    'filename': file_path.name,
-                    'file_path': str(file_path),
-                    'file_size': file_path.stat().st_size,
-                    'file_type': file_path.suffix.lower()
-                }
+            source_id = str(file_path)
+            document = {
+                'source_id': source_id,
+                'chunks': self._chunk_payload(source_id, 0, chunks),
+                'metadata': self._document_metadata(file_path)
+            }
+            return {
+                'file': source_id,
+                'document': document,
+                'size': len(json.dumps(document, ensure_ascii=False).encode('utf-8'))
             }
-            
-            response = await self.client.post(url, json=data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'file': str(file_path),
-                    'processed_chunks': result.get('processed_chunks', 0),
-                    'source_id': result.get('source_id', str(file_path))
-                }
-            else:
-                logger.error(f"Błąd dodawania dokumentu: {response.status_code} - {response.text}")
-                return {
-                    'success': False,
-                    'error': response.text,
-                    'file': str(file_path)
-                }
-                
         except Exception as e:
-            logger.error(f"Błąd dodawania dokumentu {file_path}: {e}")
+            logger.error(f"Błąd przygotowania dokumentu {file_path}: {e}")
             return {
                 'success': False,
                 'error': str(e),
                 'file': str(file_path)
             }
     
+    async def _send_batch(self, prepared: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Wysłanie wielu dokumentów jednym żądaniem - wynik dla każdego dokumentu.
+        
+        Backend zwraca `results` w kolejności dokumentów; błąd całego
+        żądania oznacza błąd każdego z nich. Backend bez endpointu
+        wsadowego (404/405) dostaje każdy dokument osobno na /rag/add.
+        """
+        if self._batch_supported is False:
+            return await self._send_each(prepared)
+        
+        url = self.config.get_rag_add_batch_url()
+        try:
+            response = await self._request(
+                "POST", url, f"dodawanie {len(prepared)} dokumentów",
+                json={'documents': [item['document'] for item in prepared]}
+            )
+            if response.status_code in (404, 405):
+                logger.info("Backend nie obsługuje wsadowego dodawania - wysyłanie dokumentów pojedynczo")
+                self._batch_supported = False
+                return await self._send_each(prepared)
+            
+            self._batch_supported = True
+            if response.status_code == 200:
+                outcomes = response.json().get('results', [])
+                return [
+                    self._batch_item_result(item, outcomes[i] if i < len(outcomes) else None)
+                    for i, item in enumerate(prepared)
+                ]
+            logger.error(f"Błąd dodawania partii dokumentów: {response.status_code} - {response.text}")
+            error = response.text
+        except Exception as e:
+            logger.error(f"Błąd dodawania partii dokumentów: {e}")
+            error = str(e)
+        return [{'success': False, 'error': error, 'file': item['file']} for item in prepared]
+    
+    async def _send_each(self, prepared: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Wysłanie przygotowanych dokumentów osobnymi żądaniami /rag/add"""
+        async def send(item: Dict[str, Any]) -> Dict[str, Any]:
+            document = item['document']
+            chunks = [chunk['content'] for chunk in document['chunks']]
+            try:
+                result = await self._send_chunks(Path(item['file']), iter([chunks]))
+            except Exception as e:
+                logger.error(f"Błąd dodawania dokumentu {item['file']}: {e}")
+                result = {'success': False, 'error': str(e), 'file': item['file']}
+            if 'content_hash' in item:
+                result['content_hash'] = item['content_hash']
+            return result
+        
+        return list(await asyncio.gather(*(send(item) for item in prepared)))
+    
+    @staticmethod
+    def _batch_item_result(prepared: Dict[str, Any], outcome: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Wynik dokumentu z odpowiedzi na wspólne żądanie"""
+        if outcome is None:
+            result = {'success': False, 'error': 'Brak wyniku dokumentu w odpowiedzi', 'file': prepared['file']}
+        elif not outcome.get('success', True):
+            result = {'success': False, 'error': outcome.get('error', 'Nieznany błąd'), 'file': prepared['file']}
+        else:
+            document = prepared['document']
+            result = {
+                'success': True,
+                'file': prepared['file'],
+                'processed_chunks': outcome.get('processed_chunks', len(document['chunks'])),
+                'source_id': outcome.get('source_id', document['source_id'])
+            }
+        if 'content_hash' in prepared:
+            result['content_hash'] = prepared['content_hash']
+        return result
+    
+    async def _add_many(
+        self,
+        items: Iterable[T],
+        prepare: Callable[[T], Awaitable[Dict[str, Any]]]
+    ) -> AsyncIterator[Tuple[int, T, Dict[str, Any]]]:
+        """Współbieżne przygotowanie dokumentów i pakowanie ich do wspólnych żądań.
+        
+        Gotowe dokumenty trafiają do bieżącej partii, która jest wysyłana
+        po przekroczeniu limitu fragmentów lub rozmiaru; równolegle leci
+        najwyżej tyle partii, ile zadań potoku. Wyniki oddawane są
+        w kolejności `items`.
+        """
+        workers = self.config.get_max_concurrency()
+        max_items = max(1, self.config.RAG_CHUNKS_PER_REQUEST)
+        max_bytes = self.config.RAG_REQUEST_MAX_KB * 1024
+        loop = asyncio.get_running_loop()
+        waiting: Dict[int, Tuple[T, asyncio.Future]] = {}
+        sending: Set[asyncio.Task] = set()
+        batch: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        batch_items = batch_bytes = 0
+        next_index = 0
+        
+        def send(pending: List[Tuple[Dict[str, Any], asyncio.Future]]):
+            async def run():
+                error = 'Brak wyniku dokumentu w odpowiedzi'
+                try:
+                    results = await self._send_batch([prepared for prepared, _ in pending])
+                    for (_, future), result in zip(pending, results):
+                        future.set_result(result)
+                except Exception as e:
+                    logger.error(f"Błąd dodawania partii dokumentów: {e}")
+                    error = str(e)
+                finally:
+                    # Każdy dokument partii musi dostać wynik - na jego future czeka pętla niżej
+                    for prepared, future in pending:
+                        if not future.done():
+                            future.set_result({'success': False, 'error': error, 'file': prepared['file']})
+            
+            task = asyncio.create_task(run())
+            sending.add(task)
+            task.add_done_callback(sending.discard)
+        
+        async for index, item, prepared in run_ordered(items, prepare, workers):
+            future = loop.create_future()
+            waiting[index] = (item, future)
+            if 'document' not in prepared:
+                future.set_result(prepared)
+            else:
+                chunks = len(prepared['document']['chunks'])
+                if batch and (batch_items + chunks > max_items or batch_bytes + prepared['size'] > max_bytes):
+                    send(batch)
+                    batch, batch_items, batch_bytes = [], 0, 0
+                batch.append((prepared, future))
+                batch_items += chunks
+                batch_bytes += prepared['size']
+            
+            while len(sending) >= workers:
+                await asyncio.wait(sending, return_when=asyncio.FIRST_COMPLETED)
+            while next_index in waiting and waiting[next_index][1].done():
+                item, future = waiting.pop(next_index)
+                yield next_index, item, future.result()
+                next_index += 1
+        
+        if batch:
+            send(batch)
+        while waiting:
+            item, future = waiting.pop(next_index)
+            yield next_index, item, await future
+            next_index += 1
+    
     async def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Wyszukiwanie w bazie wiedzy"""
         try:
@@ -102,11 +451,12 @@ class RAGManager:
                 'min_similarity': self.config.RAG_SIMILARITY_THRESHOLD
             }
             
-            response = await self.client.post(url, json=data)
+            response = await self._request("POST", url, "wyszukiwanie", park=False, json=data)
             
             if response.status_code == 200:
-                result = response.json()
-                return result.get('results', [])
+                results = response.json().get('results', [])
+                self._store_search(query, results)
+                return results
             else:
                 logger.error(f"Błąd wyszukiwania: {response.status_code} - {response.text}")
                 return []
@@ -115,12 +465,21 @@ class RAGManager:
             logger.error(f"Błąd wyszukiwania: {e}")
             return []
     
+    def _store_search(self, query: str, results: List[Dict[str, Any]]):
+        """Zapisanie wyszukiwania w magazynie wyników"""
+        if self.store is None:
+            return
+        try:
+            self.store.add_rag_search(query, results)
+        except Exception as e:
+            logger.error(f"Błąd zapisu wyszukiwania w magazynie: {e}")
+    
     async def list_documents(self) -> List[Dict[str, Any]]:
         """Lista dokumentów w bazie wiedzy"""
         try:
             # Użyj endpointu do listowania dokumentów (jeśli istnieje)
-            url = f"{self.config.BACKEND_URL}/api/v2/rag/documents"
-            response = await self.client.get(url)
+            url = self.config.get_rag_documents_url()
+            response = await self._request("GET", url, "lista dokumentów", park=False)
             
             if response.status_code == 200:
                 return response.json().get('documents', [])
@@ -140,59 +499,131 @@ class RAGManager:
         if not wiedza_dir.exists():
             return documents
         
-        for file_path in wiedza_dir.glob("*"):
-            if self._is_supported_document(file_path):
-                documents.append({
-                    'filename': file_path.name,
-                    'file_path': str(file_path),
-                    'file_size': file_path.stat().st_size,
-                    'file_type': file_path.suffix.lower(),
-                    'modified': file_path.stat().st_mtime
-                })
+        for entry in scan_directory(wiedza_dir, DOCUMENT_EXTENSIONS, recursive=self.config.SCAN_RECURSIVE):
+            documents.append({
+                'filename': entry.name,
+                'file_path': str(entry.path),
+                'file_size': entry.stat.st_size,
+                'file_type': entry.suffix.lower(),
+                'modified': entry.stat.st_mtime
+            })
         
         return documents
     
     def _is_supported_document(self, file_path: Path) -> bool:
         """Sprawdzenie czy dokument jest obsługiwany"""
-        supported_extensions = ['.txt', '.md', '.pdf', '.docx', '.html']
-        return file_path.suffix.lower() in supported_extensions
+        return file_path.suffix.lower() in DOCUMENT_EXTENSIONS
+    
+    def _document_blocks(self, file_path: Path,
+                         progress: Optional[Callable[[int, int], None]] = None) -> Iterable[str]:
+        """Tekst dokumentu jako leniwy strumień bloków (PDF - strona po stronie).
+        
+        Odczyt następuje dopiero przy iteracji, która odbywa się w wątku
+        roboczym razem z podziałem na fragmenty.
+        """
+        if file_path.suffix.lower() == '.pdf':
+            return iter_pdf_text(
+                str(file_path), max_workers=self.config.PROCESS_POOL_WORKERS, progress=progress
+            )
+        return iter_file_text(file_path, max(self.config.RAG_CHUNK_SIZE * 4, 64 * 1024))
     
-    async def _read_file_content(self, file_path: Path) -> Optional[str]:
-        """Wczytanie zawartości pliku"""
+    async def remove_document(self, source_id: str) -> Dict[str, Any]:
+        """Usunięcie dokumentu z bazy wiedzy.
+        
+        Gdy backend nie obsługuje DELETE (405), jest to zapamiętywane
+        i kolejne usunięcia kończą się od razu wynikiem z `unsupported`.
+        """
+        if self._delete_supported is False:
+            return {'success': False, 'error': 'Backend nie obsługuje usuwania dokumentów',
+                    'source_id': source_id, 'unsupported': True}
         try:
-            if file_path.suffix.lower() == '.pdf':
-                return await self._read_pdf_content(file_path)
-            else:
-                # Dla plików tekstowych
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return f.read()
+            response = await self._request(
+                "DELETE", self.config.get_rag_documents_url(), f"usuwanie {source_id}",
+                params={'source_id': source_id}
+            )
+            if response.status_code == 405:
+                logger.warning("Backend nie obsługuje usuwania dokumentów RAG - stare fragmenty zostają w bazie")
+                self._delete_supported = False
+                return {'success': False, 'error': 'Backend nie obsługuje usuwania dokumentów',
+                        'source_id': source_id, 'unsupported': True}
+            self._delete_supported = True
+            # 404 - dokumentu już nie ma w bazie
+            if response.status_code in (200, 204, 404):
+                return {'success': True, 'source_id': source_id}
+            logger.error(f"Błąd usuwania dokumentu: {response.status_code} - {response.text}")
+            return {'success': False, 'error': response.text, 'source_id': source_id}
         except Exception as e:
-            logger.error(f"Błąd wczytywania pliku {file_path}: {e}")
-            return None
+            logger.error(f"Błąd usuwania dokumentu {source_id}: {e}")
+            return {'success': False, 'error': str(e), 'source_id': source_id}
     
-    async def _read_pdf_content(self, file_path: Path) -> Optional[str]:
-        """Wczytanie zawartości PDF"""
+    async def _prepare_sync(self, entry: ScannedFile) -> Dict[str, Any]:
+        """Przygotowanie dokumentu, jeśli jego zawartość zmieniła się od ostatniej synchronizacji.
+        
+        Zmieniony dokument wysyłany jest pod tym samym `source_id` (ścieżką),
+        więc jego fragmenty `source_id#numer` nadpisują poprzednią wersję
+        bez wcześniejszego usuwania.
+        """
+        if self.manifest is None:
+            return await self._prepare_document(entry.path)
+        
+        path = str(entry.path)
         try:
-            # Użyj biblioteki pdfplumber lub podobnej
-            import pdfplumber
-            
-            content = ""
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        content += text + "\n"
-            
-            return content.strip()
-        except ImportError:
-            logger.warning("pdfplumber nie jest zainstalowane, nie można wczytać PDF")
-            return None
-        except Exception as e:
-            logger.error(f"Błąd wczytywania PDF {file_path}: {e}")
-            return None
+            content_hash = await asyncio.to_thread(compute_file_hash, entry.path)
+        except OSError as e:
+            return {'success': False, 'error': str(e), 'file': path}
+        
+        previous_id = self.manifest.source_id(path)
+        if previous_id is not None and self.manifest.content_hash(path) == content_hash:
+            # Zmieniony tylko mtime (np. kopia, touch) - bez ponownego indeksowania
+            self.manifest.record(entry, content_hash, previous_id)
+            return {'success': True, 'file': path, 'unchanged': True, 'source_id': previous_id}
+        
+        prepared = await self._prepare_document(entry.path)
+        prepared['content_hash'] = content_hash
+        return prepared
+    
+    async def _remove_replaced(self, replaced: List[Tuple[str, str]]):
+        """Usunięcie poprzednich wersji dokumentów, którym backend nadał nowy `source_id`"""
+        async def remove(item: Tuple[str, str]) -> Dict[str, Any]:
+            return await self.remove_document(item[1])
+        
+        async for _, (path, source_id), result in run_ordered(replaced, remove, self.config.get_max_concurrency()):
+            if not result['success'] and not result.get('unsupported', False):
+                logger.warning(f"Nie usunięto poprzedniej wersji {Path(path).name} ({source_id}): {result['error']}")
     
-    async def add_directory(self, directory_path: Path) -> Dict[str, Any]:
-        """Dodawanie wszystkich dokumentów z katalogu"""
+    async def _remove_missing(self, directory_path: Path, seen: List[str]) -> int:
+        """Usunięcie z bazy wiedzy dokumentów skasowanych z katalogu"""
+        if self.manifest is None:
+            return 0
+        
+        missing = self.manifest.missing(directory_path, seen)
+        
+        async def remove(item: Tuple[str, str]) -> Dict[str, Any]:
+            return await self.remove_document(item[1])
+        
+        removed = 0
+        async for _, (path, _), result in run_ordered(missing, remove, self.config.get_max_concurrency()):
+            if result['success']:
+                self.manifest.remove(path)
+                removed += 1
+                console.print(f"[blue]🗑️ Usunięto z bazy: {Path(path).name}[/blue]")
+            elif result.get('unsupported', False):
+                console.print(f"[yellow]⚠️ Backend nie usuwa dokumentów - {Path(path).name} zostaje w bazie[/yellow]")
+            else:
+                console.print(f"[red]❌ Nie można usunąć z bazy: {Path(path).name}[/red]")
+        return removed
+    
+    async def add_directory(self, directory_path: Path, force: bool = False) -> Dict[str, Any]:
+        """Synchronizacja dokumentów z katalogu z bazą wiedzy.
+        
+        Dokumenty są przetwarzane współbieżnie: odczyt tekstu PDF w puli
+        procesów, małe dokumenty pakowane do wspólnych żądań, wysyłka
+        w granicach adaptacyjnego limitu żądań, a wyniki raportowane
+        w kolejności skanowania. Przy włączonym
+        RAG_INCREMENTAL_SYNC wysyłane są tylko pliki nowe i zmienione od
+        ostatniej synchronizacji, a pliki usunięte z katalogu są usuwane
+        z bazy. `force` wysyła ponownie wszystkie dokumenty.
+        """
         results = []
         
         if not directory_path.exists():
@@ -202,30 +633,59 @@ class RAGManager:
                 'results': results
             }
         
-        # Znajdź wszystkie obsługiwane dokumenty
-        supported_files = []
-        for ext in ['.txt', '.md', '.pdf', '.docx', '.html']:
-            supported_files.extend(directory_path.glob(f"*{ext}"))
-            supported_files.extend(directory_path.glob(f"*{ext.upper()}"))
+        seen: List[str] = []
+        replaced: List[Tuple[str, str]] = []
+        unchanged = 0
         
-        console.print(f"[blue]📚 Znaleziono {len(supported_files)} dokumentów do dodania[/blue]")
+        def changed_files():
+            """Dokumenty do wysłania - już w trakcie skanowania katalogu"""
+            nonlocal unchanged
+            for entry in scan_directory(directory_path, DOCUMENT_EXTENSIONS, recursive=self.config.SCAN_RECURSIVE):
+                seen.append(str(entry.path))
+                if self.manifest is not None and not force and self.manifest.is_unchanged(entry):
+                    unchanged += 1
+                    continue
+                yield entry
         
-        # Dodaj dokumenty
-        for i, file_path in enumerate(supported_files, 1):
-            console.print(f"[blue]📄 Dodawanie {i}/{len(supported_files)}: {file_path.name}[/blue]")
-            result = await self.add_document(file_path)
-            results.append(result)
+        # Dodaj dokumenty - równolegle, w granicach adaptacyjnego limitu
+        if self.retry_policy.budget is not None:
+            self.retry_policy.budget.reset()
+        try:
+            async for _, entry, result in self._add_many(changed_files(), self._prepare_sync):
+                if result.get('unchanged', False):
+                    unchanged += 1
+                    continue
+                if self.manifest is not None and result.get('success', False):
+                    previous_id = self.manifest.source_id(str(entry.path))
+                    if previous_id is not None and previous_id != result['source_id']:
+                        replaced.append((str(entry.path), previous_id))
+                    self.manifest.record(entry, result['content_hash'], result['source_id'])
+                status = "✅" if result.get('success', False) else "❌"
+                console.print(
+                    f"[blue]📄 {status} {len(results) + 1}: {entry.name} "
+                    f"(limit: {self.limiter.current_limit})[/blue]"
+                )
+                results.append(result)
             
-            # Krótka przerwa między plikami
-            await asyncio.sleep(0.1)
+            await self._remove_replaced(replaced)
+            removed = await self._remove_missing(directory_path, seen)
+        finally:
+            if self.manifest is not None:
+                self.manifest.save()
         
         successful = sum(1 for r in results if r.get('success', False))
+        console.print(
+            f"[blue]📚 Przetworzono {len(results)} dokumentów "
+            f"(bez zmian: {unchanged}, usunięto: {removed})[/blue]"
+        )
         
         return {
             'success': True,
-            'total_files': len(supported_files),
+            'total_files': len(results),
             'successful': successful,
-            'failed': len(supported_files) - successful,
+            'failed': len(results) - successful,
+            'unchanged': unchanged,
+            'removed': removed,
             'results': results
         }
     
@@ -233,9 +693,12 @@ class RAGManager:
         """Czyszczenie bazy wiedzy"""
         try:
             url = f"{self.config.BACKEND_URL}/api/v2/rag/clear"
-            response = await self.client.post(url)
+            response = await self._request("POST", url, "czyszczenie bazy", park=False)
             
             if response.status_code == 200:
+                if self.manifest is not None:
+                    self.manifest.clear()
+                    self.manifest.save()
                 return {
                     'success': True,
                     'message': 'Baza wiedzy została wyczyszczona'
@@ -256,6 +719,9 @@ class RAGManager:
     
     async def close(self):
         """Zamknięcie klienta HTTP"""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
         await self.client.aclose()
     
     def __del__(self):
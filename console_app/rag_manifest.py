@@ -0,0 +1,93 @@
+"""
+Manifest dokumentów zaindeksowanych w bazie wiedzy RAG
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from .file_scanner import ScannedFile
+from .file_utils import write_json_atomic
+
+logger = structlog.get_logger()
+
+
+class RAGManifest:
+    """Stan dokumentów wysłanych do bazy wiedzy, zapisywany na dysku.
+
+    Dla każdej ścieżki pamiętany jest rozmiar, mtime, skrót zawartości
+    i `source_id` nadany przez backend. Plik o niezmienionym rozmiarze
+    i mtime jest pomijany bez czytania, a po zmianie mtime porównywany
+    jest skrót - dopiero zmieniona zawartość trafia ponownie do backendu.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries: Dict[str, Tuple[int, int, str, str]] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """Wczytanie manifestu"""
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = {path: tuple(entry) for path, entry in json.load(f).items()}
+        except Exception as e:
+            logger.warning(f"Nie można wczytać manifestu RAG: {e}")
+            self._entries = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._entries
+
+    def is_unchanged(self, entry: ScannedFile) -> bool:
+        """Czy plik ma ten sam rozmiar i mtime co przy ostatnim wysłaniu"""
+        known = self._entries.get(str(entry.path))
+        return known is not None and known[0] == entry.stat.st_size and known[1] == entry.stat.st_mtime_ns
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """Skrót zawartości zapamiętany dla pliku"""
+        known = self._entries.get(path)
+        return known[2] if known else None
+
+    def source_id(self, path: str) -> Optional[str]:
+        """Identyfikator dokumentu w backendzie"""
+        known = self._entries.get(path)
+        return known[3] if known else None
+
+    def record(self, entry: ScannedFile, content_hash: str, source_id: str):
+        """Zapamiętanie wysłanego (lub niezmienionego) dokumentu"""
+        self._entries[str(entry.path)] = (entry.stat.st_size, entry.stat.st_mtime_ns, content_hash, source_id)
+        self._dirty = True
+
+    def remove(self, path: str):
+        """Usunięcie dokumentu z manifestu"""
+        if self._entries.pop(path, None) is not None:
+            self._dirty = True
+
+    def missing(self, directory: Path, seen: Iterable[str]) -> List[Tuple[str, str]]:
+        """Dokumenty z katalogu, których nie ma już na dysku: (ścieżka, source_id)"""
+        prefix = os.path.join(str(directory), '')
+        seen = set(seen)
+        return [
+            (path, entry[3]) for path, entry in self._entries.items()
+            if path.startswith(prefix) and path not in seen and not os.path.exists(path)
+        ]
+
+    def clear(self):
+        """Wyczyszczenie manifestu (np. po wyczyszczeniu bazy wiedzy)"""
+        if self._entries:
+            self._entries.clear()
+            self._dirty = True
+
+    def save(self):
+        """Zapis manifestu, jeśli się zmienił"""
+        if self._dirty:
+            write_json_atomic(self.path, self._entries)
+            self._dirty = False
@@ -0,0 +1,292 @@
+"""
+Parser tekstu OCR polskich paragonów fiskalnych
+"""
+
+import asyncio
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+import structlog
+
+from .workers import run_in_process
+
+logger = structlog.get_logger()
+
+# Wersja reguł parsowania - zmiana unieważnia zapisane rekordy
+PARSER_VERSION = 1
+
+_AMOUNT = r'-?\d{1,7}[.,]\d{2}'
+_QUANTITY = r'\d{1,5}(?:[.,]\d{1,3})?'
+
+# Sieci handlowe rozpoznawane w nagłówku (nazwa w wyniku, wzorzec)
+SHOP_PATTERNS = [
+    (name, re.compile(pattern, re.IGNORECASE))
+    for name, pattern in (
+        ('Biedronka', r'biedronka|jeronimo\s+martins'),
+        ('Lidl', r'\blidl\b'),
+        ('Żabka', r'[żz]abka'),
+        ('Kaufland', r'kaufland'),
+        ('Auchan', r'auchan'),
+        ('Carrefour', r'carrefour'),
+        ('Netto', r'\bnetto\b'),
+        ('Dino', r'\bdino\b'),
+        ('Aldi', r'\baldi\b'),
+        ('Stokrotka', r'stokrotka'),
+        ('Lewiatan', r'lewiatan'),
+        ('Polomarket', r'polo\s*market'),
+        ('Intermarché', r'intermarch[eé]'),
+        ('Rossmann', r'rossmann'),
+        ('Hebe', r'\bhebe\b'),
+    )
+]
+
+NIP_PATTERN = re.compile(r'NIP\W{0,3}(?:PL)?\s*(\d{3}[-\s]?\d{2,3}[-\s]?\d{2}[-\s]?\d{2,3})', re.IGNORECASE)
+NIP_WEIGHTS = (6, 5, 7, 2, 3, 4, 5, 6, 7)
+
+DATE_PATTERNS = [
+    (re.compile(r'\b(20\d{2})[-./](\d{2})[-./](\d{2})\b'), ('year', 'month', 'day')),
+    (re.compile(r'\b(\d{2})[-./](\d{2})[-./](20\d{2})\b'), ('day', 'month', 'year')),
+]
+
+# Pozycja z ilością: "Mleko 3,2% 1L   2 x3,49   6,98 C"
+ITEM_PATTERN = re.compile(
+    rf'^(?P<name>.*?\S)\s+(?P<quantity>{_QUANTITY})\s*(?:szt\.?|kg|l)?\s*[x*×]\s*'
+    rf'(?P<unit_price>{_AMOUNT})\s+(?P<total>{_AMOUNT})\s*(?P<vat>[A-G])?$',
+    re.IGNORECASE
+)
+# Pozycja bez ilości: "Reklamówka   0,99 A"
+SIMPLE_ITEM_PATTERN = re.compile(rf'^(?P<name>.*?[^\W\d_].*?)\s+(?P<total>{_AMOUNT})\s*(?P<vat>[A-G])$')
+DISCOUNT_PATTERN = re.compile(rf'^(?:rabat|opust|promocja)\b.*?(?P<amount>{_AMOUNT})\s*[A-G]?$', re.IGNORECASE)
+
+VAT_RATE_PATTERN = re.compile(
+    rf'^PTU\s+(?P<group>[A-G])\s+(?P<rate>\d{{1,2}}(?:[.,]\d{{1,2}})?)\s*%\s+(?P<amount>{_AMOUNT})$',
+    re.IGNORECASE
+)
+TAXABLE_PATTERN = re.compile(
+    rf'^SPRZEDA[ŻZ]\s+OPODATK\w*\.?\s+(?P<group>[A-G])\s+(?P<amount>{_AMOUNT})$',
+    re.IGNORECASE
+)
+TOTAL_VAT_PATTERN = re.compile(rf'^SUMA\s+PTU\s+(?P<amount>{_AMOUNT})$', re.IGNORECASE)
+TOTAL_PATTERN = re.compile(rf'^SUMA\s*(?:PLN|ZŁ|:)?\s*:?\s*(?P<amount>{_AMOUNT})\s*(?:PLN|ZŁ)?$', re.IGNORECASE)
+
+# Początek i koniec części z pozycjami
+ITEMS_START_PATTERN = re.compile(r'PARAGON\s+FISKALNY', re.IGNORECASE)
+SUMMARY_PATTERN = re.compile(r'^(?:SPRZEDA[ŻZ]\s+OPODATK|SUMA|PTU\s|RAZEM|DO\s+ZAP[ŁL]ATY)', re.IGNORECASE)
+
+# Wiersze, które nie są pozycjami mimo kwoty na końcu
+NON_ITEM_PATTERN = re.compile(
+    r'^(?:RESZTA|GOT[ÓO]WKA|KARTA|P[ŁL]ATNO|WP[ŁL]ATA|NR\s|KASA|KASJER|ROZLICZENIE)',
+    re.IGNORECASE
+)
+
+# Kategorie produktów rozpoznawane po nazwie pozycji (pierwsze dopasowanie wygrywa)
+OTHER_CATEGORY = 'Inne'
+CATEGORY_PATTERNS = [
+    (name, re.compile(pattern))
+    for name, pattern in (
+        ('Nabiał', r'mlek|ser\b|sera|jogurt|kefir|masł|śmietan|twaróg|jaja|jajk'),
+        ('Pieczywo', r'chleb|bułk|bagiet|rogal|pieczyw|drożdżów'),
+        ('Mięso i ryby', r'mięs|kurcz|szynk|kiełb|parów|schab|wołow|wieprz|indyk|ryb|łosoś|tuńczyk|filet'),
+        ('Owoce i warzywa', r'jabł|banan|pomarańcz|cytryn|pomidor|ogór|ziemniak|marchew|cebul|sałat|papry|owoc|warzyw'),
+        ('Napoje', r'woda|sok\b|soki|napój|cola|kawa|herbat'),
+        ('Alkohol', r'piwo|wino|wódk|whisk'),
+        ('Słodycze i przekąski', r'czekolad|baton|cukierk|ciastk|chips|wafl|lody'),
+        ('Chemia i higiena', r'proszek|płyn|mydł|szampon|papier toal|pasta do|dezodor|chusteczk'),
+        ('Opłaty i torby', r'reklamów|torb|kaucj'),
+    )
+]
+
+
+@lru_cache(maxsize=4096)
+def item_category(name: str) -> str:
+    """Kategoria produktu na podstawie nazwy pozycji"""
+    lowered = name.lower()
+    for category, pattern in CATEGORY_PATTERNS:
+        if pattern.search(lowered):
+            return category
+    return OTHER_CATEGORY
+
+
+def _amount(value: str) -> float:
+    return round(float(value.replace(',', '.')), 2)
+
+
+def _valid_nip(digits: str) -> bool:
+    """Sprawdzenie cyfry kontrolnej NIP"""
+    if len(digits) != 10:
+        return False
+    checksum = sum(int(d) * w for d, w in zip(digits, NIP_WEIGHTS)) % 11
+    return checksum == int(digits[9])
+
+
+def _find_date(text: str) -> Optional[str]:
+    """Pierwsza poprawna data w tekście (RRRR-MM-DD)"""
+    for pattern, order in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            parts = dict(zip(order, match.groups()))
+            if 1 <= int(parts['month']) <= 12 and 1 <= int(parts['day']) <= 31:
+                return f"{parts['year']}-{parts['month']}-{parts['day']}"
+    return None
+
+
+def _find_shop(lines: List[str]) -> Optional[str]:
+    """Nazwa sklepu - znana sieć albo pierwszy wiersz nagłówka"""
+    header = lines[:8]
+    for line in header:
+        for name, pattern in SHOP_PATTERNS:
+            if pattern.search(line):
+                return name
+    for line in header:
+        if sum(c.isalpha() for c in line) >= 3 and not NIP_PATTERN.search(line):
+            return line.strip(' "*')
+    return None
+
+
+def parse_receipt_text(text: str) -> Dict[str, Any]:
+    """Zamiana tekstu paragonu na rekord strukturalny.
+
+    Zwraca sklep, NIP, datę, pozycje (nazwa, ilość, cena jednostkowa,
+    wartość, grupa PTU, rabat), stawki PTU, kwotę PTU i sumę. Pola, których
+    nie udało się odczytać, mają wartość None. `complete` oznacza, że suma
+    pozycji zgadza się z sumą paragonu.
+    """
+    lines = [' '.join(line.split()) for line in text.splitlines()]
+    lines = [line for line in lines if line]
+
+    nip = None
+    for match in NIP_PATTERN.finditer(text):
+        digits = re.sub(r'\D', '', match.group(1))
+        if _valid_nip(digits):
+            nip = digits
+            break
+
+    # Pozycje zaczynają się po "PARAGON FISKALNY" (jeśli został rozpoznany)
+    start = next((i + 1 for i, line in enumerate(lines) if ITEMS_START_PATTERN.search(line)), 0)
+
+    items: List[Dict[str, Any]] = []
+    vat_rates: Dict[str, float] = {}
+    vat_amounts: Dict[str, float] = {}
+    taxable: Dict[str, float] = {}
+    total = None
+    total_vat = None
+    in_summary = False
+
+    for line in lines[start:]:
+        if SUMMARY_PATTERN.match(line):
+            in_summary = True
+
+        if in_summary:
+            match = VAT_RATE_PATTERN.match(line)
+            if match:
+                group = match.group('group').upper()
+                vat_rates[group] = float(match.group('rate').replace(',', '.'))
+                vat_amounts[group] = _amount(match.group('amount'))
+                continue
+            match = TAXABLE_PATTERN.match(line)
+            if match:
+                taxable[match.group('group').upper()] = _amount(match.group('amount'))
+                continue
+            match = TOTAL_VAT_PATTERN.match(line)
+            if match:
+                total_vat = _amount(match.group('amount'))
+                continue
+            match = TOTAL_PATTERN.match(line)
+            if match and total is None:
+                total = _amount(match.group('amount'))
+            continue
+
+        match = DISCOUNT_PATTERN.match(line)
+        if match:
+            if items:
+                discount = -abs(_amount(match.group('amount')))
+                items[-1]['discount'] = round(items[-1]['discount'] + discount, 2)
+            continue
+
+        if NON_ITEM_PATTERN.match(line):
+            continue
+
+        match = ITEM_PATTERN.match(line)
+        if match:
+            items.append({
+                'name': match.group('name'),
+                'quantity': float(match.group('quantity').replace(',', '.')),
+                'unit_price': _amount(match.group('unit_price')),
+                'total': _amount(match.group('total')),
+                'vat_group': (match.group('vat') or '').upper() or None,
+                'discount': 0.0
+            })
+            continue
+
+        match = SIMPLE_ITEM_PATTERN.match(line)
+        if match:
+            value = _amount(match.group('total'))
+            items.append({
+                'name': match.group('name'),
+                'quantity': 1.0,
+                'unit_price': value,
+                'total': value,
+                'vat_group': match.group('vat').upper(),
+                'discount': 0.0
+            })
+
+    items_total = round(sum(item['total'] + item['discount'] for item in items), 2)
+    if total_vat is None and vat_amounts:
+        total_vat = round(sum(vat_amounts.values()), 2)
+
+    return {
+        'shop': _find_shop(lines),
+        'nip': nip,
+        'date': _find_date(text),
+        'items': items,
+        'vat_rates': vat_rates,
+        'vat_amounts': vat_amounts,
+        'taxable_amounts': taxable,
+        'total_vat': total_vat,
+        'total': total,
+        'items_total': items_total,
+        'complete': total is not None and bool(items) and abs(items_total - total) < 0.01,
+        'parser_version': PARSER_VERSION
+    }
+
+
+def parse_receipt_texts(texts: List[str]) -> List[Dict[str, Any]]:
+    """Parsowanie partii tekstów (funkcja dla puli procesów)"""
+    return [parse_receipt_text(text) for text in texts]
+
+
+class ReceiptParser:
+    """Etap parsowania wyników OCR.
+
+    Pojedyncze paragony parsowane są na miejscu (reguły są prekompilowane,
+    a tekst paragonu krótki). Duże zbiory tekstów dzielone są na partie
+    po RECEIPT_PARSER_BATCH_SIZE i parsowane we wspólnej puli procesów.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.batch_size = max(1, config.RECEIPT_PARSER_BATCH_SIZE)
+
+    def parse(self, text: str) -> Optional[Dict[str, Any]]:
+        """Rekord strukturalny albo None dla pustego tekstu"""
+        if not text or not text.strip():
+            return None
+        try:
+            return parse_receipt_text(text)
+        except Exception as e:
+            logger.error(f"Błąd parsowania paragonu: {e}")
+            return None
+
+    async def parse_many(self, texts: Iterable[str]) -> List[Dict[str, Any]]:
+        """Parsowanie wielu tekstów partiami w puli procesów (kolejność zachowana)"""
+        texts = list(texts)
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(chunks) <= 1:
+            # Jedna partia - bez kosztu przesyłania do puli, ale poza pętlą zdarzeń
+            return await asyncio.to_thread(parse_receipt_texts, texts)
+
+        parsed = await asyncio.gather(*(
+            run_in_process(parse_receipt_texts, chunk, max_workers=self.config.PROCESS_POOL_WORKERS)
+            for chunk in chunks
+        ))
+        return [record for chunk in parsed for record in chunk]
@@ -5,39 +5,145 @@ Moduł do przetwarzania paragonów
 import asyncio
 import mimetypes
 import structlog
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Any, Sequence, Sized, Union
 
 import httpx
 from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, SpinnerColumn, TaskID, TextColumn, TimeElapsedColumn
 
 from .config import Config
+from .batch_journal import BatchJournal
+from .concurrency import create_limiter
+from .file_scanner import RECEIPT_EXTENSIONS, ScannedFile, scan_directory
+from .file_utils import compute_file_hash
+from .http_utils import (
+    HTTPX_NOT_SENT_ERRORS, HTTPX_TRANSIENT_ERRORS, create_circuit_breakers, create_retry_policy,
+    httpx_rejected_retry_hint, httpx_retry_hint, retry_async
+)
+from .image_preprocessing import ImagePreprocessor
+from .local_ocr import LocalOCREngine
+from .pdf_processing import PdfPageProcessor, extract_pdf_text
+from .quality_check import ImageQualityChecker
+from .perceptual_hash import DuplicateDetector
+from .pipeline import ProcessingStats, run_ordered
+from .receipt_parser import PARSER_VERSION, ReceiptParser
+from .result_cache import ResultCache
+from .result_store import STATUS_SUCCESS, ResultStore
+from .streaming_upload import MultipartFileUpload
 
 logger = structlog.get_logger()
 console = Console()
 
+# Oznaczenie wyników odczytanych z warstwy tekstowej PDF (bez OCR)
+TEXT_LAYER_ENGINE = 'pdf_text_layer'
+
+# Sygnatury nagłówków obsługiwanych formatów (walidacja lokalna)
+FILE_SIGNATURES = {
+    '.jpg': [b'\xff\xd8\xff'],
+    '.jpeg': [b'\xff\xd8\xff'],
+    '.png': [b'\x89PNG\r\n\x1a\n'],
+    '.bmp': [b'BM'],
+    '.tiff': [b'II*\x00', b'MM\x00*'],
+    '.pdf': [b'%PDF'],
+}
+
 
 class ReceiptProcessor:
     """Klasa do przetwarzania paragonów"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, force: bool = False):
         self.config = config
+        self.force = force
         self.client = httpx.AsyncClient(
             timeout=self.config.HTTP_TIMEOUT,
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+            limits=httpx.Limits(
+                max_keepalive_connections=5,
+                max_connections=max(10, self.config.get_max_concurrency())
+            )
         )
+        self.limiter = create_limiter(self.config)
+        self.retry_policy = create_retry_policy(self.config)
+        self.breakers = create_circuit_breakers(self.config, probe=self._probe_backend)
+        # None - nieznane, False - backend nie ma endpointu łączonego
+        self._combined_supported: Optional[bool] = None
+        
+        self.cache: Optional[ResultCache] = None
+        if self.config.RESULT_CACHE_ENABLED:
+            self.cache = ResultCache(
+                self.config.get_result_cache_dir(),
+                max_size_bytes=self.config.RESULT_CACHE_MAX_SIZE_MB * 1024 * 1024,
+                max_age_seconds=self.config.RESULT_CACHE_MAX_AGE_DAYS * 86400
+            )
+        
+        self.parser = ReceiptParser(self.config) if self.config.RECEIPT_PARSING_ENABLED else None
+        self.store: Optional[ResultStore] = None
+        if self.config.RESULT_STORE_ENABLED:
+            self.store = ResultStore(
+                self.config.get_result_store_path(), self.config.RESULT_STORE_BATCH_SIZE
+            )
+        self.duplicates = DuplicateDetector(self.config, self.store) if self.config.DUPLICATE_DETECTION else None
+        
+        self.local_ocr = self._create_local_ocr()
+        self.pdf_pages: Optional[PdfPageProcessor] = None
+        if self.config.PDF_SPLIT_PAGES:
+            self.pdf_pages = PdfPageProcessor(self.config)
+        
+        self.quality_checker: Optional[ImageQualityChecker] = None
+        if self.config.QUALITY_CHECK_ENABLED:
+            self.quality_checker = ImageQualityChecker(self.config)
+        
+        self.preprocessor: Optional[ImagePreprocessor] = None
+        if self.config.PREPROCESS_IMAGES:
+            self.preprocessor = ImagePreprocessor(self.config)
+    
+    def _create_local_ocr(self) -> Optional[LocalOCREngine]:
+        """Lokalny silnik OCR według OCR_ENGINE (backend / local / auto)"""
+        engine = self.config.OCR_ENGINE
+        if engine == 'backend':
+            return None
+        
+        local_ocr = LocalOCREngine(self.config)
+        if engine == 'auto' and not local_ocr.is_available():
+            logger.info("Lokalny OCR niedostępny - paragony będą przetwarzane przez backend")
+            return None
+        return local_ocr
+    
+    @property
+    def uses_local_ocr(self) -> bool:
+        """Czy paragony są rozpoznawane lokalnie (bez backendu)"""
+        return self.local_ocr is not None
     
     async def check_backend_connection(self) -> bool:
         """Sprawdzenie połączenia z backendem"""
         try:
             url = self.config.get_backend_health_url()
-            response = await self.client.get(url)
+            response = await retry_async(
+                lambda: self.client.get(url), self.retry_policy,
+                retry_hint=httpx_retry_hint, description="health check"
+            )
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Błąd połączenia z backendem: {e}")
             return False
     
+    async def _probe_backend(self) -> bool:
+        """Sonda zdrowia dla bezpieczników - pojedyncze, krótkie żądanie"""
+        response = await self.client.get(self.config.get_backend_health_url(), timeout=5)
+        return response.status_code == 200
+    
     async def process_file(self, file_path: Path) -> Dict[str, Any]:
+        """Przetwarzanie pojedynczego pliku paragonu (wynik trafia do magazynu wyników)"""
+        result = await self._process_file(file_path)
+        if self.store is not None:
+            try:
+                self.store.add_receipt_result(result)
+            except Exception as e:
+                logger.error(f"Błąd zapisu wyniku {file_path} w magazynie: {e}")
+        return result
+    
+    async def _process_file(self, file_path: Path) -> Dict[str, Any]:
         """Przetwarzanie pojedynczego pliku paragonu"""
         try:
             if not file_path.exists():
@@ -55,27 +161,218 @@ class ReceiptProcessor:
                     'file': str(file_path)
                 }
             
-            # Walidacja pliku
-            validation_result = await self._validate_file(file_path)
-            if not validation_result.get('can_process', False):
-                return {
-                    'success': False,
-                    'error': 'Plik nie przeszedł walidacji',
-                    'file': str(file_path),
-                    'validation': validation_result
-                }
+            # Wynik z cache dla niezmienionej zawartości i ustawień
+            if self.cache is None:
+                # Skrót zawartości w magazynie wyników - `is_processed` porównuje też treść
+                file_hash = None
+                if self.store is not None:
+                    file_hash = await asyncio.to_thread(compute_file_hash, file_path)
+                result = await self._process_new(file_path)
+                if file_hash is not None:
+                    result['file_hash'] = file_hash
+                await self._attach_receipt(result)
+                return result
             
-            # Upload i przetwarzanie
-            upload_result = await self._upload_and_process(file_path)
+            file_hash = await asyncio.to_thread(self.cache.file_hash, file_path)
+            cache_key = ResultCache.make_key(file_hash, self._cache_settings())
+            if not self.force:
+                cached_result = self.cache.get(cache_key)
+                if cached_result is not None:
+                    # Rekord paragonu z cache - parsowanie tylko po zmianie PARSER_VERSION
+                    if await self._attach_receipt(cached_result):
+                        self.cache.put(cache_key, cached_result)
+                    return {**cached_result, 'file': str(file_path), 'cached': True}
             
+            result = await self._process_new(file_path)
+            result['file_hash'] = file_hash
+            await self._attach_receipt(result)
+            if result.get('success', False) and 'duplicate_of' not in result:
+                self.cache.put(cache_key, result)
+            return result
+            
+        except Exception as e:
+            logger.error(f"Błąd przetwarzania pliku {file_path}: {e}")
             return {
-                'success': True,
-                'file': str(file_path),
-                'text': upload_result.get('text', ''),
-                'message': upload_result.get('message', ''),
-                'validation': validation_result,
-                'processing_info': upload_result.get('processing_info', {})
+                'success': False,
+                'error': str(e),
+                'file': str(file_path)
+            }
+    
+    async def _attach_receipt(self, result: Dict[str, Any]) -> bool:
+        """Dołączenie rekordu paragonu do wyniku; True, jeśli tekst sparsowano ponownie.
+        
+        Rekord z bieżącą wersją parsera (np. z cache) jest zachowywany.
+        """
+        if self.parser is None or not result.get('success', False) or 'duplicate_of' in result:
+            return False
+        receipt = result.get('receipt')
+        if receipt is not None and receipt.get('parser_version') == PARSER_VERSION:
+            return False
+        text = result.get('text', '')
+        if not text.strip():
+            result['receipt'] = None
+            return False
+        result['receipt'] = await asyncio.to_thread(self.parser.parse, text)
+        return True
+    
+    async def reparse_stored_receipts(self) -> int:
+        """Ponowne parsowanie zapisanych tekstów po zmianie PARSER_VERSION.
+        
+        Teksty parsowane są partiami w puli procesów (`parse_many`), a po
+        aktualizacji rekordów agregaty wydatków liczone są od nowa.
+        Zwraca liczbę zaktualizowanych wyników.
+        """
+        if self.parser is None or self.store is None:
+            return 0
+        outdated = await asyncio.to_thread(self.store.outdated_receipts, PARSER_VERSION)
+        if not outdated:
+            return 0
+        records = await self.parser.parse_many(text for _, text in outdated)
+        await asyncio.to_thread(
+            self.store.update_receipts,
+            [(row_id, record) for (row_id, _), record in zip(outdated, records)]
+        )
+        logger.info(f"Ponownie sparsowano {len(outdated)} zapisanych paragonów (parser v{PARSER_VERSION})")
+        return len(outdated)
+    
+    def _cache_settings(self) -> Dict[str, Any]:
+        """Ustawienia wpływające na wynik OCR - część klucza cache"""
+        settings = {
+            'ocr_language': self.config.OCR_LANGUAGE,
+            'auto_enhance': True,
+        }
+        if self.preprocessor is not None:
+            settings['preprocess'] = self.preprocessor.settings()
+        if self.local_ocr is not None:
+            settings['local_ocr'] = self.local_ocr.settings()
+        if self.pdf_pages is not None:
+            settings['pdf_pages'] = self.pdf_pages.settings()
+        if self.config.PDF_TEXT_FAST_PATH:
+            settings['pdf_text_min_chars'] = self.config.PDF_TEXT_MIN_CHARS
+        return settings
+    
+    async def _process_new(self, file_path: Path) -> Dict[str, Any]:
+        """Przetworzenie pliku spoza cache - z pominięciem powtórnych zdjęć"""
+        if self.duplicates is None:
+            return await self._process_uncached(file_path)
+        
+        image_hash = await self.duplicates.fingerprint(file_path)
+        if image_hash is not None:
+            match = self.duplicates.find(image_hash, file_path)
+            if match is not None:
+                return self._link_duplicate(file_path, match)
+        
+        result = await self._process_uncached(file_path)
+        if image_hash is not None and result.get('success', False):
+            self.duplicates.register(file_path, image_hash)
+        return result
+    
+    def _link_duplicate(self, file_path: Path, match: Dict[str, Any]) -> Dict[str, Any]:
+        """Wynik dla duplikatu - powiązanie z wynikiem oryginału bez OCR"""
+        original = None
+        if self.store is not None:
+            found = self.store.receipt_results(file=match['file'], status=STATUS_SUCCESS, limit=1)
+            original = found[0] if found else None
+        
+        logger.info(f"Plik {file_path.name} to duplikat {Path(match['file']).name} (odległość {match['distance']})")
+        return {
+            'success': True,
+            'file': str(file_path),
+            'text': original.get('text', '') if original else '',
+            'message': f"Duplikat paragonu {Path(match['file']).name} - pominięto OCR",
+            'duplicate_of': match['file'],
+            'processing_info': {'duplicate_distance': match['distance']}
+        }
+    
+    async def _process_uncached(self, file_path: Path) -> Dict[str, Any]:
+        """Przetwarzanie pliku przez backend (bez cache)"""
+        if self.quality_checker is not None:
+            quality = await self.quality_checker.check(file_path)
+            if not quality['can_process']:
+                logger.info(f"Plik {file_path.name} odrzucony lokalnie: {'; '.join(quality['issues'])}")
+                return self._build_result(file_path, quality, {})
+        
+        if self.preprocessor is None:
+            return await self._run_ocr(file_path, file_path)
+        
+        try:
+            preprocessing = await self.preprocessor.preprocess(file_path)
+        except Exception as e:
+            logger.error(f"Błąd przetwarzania wstępnego pliku {file_path}: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'file': str(file_path)
             }
+        
+        try:
+            result = await self._run_ocr(file_path, preprocessing['path'])
+        finally:
+            self.preprocessor.cleanup(preprocessing)
+        
+        if preprocessing['applied']:
+            result['preprocessing'] = {
+                'original_size': preprocessing['original_size'],
+                'processed_size': preprocessing['processed_size'],
+                'bytes_saved': ImagePreprocessor.bytes_saved(preprocessing),
+                'width': preprocessing['width'],
+                'height': preprocessing['height']
+            }
+        return result
+    
+    async def _run_ocr(self, file_path: Path, upload_path: Path) -> Dict[str, Any]:
+        """Walidacja i przetworzenie pliku - lokalnie lub przez backend.
+        
+        `upload_path` to plik faktycznie przetwarzany (np. zmniejszona kopia),
+        a `file_path` - oryginał, którego dotyczy wynik.
+        """
+        try:
+            if upload_path.suffix.lower() == '.pdf' and (self.config.PDF_TEXT_FAST_PATH or self.pdf_pages):
+                validation_result = self._validate_locally(upload_path)
+                if not validation_result.get('can_process', False):
+                    return self._build_result(file_path, validation_result, {})
+                pdf_result = await self._process_pdf(upload_path)
+                if pdf_result is not None:
+                    return self._build_result(file_path, validation_result, pdf_result)
+                # Skan jednostronicowy - zwykła ścieżka
+            
+            if self.local_ocr is not None:
+                validation_result = self._validate_locally(upload_path)
+                if not validation_result.get('can_process', False):
+                    return self._build_result(file_path, validation_result, {})
+                ocr_result = await self.local_ocr.process(upload_path)
+                return self._build_result(file_path, validation_result, ocr_result)
+            
+            # Upload z walidacją w jednym żądaniu
+            if self.config.RECEIPT_COMBINED_UPLOAD:
+                combined_result = None
+                if self._combined_supported is not False:
+                    combined_result = await self._upload_with_validation(upload_path)
+                if combined_result is not None:
+                    if 'error' in combined_result:
+                        return {
+                            'success': False,
+                            'error': combined_result['error'],
+                            'file': str(file_path)
+                        }
+                    validation_result = combined_result.get('validation')
+                    if validation_result is None:
+                        # Backend zignorował validate=true - walidacja lokalna
+                        validation_result = self._validate_locally(upload_path)
+                    return self._build_result(file_path, validation_result, combined_result)
+                
+                # Brak endpointu łączonego - walidacja lokalna zamiast osobnego żądania
+                validation_result = self._validate_locally(upload_path)
+            else:
+                validation_result = await self._validate_file(upload_path)
+            
+            if not validation_result.get('can_process', False):
+                return self._build_result(file_path, validation_result, {})
+            
+            # Upload i przetwarzanie
+            upload_result = await self._upload_and_process(upload_path)
+            
+            return self._build_result(file_path, validation_result, upload_result)
             
         except Exception as e:
             logger.error(f"Błąd przetwarzania pliku {file_path}: {e}")
@@ -85,59 +382,216 @@ class ReceiptProcessor:
                 'file': str(file_path)
             }
     
+    async def _process_pdf(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """PDF bez wysyłania całego dokumentu do OCR.
+        
+        Najpierw warstwa tekstowa (e-faktury), potem podział skanu na strony.
+        Zwraca None, gdy dokument trzeba przetworzyć zwykłą ścieżką.
+        """
+        if self.config.PDF_TEXT_FAST_PATH:
+            try:
+                text_layer = await asyncio.to_thread(
+                    extract_pdf_text, str(file_path), self.config.PDF_TEXT_MIN_CHARS
+                )
+            except Exception as e:
+                logger.warning(f"Nie udało się odczytać warstwy tekstowej {file_path.name}: {e}")
+                text_layer = None
+            if text_layer is not None:
+                return {
+                    'text': text_layer['text'],
+                    'message': 'Odczytano warstwę tekstową PDF',
+                    'processing_info': {
+                        'engine': TEXT_LAYER_ENGINE,
+                        'pages': text_layer['pages'],
+                        'duration': round(text_layer['duration'], 3)
+                    }
+                }
+        
+        if self.pdf_pages is not None:
+            return await self.pdf_pages.process(file_path, self._recognize_page)
+        return None
+    
+    async def _recognize_page(self, page_path: Path) -> Dict[str, Any]:
+        """Rozpoznanie tekstu pojedynczej strony PDF (obrazu)"""
+        if self.local_ocr is not None:
+            return await self.local_ocr.process(page_path)
+        return await self._upload_and_process(page_path)
+    
+    def _build_result(self, file_path: Path, validation_result: Dict[str, Any],
+                      upload_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Złożenie wyniku przetwarzania pliku"""
+        if not validation_result.get('can_process', False):
+            error = 'Plik nie przeszedł walidacji'
+            if validation_result.get('issues'):
+                error += ': ' + '; '.join(validation_result['issues'])
+            return {
+                'success': False,
+                'error': error,
+                'file': str(file_path),
+                'validation': validation_result
+            }
+        
+        if 'error' in upload_result:
+            return {
+                'success': False,
+                'error': upload_result['error'],
+                'file': str(file_path),
+                'validation': validation_result
+            }
+        
+        return {
+            'success': True,
+            'file': str(file_path),
+            'text': upload_result.get('text', ''),
+            'message': upload_result.get('message', ''),
+            'validation': validation_result,
+            'processing_info': upload_result.get('processing_info', {})
+        }
+    
     def _is_supported_file(self, file_path: Path) -> bool:
         """Sprawdzenie czy plik jest obsługiwany"""
-        supported_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.pdf']
-        return file_path.suffix.lower() in supported_extensions
+        return file_path.suffix.lower() in RECEIPT_EXTENSIONS
     
     async def _validate_file(self, file_path: Path) -> Dict[str, Any]:
         """Walidacja pliku przed przetwarzaniem"""
         try:
             url = self.config.get_receipt_validate_url()
             
-            with open(file_path, 'rb') as f:
-                files = {'file': (file_path.name, f, self._get_mime_type(file_path))}
-                data = {'auto_enhance': 'true'}
-                
-                response = await self.client.post(url, files=files, data=data)
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Błąd walidacji: {response.status_code} - {response.text}")
-                    return {'can_process': False, 'error': response.text}
-                    
+            response = await self._post_file(url, file_path, {'auto_enhance': 'true'}, idempotent=True)
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Błąd walidacji: {response.status_code} - {response.text}")
+                return {'can_process': False, 'error': response.text}
+            
         except Exception as e:
             logger.error(f"Błąd walidacji pliku {file_path}: {e}")
             return {'can_process': False, 'error': str(e)}
     
+    def _validate_locally(self, file_path: Path) -> Dict[str, Any]:
+        """Lokalna walidacja pliku (rozmiar i sygnatura formatu) bez żądania HTTP"""
+        issues = []
+        try:
+            file_size = file_path.stat().st_size
+            with open(file_path, 'rb') as f:
+                header = f.read(16)
+        except OSError as e:
+            return {'can_process': False, 'source': 'local', 'error': str(e)}
+        
+        if file_size == 0:
+            issues.append('Plik jest pusty')
+        elif file_size > self.config.RECEIPT_MAX_FILE_SIZE_MB * 1024 * 1024:
+            issues.append(f'Plik przekracza {self.config.RECEIPT_MAX_FILE_SIZE_MB} MB')
+        
+        signatures = FILE_SIGNATURES.get(file_path.suffix.lower(), [])
+        if file_size and signatures and not any(header.startswith(sig) for sig in signatures):
+            issues.append(f'Zawartość pliku nie odpowiada rozszerzeniu {file_path.suffix}')
+        
+        return {
+            'can_process': not issues,
+            'source': 'local',
+            'file_size': file_size,
+            'format': file_path.suffix.lower().lstrip('.'),
+            'issues': issues
+        }
+    
+    async def _upload_with_validation(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Upload z walidacją po stronie backendu w jednym żądaniu.
+        
+        Zwraca None, jeśli backend nie udostępnia endpointu łączonego.
+        Odpowiedź bez `validation` oznacza backend ignorujący walidację -
+        kolejne pliki walidowane są lokalnie.
+        """
+        try:
+            url = self.config.get_receipt_process_url()
+            
+            response = await self._post_file(url, file_path, {'auto_enhance': 'true', 'validate': 'true'})
+            
+            if response.status_code in (404, 405):
+                logger.info("Backend nie obsługuje uploadu z walidacją - używam walidacji lokalnej")
+                self._combined_supported = False
+                return None
+            
+            self._combined_supported = True
+            if response.status_code == 200:
+                body = response.json()
+                if 'validation' not in body:
+                    logger.info("Backend ignoruje walidację przy uploadzie - używam walidacji lokalnej")
+                    self._combined_supported = False
+                return body
+            elif response.status_code == 422:
+                # Plik odrzucony przez walidację backendu
+                return {'validation': {'can_process': False, **self._safe_json(response)}}
+            else:
+                logger.error(f"Błąd uploadu z walidacją: {response.status_code} - {response.text}")
+                return {'error': response.text}
+            
+        except Exception as e:
+            logger.error(f"Błąd uploadu z walidacją pliku {file_path}: {e}")
+            return {'error': str(e)}
+    
+    def _safe_json(self, response: httpx.Response) -> Dict[str, Any]:
+        """Odczytanie odpowiedzi JSON bez rzucania wyjątku"""
+        try:
+            body = response.json()
+            return body if isinstance(body, dict) else {'detail': body}
+        except ValueError:
+            return {'detail': response.text}
+    
     async def _upload_and_process(self, file_path: Path) -> Dict[str, Any]:
         """Upload i przetwarzanie pliku"""
         try:
             url = self.config.get_receipt_upload_url()
             
-            with open(file_path, 'rb') as f:
-                files = {'file': (file_path.name, f, self._get_mime_type(file_path))}
-                data = {'auto_enhance': 'true'}
-                
-                response = await self.client.post(url, files=files, data=data)
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Błąd uploadu: {response.status_code} - {response.text}")
-                    return {'error': response.text}
-                    
+            response = await self._post_file(url, file_path, {'auto_enhance': 'true'})
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Błąd uploadu: {response.status_code} - {response.text}")
+                return {'error': response.text}
+            
         except Exception as e:
             logger.error(f"Błąd uploadu pliku {file_path}: {e}")
             return {'error': str(e)}
     
+    async def _post_file(self, url: str, file_path: Path, data: Dict[str, str],
+                         idempotent: bool = False) -> httpx.Response:
+        """Wysłanie pliku jako multipart z ponowieniami przy błędach przejściowych.
+        
+        Upload nie jest idempotentny - po przekroczeniu czasu odczytu backend
+        mógł już utworzyć paragon, więc ponawiamy tylko, gdy żądanie nie
+        dotarło (błąd połączenia/puli) lub zostało odrzucone (429/503).
+        """
+        return await retry_async(
+            lambda: self._post_file_once(url, file_path, data),
+            self.retry_policy,
+            retry_on=HTTPX_TRANSIENT_ERRORS if idempotent else HTTPX_NOT_SENT_ERRORS,
+            retry_hint=httpx_retry_hint if idempotent else httpx_rejected_retry_hint,
+            description=f"upload {file_path.name}",
+            breaker=self.breakers.get(url)
+        )
+    
+    async def _post_file_once(self, url: str, file_path: Path, data: Dict[str, str]) -> httpx.Response:
+        """Pojedyncza próba wysłania pliku (strumieniowo) w ramach adaptacyjnego limitu"""
+        upload = MultipartFileUpload(
+            file_path,
+            self._get_mime_type(file_path),
+            data=data,
+            chunk_size=self.config.UPLOAD_CHUNK_SIZE_KB * 1024
+        )
+        async with self.limiter.slot() as slot:
+            response = await self.client.post(url, content=upload, headers=upload.headers)
+            slot.record_status(response.status_code)
+            return response
+    
     def _get_mime_type(self, file_path: Path) -> str:
         """Pobranie typu MIME dla pliku"""
         mime_type, _ = mimetypes.guess_type(str(file_path))
         return mime_type or 'application/octet-stream'
     
-    async def process_directory(self, directory_path: Path) -> List[Dict[str, Any]]:
+    async def process_directory(self, directory_path: Path, workers: Optional[int] = None) -> List[Dict[str, Any]]:
         """Przetwarzanie wszystkich plików w katalogu"""
         results = []
         
@@ -145,30 +599,239 @@ class ReceiptProcessor:
             logger.error(f"Katalog nie istnieje: {directory_path}")
             return results
         
-        # Znajdź wszystkie obsługiwane pliki
-        supported_files = []
-        for ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.pdf']:
-            supported_files.extend(directory_path.glob(f"*{ext}"))
-            supported_files.extend(directory_path.glob(f"*{ext.upper()}"))
+        # Pliki trafiają do przetwarzania już w trakcie skanowania katalogu
+        files = scan_directory(directory_path, RECEIPT_EXTENSIONS, recursive=self.config.SCAN_RECURSIVE)
+        results = await self.process_files(files, workers=workers)
         
-        console.print(f"[blue]📄 Znaleziono {len(supported_files)} plików do przetworzenia[/blue]")
+        console.print(f"[blue]📄 Przetworzono {len(results)} plików z katalogu {directory_path}[/blue]")
+        return results
+    
+    async def iter_process_files(
+        self,
+        files: Iterable[Union[Path, ScannedFile]],
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        stats: Optional[ProcessingStats] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Współbieżne przetwarzanie plików - wyniki zwracane w kolejności wejściowej.
         
-        # Przetwarzaj pliki
-        for i, file_path in enumerate(supported_files, 1):
-            console.print(f"[blue]📄 Przetwarzanie {i}/{len(supported_files)}: {file_path.name}[/blue]")
-            result = await self.process_file(file_path)
-            results.append(result)
-            
-            # Krótka przerwa między plikami
-            await asyncio.sleep(0.1)
+        Liczba zadań to górna granica współbieżności, a faktyczną liczbę
+        równoległych żądań do backendu wyznacza adaptacyjny limiter.
+        """
+        workers = workers or self.config.get_max_concurrency()
+        queue_size = queue_size or self.config.PROCESSING_QUEUE_SIZE
+        
+        entries = (ScannedFile.of(f) for f in files)
+        async for _, entry, result in run_ordered(entries, self._process_entry, workers, queue_size):
+            if stats is not None:
+                self._record_stats(stats, entry, result)
+            yield result
+    
+    async def _process_entry(self, entry: ScannedFile) -> Dict[str, Any]:
+        """Przetworzenie pliku ze skanera"""
+        return await self.process_file(entry.path)
+    
+    def _record_stats(self, stats: ProcessingStats, entry: ScannedFile, result: Dict[str, Any]):
+        """Zarejestrowanie wyniku pliku w statystykach (rozmiar z zapamiętanego stat)"""
+        size = entry.size
+        cached = result.get('cached', False)
+        saved = 0 if cached else result.get('preprocessing', {}).get('bytes_saved', 0)
+        fast_path = not cached and result.get('processing_info', {}).get('engine') == TEXT_LAYER_ENGINE
+        stats.record(size, result.get('success', False), cached, saved_bytes=saved, fast_path=fast_path,
+                     duplicate='duplicate_of' in result)
+    
+    async def is_processed(self, file_path: Path) -> bool:
+        """Czy plik ma już pomyślny wynik dla bieżącej zawartości (cache lub magazyn wyników)"""
+        if self.force:
+            return False
+        if self.cache is not None:
+            file_hash = await asyncio.to_thread(self.cache.file_hash, file_path)
+            if self.cache.get(ResultCache.make_key(file_hash, self._cache_settings())) is not None:
+                return True
+        elif self.store is not None:
+            file_hash = await asyncio.to_thread(compute_file_hash, file_path)
+        if self.store is not None:
+            found = await asyncio.to_thread(
+                self.store.receipt_results, file=str(file_path), file_hash=file_hash,
+                status=STATUS_SUCCESS, limit=1
+            )
+            return bool(found)
+        return False
+    
+    async def process_stream(
+        self,
+        files: AsyncIterator[Path],
+        on_result: Callable[[Dict[str, Any]], None],
+        workers: Optional[int] = None,
+        stats: Optional[ProcessingStats] = None
+    ):
+        """Przetwarzanie plików napływających ze strumienia (np. obserwatora katalogu).
+        
+        Wyniki przekazywane są do `on_result` w kolejności zakończenia
+        i zatwierdzane w magazynie wyników od razu, bo strumień (np. tryb
+        obserwowania) może działać bez końca. Działa do wyczerpania
+        strumienia, a następnie czeka na rozpoczęte pliki.
+        """
+        workers = workers or self.config.get_max_concurrency()
+        semaphore = asyncio.Semaphore(workers)
+        tasks = set()
+        
+        async def handle(file_path: Path):
+            try:
+                result = await self.process_file(file_path)
+            finally:
+                semaphore.release()
+            if self.store is not None:
+                try:
+                    await asyncio.to_thread(self.store.flush)
+                except Exception as e:
+                    logger.error(f"Błąd zapisu wyniku {file_path} w magazynie: {e}")
+            if stats is not None:
+                self._record_stats(stats, ScannedFile.of(file_path), result)
+            on_result(result)
+        
+        try:
+            async for file_path in files:
+                await semaphore.acquire()
+                task = asyncio.create_task(handle(file_path))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self._flush_outputs()
+    
+    async def _flush_outputs(self):
+        """Zapis cache i magazynu wyników na dysk"""
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.flush)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.flush)
+    
+    async def process_files(
+        self,
+        files: Iterable[Union[Path, ScannedFile]],
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+        show_progress: bool = True,
+        stats: Optional[ProcessingStats] = None,
+        collect: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Przetwarzanie plików z ograniczoną współbieżnością i postępem.
+        
+        `files` może być leniwym strumieniem (np. ze `scan_directory`) - wtedy
+        liczba plików nie jest znana z góry, a `total_files` w statystykach
+        i suma w pasku postępu rosną w miarę pobierania plików ze skanera.
+        Przy `collect=False` wyniki są przekazywane tylko do `on_result`
+        i nie są gromadzone w pamięci.
+        """
+        results = []
+        total = len(files) if isinstance(files, Sized) else None
+        stats = stats or ProcessingStats(total_files=total or 0)
+        if self.retry_policy.budget is not None:
+            self.retry_policy.budget.reset()
         
+        progress = Progress(
+            SpinnerColumn(),
+            TextColumn("[blue]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("[cyan]{task.fields[throughput]}"),
+            TimeElapsedColumn(),
+            console=console,
+            disable=not show_progress
+        )
+        
+        with progress:
+            task = progress.add_task("📄 Przetwarzanie paragonów", total=total, throughput="")
+            if total is None:
+                files = self._count_streamed(files, stats, progress, task)
+            async for result in self.iter_process_files(files, workers, queue_size, stats):
+                if collect:
+                    results.append(result)
+                if on_result:
+                    on_result(result)
+                throughput = f"{stats.format_throughput()}, limit: {self.limiter.current_limit}"
+                if self.breakers.open_endpoints():
+                    throughput += ", ⛔ backend niedostępny - oczekiwanie"
+                progress.update(task, advance=1, throughput=throughput)
+        
+        await self._flush_outputs()
+        
+        logger.info("Zakończono przetwarzanie wsadowe", **stats.to_dict(), concurrency=self.limiter.to_dict())
         return results
     
+    @staticmethod
+    def _count_streamed(files: Iterable[Union[Path, ScannedFile]], stats: ProcessingStats,
+                        progress: Progress, task: TaskID) -> Iterator[Union[Path, ScannedFile]]:
+        """Liczenie plików strumienia w chwili pobrania ich do przetwarzania"""
+        stats.total_files = 0
+        for file in files:
+            stats.total_files += 1
+            progress.update(task, total=stats.total_files)
+            yield file
+    
+    async def run_batch(
+        self,
+        files: Sequence[Union[Path, ScannedFile]],
+        journal: BatchJournal,
+        retry_failed_only: bool = False,
+        workers: Optional[int] = None,
+        show_progress: bool = True
+    ) -> Dict[str, Any]:
+        """Wznawialne przetwarzanie wsadowe z dziennikiem na dysku.
+        
+        Pliki zapisane w dzienniku jako pomyślne są pomijane, a przy
+        `retry_failed_only` przetwarzane są tylko pliki z błędami. W pamięci
+        trzymane jest co najwyżej BATCH_RESULTS_IN_MEMORY ostatnich wyników.
+        """
+        if retry_failed_only:
+            failed = journal.failed_files
+            pending = [f for f in files if str(f) in failed]
+        else:
+            done = journal.successful_files
+            pending = [f for f in files if str(f) not in done]
+        
+        skipped = len(files) - len(pending)
+        if skipped:
+            console.print(f"[blue]⏭️  Pominięto {skipped} plików zapisanych w dzienniku[/blue]")
+        
+        recent_results: deque = deque(maxlen=self.config.BATCH_RESULTS_IN_MEMORY)
+        
+        def on_result(result: Dict[str, Any]):
+            journal.record(result)
+            recent_results.append(result)
+        
+        stats = ProcessingStats(total_files=len(pending))
+        try:
+            await self.process_files(
+                pending, workers=workers, on_result=on_result,
+                show_progress=show_progress, stats=stats, collect=False
+            )
+            journal.mark_complete()
+        finally:
+            journal.close()
+        
+        return {
+            'total_files': len(files),
+            'skipped_files': skipped,
+            'stats': stats.to_dict(),
+            'journal': journal.summary(),
+            'results': list(recent_results)
+        }
+    
     async def get_statistics(self) -> Dict[str, Any]:
         """Pobranie statystyk przetwarzania"""
         try:
             url = self.config.get_statistics_url()
-            response = await self.client.get(url)
+            response = await retry_async(
+                lambda: self.client.get(url), self.retry_policy,
+                retry_hint=httpx_retry_hint, description="statystyki",
+                breaker=self.breakers.get(url), park=False
+            )
             
             if response.status_code == 200:
                 return response.json()
@@ -180,8 +843,19 @@ class ReceiptProcessor:
             logger.error(f"Błąd pobierania statystyk: {e}")
             return {'error': str(e)}
     
+    def local_statistics(self) -> Dict[str, Any]:
+        """Statystyki z lokalnego magazynu wyników"""
+        if self.store is None:
+            return {}
+        return self.store.statistics()
+    
     async def close(self):
         """Zamknięcie klienta HTTP"""
+        if self.cache is not None:
+            self.cache.flush()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
         await self.client.aclose()
     
     def __del__(self):
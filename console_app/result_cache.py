@@ -0,0 +1,155 @@
+"""
+Trwały cache wyników przetwarzania paragonów kluczowany skrótem zawartości
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+
+from .file_utils import compute_file_hash, write_json_atomic
+
+logger = structlog.get_logger()
+
+
+class ResultCache:
+    """Cache wyników `process_file` zapisywany na dysku.
+
+    Klucz to skrót SHA-256 zawartości pliku połączony z odciskiem ustawień
+    OCR, więc zmiana np. OCR_LANGUAGE unieważnia wcześniejsze wpisy.
+    Dodatkowy indeks (ścieżka, rozmiar, mtime) -> skrót pozwala pominąć
+    ponowne liczenie skrótu dla niezmienionych plików.
+    """
+
+    INDEX_FILE = "hash_index.json"
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int, max_age_seconds: float):
+        self.cache_dir = Path(cache_dir)
+        self.entries_dir = self.cache_dir / "entries"
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+        self._hash_index: Dict[str, Tuple[int, int, str]] = {}
+        self._index_dirty = False
+        self._load_hash_index()
+
+    def _load_hash_index(self):
+        """Wczytanie indeksu skrótów plików"""
+        index_path = self.cache_dir / self.INDEX_FILE
+        try:
+            if index_path.exists():
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    self._hash_index = {path: tuple(entry) for path, entry in json.load(f).items()}
+        except Exception as e:
+            logger.warning(f"Nie można wczytać indeksu skrótów cache: {e}")
+            self._hash_index = {}
+
+    def file_hash(self, file_path: Path) -> str:
+        """Skrót zawartości pliku - z indeksu, jeśli plik się nie zmienił"""
+        stat = file_path.stat()
+        key = str(file_path)
+        cached = self._hash_index.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = compute_file_hash(file_path)
+        self._hash_index[key] = (stat.st_size, stat.st_mtime_ns, digest)
+        self._index_dirty = True
+        return digest
+
+    @staticmethod
+    def make_key(file_hash: str, settings: Dict[str, Any]) -> str:
+        """Klucz cache: skrót pliku + odcisk ustawień przetwarzania"""
+        fingerprint = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(f"{file_hash}:{fingerprint}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        """Ścieżka wpisu (katalogi dzielone po prefiksie klucza)"""
+        return self.entries_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Pobranie wyniku z cache (None jeśli brak lub wygasł)"""
+        path = self._entry_path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        if self.max_age_seconds and time.time() - stat.st_mtime > self.max_age_seconds:
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except Exception as e:
+            logger.warning(f"Uszkodzony wpis cache {key}: {e}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        # Odświeżenie czasu dostępu - eksmisja usuwa najdawniej używane wpisy
+        os.utime(path, (time.time(), stat.st_mtime))
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Zapisanie wyniku do cache"""
+        try:
+            write_json_atomic(self._entry_path(key), result)
+        except Exception as e:
+            logger.warning(f"Nie można zapisać wpisu cache {key}: {e}")
+
+    def evict(self) -> int:
+        """Usunięcie wygasłych wpisów i najdawniej używanych ponad limit rozmiaru"""
+        now = time.time()
+        entries = []
+        removed = 0
+        total_size = 0
+
+        for path in self.entries_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self.max_age_seconds and now - stat.st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+            total_size += stat.st_size
+
+        if self.max_size_bytes and total_size > self.max_size_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= self.max_size_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total_size -= size
+                removed += 1
+
+        if removed:
+            logger.info(f"Usunięto {removed} wpisów z cache wyników")
+        return removed
+
+    def flush(self):
+        """Zapis indeksu skrótów i eksmisja wpisów"""
+        if self._index_dirty:
+            # Pomijamy pliki, które zniknęły z dysku
+            self._hash_index = {p: e for p, e in self._hash_index.items() if os.path.exists(p)}
+            write_json_atomic(self.cache_dir / self.INDEX_FILE, self._hash_index)
+            self._index_dirty = False
+        self.evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Statystyki trafień cache"""
+        return {'hits': self.hits, 'misses': self.misses}
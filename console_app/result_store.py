@@ -0,0 +1,478 @@
+"""
+Trwały magazyn wyników przetwarzania paragonów i wyszukiwań RAG (SQLite)
+"""
+
+import json
+import math
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from .receipt_parser import item_category
+
+logger = structlog.get_logger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipt_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file TEXT NOT NULL,
+    file_hash TEXT,
+    status TEXT NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    text TEXT,
+    receipt_json TEXT,
+    result_json TEXT NOT NULL,
+    processed_at TEXT NOT NULL,
+    processed_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_receipt_file ON receipt_results (file, id);
+CREATE INDEX IF NOT EXISTS idx_receipt_hash ON receipt_results (file_hash);
+CREATE INDEX IF NOT EXISTS idx_receipt_date ON receipt_results (processed_date);
+CREATE INDEX IF NOT EXISTS idx_receipt_status ON receipt_results (status, processed_date);
+
+CREATE TABLE IF NOT EXISTS rag_searches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL,
+    result_count INTEGER NOT NULL,
+    searched_at TEXT NOT NULL,
+    searched_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rag_search_date ON rag_searches (searched_date);
+
+CREATE TABLE IF NOT EXISTS rag_search_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    search_id INTEGER NOT NULL REFERENCES rag_searches (id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    source TEXT,
+    similarity REAL,
+    result_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rag_result_search ON rag_search_results (search_id, rank);
+
+CREATE TABLE IF NOT EXISTS receipt_rollups (
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS receipt_rollup_entries (
+    source TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (source, dimension, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS receipt_rollup_files (
+    file TEXT PRIMARY KEY,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_file_source ON receipt_rollup_files (source);
+
+CREATE TABLE IF NOT EXISTS image_hashes (
+    file TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    hash_size INTEGER NOT NULL
+);
+"""
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+
+# Wymiary agregatów wydatków; 'amount' to histogram sum paragonów (kubełki po 1 zł)
+ROLLUP_DIMENSIONS = ('day', 'month', 'shop', 'category', 'amount')
+UNKNOWN_SHOP = 'Nieznany'
+
+ROLLUP_UPSERT = (
+    "INSERT INTO receipt_rollups (dimension, bucket, total, count) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (dimension, bucket) DO UPDATE SET "
+    "total = ROUND(total + excluded.total, 2), count = count + excluded.count"
+)
+
+
+def rollup_entries(receipt: Dict[str, Any], processed_date: str) -> List[Tuple[str, str, float, int]]:
+    """Wkład paragonu w agregaty: (wymiar, kubełek, kwota, liczba).
+
+    Paragon trafia do kubełków według daty z paragonu (data przetworzenia,
+    gdy jej brak), więc paragony dodane z opóźnieniem liczą się we
+    właściwym dniu i miesiącu.
+    """
+    total = receipt.get('total')
+    if total is None:
+        total = receipt.get('items_total', 0.0)
+    day = receipt.get('date') or processed_date
+    entries = [
+        ('day', day, total, 1),
+        ('month', day[:7], total, 1),
+        ('shop', receipt.get('shop') or UNKNOWN_SHOP, total, 1),
+        ('amount', str(math.floor(total)), total, 1),
+    ]
+    categories: Dict[str, List] = {}
+    for item in receipt.get('items', []):
+        bucket = categories.setdefault(item_category(item['name']), [0.0, 0])
+        bucket[0] += item['total'] + item.get('discount', 0.0)
+        bucket[1] += 1
+    entries.extend(('category', name, value, count) for name, (value, count) in categories.items())
+    return entries
+
+
+class ResultStore:
+    """Magazyn wyników w SQLite (tryb WAL).
+
+    Wyniki paragonów są buforowane i zapisywane partiami (jedna transakcja
+    na `batch_size` wyników). Każde przetworzenie to osobny wiersz - historia
+    jest zachowana, a `latest_only` zwraca ostatni wynik dla pliku.
+
+    W tej samej transakcji aktualizowane są agregaty wydatków (dni,
+    miesiące, sklepy, kategorie, histogram kwot). Wkład paragonu jest
+    zapamiętany pod skrótem zawartości pliku (ścieżką, gdy skrótu brak),
+    więc ponowne przetworzenie najpierw odejmuje poprzedni wkład, a ten
+    sam paragon zapisany pod inną nazwą liczony jest raz. Zapis jest
+    idempotentny, a odczyt agregatów zależy tylko od liczby kubełków.
+    """
+
+    def __init__(self, db_path: Path, batch_size: int = 100):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(1, batch_size)
+        self._pending: List[Tuple] = []
+        self._pending_rollups: List[Tuple[str, str, Dict[str, Any], str]] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # Paragony
+
+    def add_receipt_result(self, result: Dict[str, Any]):
+        """Dodanie wyniku przetworzenia paragonu (zapis partiami)"""
+        now = datetime.now()
+        success = result.get('success', False)
+        receipt = result.get('receipt') if success else None
+        row = (
+            result.get('file', ''),
+            result.get('file_hash'),
+            STATUS_SUCCESS if success else STATUS_FAILED,
+            int(bool(result.get('cached', False))),
+            None if success else result.get('error', 'Nieznany błąd'),
+            result.get('text') if success else None,
+            json.dumps(receipt, ensure_ascii=False) if receipt else None,
+            json.dumps(result, ensure_ascii=False, default=str),
+            now.isoformat(),
+            now.date().isoformat()
+        )
+        with self._lock:
+            self._pending.append(row)
+            if receipt:
+                self._pending_rollups.append((row[0], row[1] or row[0], receipt, row[-1]))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Zapis zbuforowanych wyników"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO receipt_results (file, file_hash, status, cached, error, text, receipt_json, "
+                "result_json, processed_at, processed_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending
+            )
+            for file, source, receipt, processed_date in self._pending_rollups:
+                self._apply_rollup(file, source, rollup_entries(receipt, processed_date))
+            if self._pending_rollups:
+                self._conn.execute("DELETE FROM receipt_rollups WHERE count <= 0")
+        self._pending.clear()
+        self._pending_rollups.clear()
+
+    def _apply_rollup(self, file: str, source: str, entries: List[Tuple[str, str, float, int]]):
+        """Zastąpienie wkładu paragonu `source` w agregatach (wewnątrz transakcji).
+
+        Jeśli plik wskazywał wcześniej inną zawartość, jej wkład jest
+        odejmowany, o ile nie wskazuje na nią żaden inny plik.
+        """
+        row = self._conn.execute("SELECT source FROM receipt_rollup_files WHERE file = ?", (file,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO receipt_rollup_files (file, source) VALUES (?, ?)", (file, source)
+        )
+        if row is not None and row[0] != source:
+            still_used = self._conn.execute(
+                "SELECT 1 FROM receipt_rollup_files WHERE source = ? LIMIT 1", (row[0],)
+            ).fetchone()
+            if not still_used:
+                self._remove_contribution(row[0])
+        self._remove_contribution(source)
+        self._conn.executemany(ROLLUP_UPSERT, entries)
+        self._conn.executemany(
+            "INSERT INTO receipt_rollup_entries (source, dimension, bucket, total, count) VALUES (?, ?, ?, ?, ?)",
+            [(source, *entry) for entry in entries]
+        )
+
+    def _remove_contribution(self, source: str):
+        """Odjęcie zapamiętanego wkładu paragonu od agregatów"""
+        previous = self._conn.execute(
+            "SELECT dimension, bucket, total, count FROM receipt_rollup_entries WHERE source = ?", (source,)
+        ).fetchall()
+        if previous:
+            self._conn.executemany(
+                ROLLUP_UPSERT, [(row[0], row[1], -row[2], -row[3]) for row in previous]
+            )
+            self._conn.execute("DELETE FROM receipt_rollup_entries WHERE source = ?", (source,))
+
+    def _rebuild_rollups(self):
+        """Przeliczenie agregatów od zera z ostatniego rekordu każdego pliku (każda zawartość raz).
+
+        Duplikaty percepcyjne (`duplicate_of`) liczone są tylko jako oryginał.
+        """
+        rows = self._conn.execute(
+            "SELECT file, file_hash, processed_date, receipt_json FROM receipt_results WHERE id IN "
+            "(SELECT MAX(id) FROM receipt_results WHERE receipt_json IS NOT NULL "
+            "AND json_extract(result_json, '$.duplicate_of') IS NULL GROUP BY file) ORDER BY id"
+        ).fetchall()
+        with self._conn:
+            self._conn.execute("DELETE FROM receipt_rollups")
+            self._conn.execute("DELETE FROM receipt_rollup_entries")
+            self._conn.execute("DELETE FROM receipt_rollup_files")
+            for row in rows:
+                self._apply_rollup(
+                    row['file'], row['file_hash'] or row['file'],
+                    rollup_entries(json.loads(row['receipt_json']), row['processed_date'])
+                )
+            self._conn.execute("DELETE FROM receipt_rollups WHERE count <= 0")
+
+    def outdated_receipts(self, parser_version: int) -> List[Tuple[int, str]]:
+        """Ostatnie pomyślne wyniki plików z rekordem innej wersji parsera: (id, tekst).
+
+        Pomijane są duplikaty percepcyjne - z założenia nie mają rekordu paragonu.
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, text FROM receipt_results WHERE status = ? AND TRIM(COALESCE(text, '')) != '' "
+                "AND COALESCE(json_extract(receipt_json, '$.parser_version'), 0) != ? "
+                "AND json_extract(result_json, '$.duplicate_of') IS NULL "
+                "AND id IN (SELECT MAX(id) FROM receipt_results GROUP BY file) ORDER BY id",
+                (STATUS_SUCCESS, parser_version)
+            ).fetchall()
+        return [(row['id'], row['text']) for row in rows]
+
+    def update_receipts(self, records: Iterable[Tuple[int, Optional[Dict[str, Any]]]]):
+        """Zastąpienie rekordów paragonów (np. po zmianie parsera) i przeliczenie agregatów"""
+        rows = []
+        for row_id, receipt in records:
+            receipt_json = json.dumps(receipt, ensure_ascii=False) if receipt else None
+            rows.append((receipt_json, receipt_json, row_id))
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE receipt_results SET receipt_json = ?, "
+                    "result_json = json_set(result_json, '$.receipt', json(?)) WHERE id = ?",
+                    rows
+                )
+            self._rebuild_rollups()
+
+    def rebuild_rollups(self):
+        """Przeliczenie agregatów wydatków od zera (np. po zmianie kategorii)"""
+        with self._lock:
+            self._flush_locked()
+            self._rebuild_rollups()
+
+    def rollups(self) -> Dict[str, List[Tuple[str, float, int]]]:
+        """Agregaty wydatków: wymiar -> lista (kubełek, suma, liczba)"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dimension, bucket, total, count FROM receipt_rollups ORDER BY dimension, bucket"
+            ).fetchall()
+        result: Dict[str, List[Tuple[str, float, int]]] = {dimension: [] for dimension in ROLLUP_DIMENSIONS}
+        for row in rows:
+            result.setdefault(row[0], []).append((row[1], row[2], row[3]))
+        return result
+
+    def receipt_results(
+        self,
+        file: Optional[str] = None,
+        file_hash: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        latest_only: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Wyszukanie wyników paragonów.
+
+        `since`/`until` to daty w formacie RRRR-MM-DD (włącznie). Przy
+        `latest_only` brany jest pod uwagę tylko ostatni wynik każdego pliku.
+        """
+        conditions, params = [], []
+        if file is not None:
+            conditions.append("file = ?")
+            params.append(file)
+        if file_hash is not None:
+            conditions.append("file_hash = ?")
+            params.append(file_hash)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if since is not None:
+            conditions.append("processed_date >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("processed_date <= ?")
+            params.append(until)
+        if latest_only:
+            conditions.append("id IN (SELECT MAX(id) FROM receipt_results GROUP BY file)")
+
+        query = "SELECT result_json, processed_at FROM receipt_results"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{**json.loads(row['result_json']), 'processed_at': row['processed_at']} for row in rows]
+
+    def last_receipt_id(self) -> int:
+        """Id ostatniego zapisanego wyniku paragonu (0 dla pustej bazy)"""
+        self.flush()
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM receipt_results").fetchone()[0]
+
+    def failed_files(self, files: Optional[Iterable[str]] = None) -> List[str]:
+        """Pliki, których ostatnie przetworzenie zakończyło się błędem"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file FROM receipt_results WHERE status = ? "
+                "AND id IN (SELECT MAX(id) FROM receipt_results GROUP BY file)",
+                (STATUS_FAILED,)
+            ).fetchall()
+        failed = [row['file'] for row in rows]
+        if files is not None:
+            wanted = set(files)
+            failed = [f for f in failed if f in wanted]
+        return failed
+
+    def statistics(self) -> Dict[str, Any]:
+        """Podsumowanie zapisanych wyników"""
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS total, "
+                "SUM(status = 'success') AS successful, "
+                "SUM(status = 'failed') AS failed, "
+                "SUM(cached) AS cached, "
+                "COUNT(DISTINCT file) AS unique_files, "
+                "COUNT(DISTINCT file_hash) AS unique_contents, "
+                "MAX(processed_at) AS last_processed "
+                "FROM receipt_results"
+            ).fetchone()
+            searches = self._conn.execute("SELECT COUNT(*) FROM rag_searches").fetchone()[0]
+        return {
+            'processed_total': row['total'] or 0,
+            'successful': row['successful'] or 0,
+            'failed': row['failed'] or 0,
+            'from_cache': row['cached'] or 0,
+            'unique_files': row['unique_files'] or 0,
+            'unique_contents': row['unique_contents'] or 0,
+            'last_processed': row['last_processed'] or '-',
+            'rag_searches': searches
+        }
+
+    # Hashe percepcyjne obrazów
+
+    def add_image_hash(self, file: str, value_hash: int, hash_size: int):
+        """Zapisanie hasha obrazu (zastępuje poprzedni hash pliku)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_hashes (file, hash, hash_size) VALUES (?, ?, ?)",
+                (file, format(value_hash, 'x'), hash_size)
+            )
+
+    def image_hashes(self, hash_size: int) -> List[Tuple[str, int]]:
+        """Zapisane hashe obrazów danej wielkości: (plik, hash)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file, hash FROM image_hashes WHERE hash_size = ?", (hash_size,)
+            ).fetchall()
+        return [(row[0], int(row[1], 16)) for row in rows]
+
+    # Wyszukiwania RAG
+
+    def add_rag_search(self, query: str, results: List[Dict[str, Any]]):
+        """Zapisanie zapytania RAG wraz z wynikami (jedna transakcja)"""
+        now = datetime.now()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO rag_searches (query, result_count, searched_at, searched_date) VALUES (?, ?, ?, ?)",
+                (query, len(results), now.isoformat(), now.date().isoformat())
+            )
+            search_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO rag_search_results (search_id, rank, source, similarity, result_json) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (search_id, rank, r.get('source'), r.get('similarity'),
+                     json.dumps(r, ensure_ascii=False, default=str))
+                    for rank, r in enumerate(results, 1)
+                ]
+            )
+
+    def rag_results(self, since: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Wyniki zapisanych wyszukiwań RAG (najnowsze najpierw)"""
+        query = (
+            "SELECT s.query, s.searched_at, r.rank, r.result_json "
+            "FROM rag_searches s JOIN rag_search_results r ON r.search_id = s.id"
+        )
+        params: List[Any] = []
+        if since is not None:
+            query += " WHERE s.searched_date >= ?"
+            params.append(since)
+        query += " ORDER BY s.id DESC, r.rank"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                'query': row['query'],
+                'searched_at': row['searched_at'],
+                'rank': row['rank'],
+                **json.loads(row['result_json'])
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        """Zapis bufora i zamknięcie bazy"""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._conn.close()
+            self._closed = True
@@ -0,0 +1,89 @@
+"""
+Strumieniowe wysyłanie plików jako multipart/form-data
+"""
+
+import asyncio
+import os
+import secrets
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+def _quote(value: str) -> str:
+    """Cytowanie wartości parametru nagłówka Content-Disposition"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\r', ' ').replace('\n', ' ')
+
+
+class MultipartFileUpload:
+    """Ciało żądania multipart z plikiem czytanym z dysku porcjami.
+
+    Rozmiar całego ciała jest znany z góry (nagłówek Content-Length), a w
+    pamięci znajduje się naraz najwyżej jedna porcja pliku - szczytowe
+    zużycie pamięci nie zależy od rozmiaru pliku. Odczyt odbywa się przez
+    `os.pread` w wątku roboczym, więc nie blokuje pętli zdarzeń.
+
+    Obiekt jest jednorazowy - przy ponowieniu żądania należy utworzyć nowy.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        content_type: str,
+        data: Optional[Dict[str, str]] = None,
+        field_name: str = 'file',
+        filename: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        self.file_path = Path(file_path)
+        self.chunk_size = max(4096, chunk_size)
+        self.file_size = self.file_path.stat().st_size
+        self.boundary = secrets.token_hex(16)
+
+        parts = []
+        for name, value in (data or {}).items():
+            parts.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f'{value}\r\n'
+            )
+        parts.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_quote(field_name)}"; '
+            f'filename="{_quote(filename or self.file_path.name)}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        )
+        self._preamble = ''.join(parts).encode('utf-8')
+        self._epilogue = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+
+    @property
+    def content_length(self) -> int:
+        """Długość całego ciała żądania"""
+        return len(self._preamble) + self.file_size + len(self._epilogue)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Nagłówki wymagane dla tego ciała żądania"""
+        return {
+            'Content-Type': f'multipart/form-data; boundary={self.boundary}',
+            'Content-Length': str(self.content_length),
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._preamble
+
+        fd = os.open(self.file_path, os.O_RDONLY)
+        try:
+            offset = 0
+            while offset < self.file_size:
+                size = min(self.chunk_size, self.file_size - offset)
+                chunk = await asyncio.to_thread(os.pread, fd, size, offset)
+                if not chunk:
+                    raise IOError(f"Plik {self.file_path} został skrócony podczas wysyłania")
+                offset += len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+
+        yield self._epilogue
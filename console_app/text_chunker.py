@@ -0,0 +1,106 @@
+"""
+Strumieniowy podział tekstu dokumentów na nakładające się fragmenty
+"""
+
+import re
+from itertools import islice
+from pathlib import Path
+from typing import Generator, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# Koniec zdania (znak interpunkcyjny i odstęp) lub pusta linia między akapitami
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+|\n\s*\n')
+WORD_BOUNDARY = re.compile(r'\s+')
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def iter_file_text(file_path: Path, block_size: int = READ_BLOCK_SIZE) -> Iterator[str]:
+    """Leniwy odczyt pliku tekstowego (UTF-8) blokami znaków"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(block_size), ''):
+            yield block
+
+
+def _last_boundary(pattern: re.Pattern, text: str, start: int, end: int) -> Tuple[int, int]:
+    """Ostatnia granica w text[start:end]: (koniec fragmentu, początek następnego) lub (-1, -1)"""
+    found = (-1, -1)
+    for match in pattern.finditer(text, start, end):
+        found = (match.start(), match.end())
+    return found
+
+
+def _first_boundary(text: str, start: int, end: int) -> int:
+    """Początek pierwszego zdania (lub słowa) w text[start:end], albo -1"""
+    for pattern in (SENTENCE_BOUNDARY, WORD_BOUNDARY):
+        match = pattern.search(text, start, end)
+        if match and match.end() < end:
+            return match.end()
+    return -1
+
+
+def _split(text: str, start: int, chunk_size: int, overlap: int) -> Tuple[int, int]:
+    """Miejsce podziału fragmentu zaczynającego się w `start`: (koniec, początek następnego).
+
+    Fragment kończy się na ostatniej granicy zdania w drugiej połowie
+    okna, a gdy jej nie ma - na granicy słowa lub po `chunk_size` znakach.
+    Następny fragment zaczyna się `overlap` znaków wcześniej, przesunięty
+    do początku najbliższego zdania lub słowa.
+    """
+    limit = start + chunk_size
+    minimum = start + chunk_size // 2
+    end, resume = _last_boundary(SENTENCE_BOUNDARY, text, minimum, limit)
+    if end < 0:
+        end, resume = _last_boundary(WORD_BOUNDARY, text, minimum, limit)
+    if end < 0:
+        end = resume = limit
+
+    if overlap:
+        window = max(resume - overlap, start + 1)
+        snapped = _first_boundary(text, window, resume)
+        resume = snapped if snapped > 0 else window
+    return end, resume
+
+
+def chunk_text(blocks: Iterable[str], chunk_size: int, overlap: int = 0) -> Generator[str, None, None]:
+    """Fragmenty tekstu podawanego blokami (np. z `iter_file_text`).
+
+    Fragmenty mają najwyżej `chunk_size` znaków, kończą się w miarę
+    możliwości na granicy zdania i zachodzą na siebie o około `overlap`
+    znaków (najwyżej połowę fragmentu). W pamięci trzymany jest tylko
+    bieżący blok i niewysłana końcówka poprzedniego.
+    """
+    chunk_size = max(1, chunk_size)
+    overlap = max(0, min(overlap, chunk_size // 2))
+    buffer = ''
+    # Początek bieżącego fragmentu i koniec tekstu już wysłanego we fragmentach
+    start = emitted = 0
+
+    for block in blocks:
+        buffer = buffer[start:] + block
+        emitted = max(0, emitted - start)
+        start = 0
+        while len(buffer) - start > chunk_size:
+            end, resume = _split(buffer, start, chunk_size, overlap)
+            chunk = buffer[start:end].strip()
+            if chunk:
+                yield chunk
+            emitted = end
+            start = resume
+
+    # Końcówka - pomijana, jeśli mieści się w zakładce poprzedniego fragmentu
+    if buffer[max(start, emitted):].strip():
+        tail = buffer[start:].strip()
+        if tail:
+            yield tail
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Kolejne listy po najwyżej `size` elementów"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, max(1, size)))
+        if not batch:
+            return
+        yield batch
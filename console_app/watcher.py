@@ -0,0 +1,281 @@
+"""
+Obserwowanie katalogu i wykrywanie nowych, w pełni zapisanych plików
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import structlog
+
+from .file_scanner import scan_directory
+
+logger = structlog.get_logger()
+
+# Zdarzenia inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _PendingFile:
+    """Plik oczekujący na zakończenie zapisu"""
+
+    __slots__ = ('signature', 'changed_at')
+
+    def __init__(self, signature: Tuple[int, int], changed_at: float):
+        self.signature = signature
+        self.changed_at = changed_at
+
+
+class DirectoryWatcher:
+    """Asynchroniczny strumień nowych plików w katalogu.
+
+    Na Linuksie korzysta z inotify (przez ctypes), w pozostałych
+    przypadkach porównuje cyklicznie zawartość katalogu. Plik jest
+    zgłaszany dopiero wtedy, gdy jego rozmiar i czas modyfikacji nie
+    zmieniły się przez `debounce` sekund - częściowo zapisane skany nie
+    trafiają do przetwarzania.
+
+    Przy `recursive` obserwowane są też podkatalogi (inotify dodaje
+    obserwację dla każdego nowego podkatalogu). Pliki istniejące w chwili
+    startu są zgłaszane tylko wtedy, gdy `existing_filter` zwróci dla nich
+    True (np. pliki dodane, gdy obserwator nie działał); bez filtra są
+    pomijane.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        extensions: Iterable[str],
+        debounce: float = 1.0,
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+        recursive: bool = False,
+        existing_filter: Optional[Callable[[Path], Awaitable[bool]]] = None
+    ):
+        self.directory = Path(directory)
+        self.extensions = {ext.lower() for ext in extensions}
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.recursive = recursive
+        self.existing_filter = existing_filter
+        self.mode: Optional[str] = None
+
+        self._pending: Dict[Path, _PendingFile] = {}
+        self._snapshot: Dict[Path, Tuple[int, int]] = {}
+        self._existing: Set[Path] = set()
+        self._inotify_fd: Optional[int] = None
+        self._libc = None
+        self._watches: Dict[int, Path] = {}
+        self._overflowed = False
+
+    def _is_candidate(self, name: str) -> bool:
+        """Czy nazwa pliku kwalifikuje się do przetwarzania"""
+        if name.startswith('.'):
+            return False
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        """Rozmiar i czas modyfikacji pliku"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        """Bieżący stan katalogu (tylko pliki kandydujące)"""
+        return {
+            entry.path: (entry.stat.st_size, entry.stat.st_mtime_ns)
+            for entry in scan_directory(self.directory, self.extensions, recursive=self.recursive)
+        }
+
+    def _note(self, path: Path):
+        """Zarejestrowanie zmiany pliku - odlicza od nowa czas stabilizacji"""
+        signature = self._signature(path)
+        if signature is not None:
+            self._pending[path] = _PendingFile(signature, time.monotonic())
+
+    def _start_inotify(self) -> bool:
+        """Uruchomienie inotify dla katalogu (i podkatalogów przy `recursive`)"""
+        if not self.use_inotify or not sys.platform.startswith('linux'):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1")
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify niedostępne ({e}) - używam odpytywania katalogu")
+            return False
+
+        self._libc = libc
+        self._inotify_fd = fd
+        try:
+            self._add_watch(self.directory)
+            if self.recursive:
+                for root, dirs, _ in os.walk(self.directory):
+                    dirs[:] = [name for name in dirs if not name.startswith('.')]
+                    for name in dirs:
+                        self._add_watch(Path(root) / name)
+        except OSError as e:
+            # Np. przekroczony limit fs.inotify.max_user_watches
+            logger.info(f"inotify niedostępne ({e}) - używam odpytywania katalogu")
+            self.close()
+            return False
+
+        asyncio.get_running_loop().add_reader(fd, self._read_inotify_events)
+        return True
+
+    def _add_watch(self, directory: Path):
+        """Dodanie obserwacji inotify dla katalogu"""
+        assert self._libc is not None and self._inotify_fd is not None
+        wd = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {directory}")
+        self._watches[wd] = directory
+
+    def _watch_new_directory(self, directory: Path):
+        """Obserwacja nowego podkatalogu i jego plików zapisanych przed dodaniem obserwacji"""
+        try:
+            self._add_watch(directory)
+            if self.recursive:
+                for root, dirs, _ in os.walk(directory):
+                    dirs[:] = [name for name in dirs if not name.startswith('.')]
+                    for name in dirs:
+                        self._add_watch(Path(root) / name)
+        except OSError as e:
+            logger.warning(f"Nie można obserwować {directory} ({e}) - przechodzę na odpytywanie katalogu")
+            self.close()
+            self.mode = 'polling'
+            self._overflowed = True
+            return
+        for entry in scan_directory(directory, self.extensions, recursive=self.recursive):
+            self._note(entry.path)
+
+    def _read_inotify_events(self):
+        """Odczyt zdarzeń inotify (wywoływane przez pętlę zdarzeń)"""
+        fd = self._inotify_fd
+        if fd is None:
+            return
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name_start = offset + _EVENT_HEADER.size
+            name = data[name_start:name_start + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset = name_start + length
+            if mask & IN_Q_OVERFLOW:
+                self._overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.'):
+                    self._watch_new_directory(directory / name)
+                    if self._inotify_fd is None:
+                        return
+            elif self._is_candidate(name):
+                self._note(directory / name)
+
+    def _poll(self):
+        """Wykrycie zmian przez porównanie zawartości katalogu"""
+        snapshot = self._scan()
+        for path, signature in snapshot.items():
+            if self._snapshot.get(path) != signature:
+                self._note(path)
+        self._snapshot = snapshot
+
+    def _ready_files(self) -> list:
+        """Pliki, których zapis się zakończył"""
+        now = time.monotonic()
+        ready = []
+        for path, pending in list(self._pending.items()):
+            signature = self._signature(path)
+            if signature is None:
+                del self._pending[path]
+            elif signature != pending.signature:
+                pending.signature = signature
+                pending.changed_at = now
+            elif now - pending.changed_at >= self.debounce:
+                del self._pending[path]
+                # Zgłoszony plik nie wraca przy porównaniu katalogu po przepełnieniu kolejki
+                self._snapshot[path] = signature
+                ready.append(path)
+        return sorted(ready)
+
+    async def watch(self) -> AsyncIterator[Path]:
+        """Strumień nowych plików - działa do anulowania zadania"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._snapshot = self._scan()
+        self.mode = 'inotify' if self._start_inotify() else 'polling'
+        logger.info(f"Obserwowanie katalogu {self.directory} ({self.mode})")
+        if self.existing_filter is not None:
+            # Pliki dodane, gdy obserwator nie działał - też po czasie stabilizacji
+            self._existing = set(self._snapshot)
+            for path in self._existing:
+                self._note(path)
+
+        tick = min(self.poll_interval, max(self.debounce / 2, 0.05))
+        last_poll = time.monotonic()
+        try:
+            while True:
+                if self._overflowed:
+                    # Przepełniona kolejka inotify - jednorazowe porównanie katalogu
+                    self._overflowed = False
+                    self._poll()
+                elif self.mode == 'polling' and time.monotonic() - last_poll >= self.poll_interval:
+                    self._poll()
+                    last_poll = time.monotonic()
+
+                for path in self._ready_files():
+                    if path in self._existing:
+                        self._existing.discard(path)
+                        assert self.existing_filter is not None
+                        if not await self.existing_filter(path):
+                            continue
+                    yield path
+
+                await asyncio.sleep(tick)
+        finally:
+            self.close()
+
+    def __aiter__(self) -> AsyncIterator[Path]:
+        return self.watch()
+
+    def close(self):
+        """Zatrzymanie inotify"""
+        if self._inotify_fd is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._inotify_fd)
+            except RuntimeError:
+                pass
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+            self._watches.clear()
@@ -0,0 +1,66 @@
+"""
+Wspólna pula procesów do zadań obciążających CPU
+"""
+
+import asyncio
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size = 0
+
+
+def default_pool_size(requested: int = 0) -> int:
+    """Liczba procesów - 0 oznacza liczbę rdzeni"""
+    if requested > 0:
+        return requested
+    return max(1, os.cpu_count() or 1)
+
+
+def get_process_pool(max_workers: int = 0) -> ProcessPoolExecutor:
+    """Pula procesów współdzielona przez wszystkie etapy przetwarzania.
+
+    Pula jest tworzona przy pierwszym użyciu; kolejne wywołania zwracają
+    tę samą instancję (rozmiar z pierwszego wywołania).
+    """
+    global _pool, _pool_size
+    if _pool is None:
+        _pool_size = default_pool_size(max_workers)
+        _pool = ProcessPoolExecutor(max_workers=_pool_size)
+        logger.info(f"Uruchomiono pulę procesów: {_pool_size}")
+    return _pool
+
+
+def process_pool_size() -> int:
+    """Rozmiar uruchomionej puli (0, jeśli jeszcze nie istnieje)"""
+    return _pool_size
+
+
+async def run_in_process(func: Callable[..., Any], *args: Any, max_workers: int = 0, **kwargs: Any) -> Any:
+    """Wykonanie funkcji w puli procesów bez blokowania pętli zdarzeń.
+
+    Funkcja i argumenty muszą dać się zserializować (pickle) - w praktyce
+    funkcje na poziomie modułu i proste typy danych.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool(max_workers)
+    return await loop.run_in_executor(pool, partial(func, *args, **kwargs))
+
+
+def shutdown_process_pool():
+    """Zamknięcie puli procesów"""
+    global _pool, _pool_size
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_size = 0
+
+
+atexit.register(shutdown_process_pool)
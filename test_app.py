@@ -4,7 +4,11 @@ Skrypt testowy dla aplikacji konsolowej Agenty
 """
 
 import asyncio
+import os
+import sqlite3
 import sys
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 
 # Dodaj ścieżkę do modułów
@@ -15,6 +19,39 @@ from console_app.receipt_processor import ReceiptProcessor
 from console_app.rag_manager import RAGManager
 from console_app.export_manager import ExportManager
 from console_app.console_ui import ConsoleUI
+from console_app.pipeline import ProcessingStats, run_ordered
+from console_app.result_cache import ResultCache
+from console_app.batch_journal import BatchJournal
+from console_app.concurrency import AdaptiveConcurrencyLimiter
+from console_app.streaming_upload import MultipartFileUpload
+from console_app.image_preprocessing import ImagePreprocessor
+from console_app.quality_check import ImageQualityChecker
+from console_app.local_ocr import LocalOCREngine
+from console_app.pdf_processing import PdfPageProcessor, extract_pdf_text
+from console_app.watcher import DirectoryWatcher
+from console_app.file_scanner import RECEIPT_EXTENSIONS, ScannedFile, scan_directory
+from console_app.result_store import STATUS_FAILED, ResultStore
+from console_app.receipt_parser import ReceiptParser, parse_receipt_text
+from console_app.analytics import SpendingAnalytics
+from console_app.perceptual_hash import HashIndex, difference_hash
+from console_app.http_utils import (
+    CircuitBreaker, CircuitOpenError, RetryBudget, RetryPolicy, httpx_retry_hint, parse_retry_after, retry_async
+)
+
+
+@contextmanager
+def env(**settings: str):
+    """Tymczasowe ustawienie zmiennych środowiskowych (poprzednie wartości przywracane po wyjściu)"""
+    previous = {key: os.environ.get(key) for key in settings}
+    os.environ.update(settings)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
 
 
 async def test_config():
@@ -147,6 +184,1611 @@ async def test_requirements():
     return True
 
 
+async def test_pipeline():
+    """Test potoku przetwarzania z ograniczoną współbieżnością"""
+    print("⚙️  Test potoku przetwarzania...")
+    
+    in_flight = 0
+    max_in_flight = 0
+    
+    async def worker(item):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # Późniejsze elementy kończą się szybciej - kolejność musi zostać zachowana
+        await asyncio.sleep(0.001 * (20 - item))
+        in_flight -= 1
+        return item * 2
+    
+    stats = ProcessingStats(total_files=20)
+    results = []
+    async for _, _, result in run_ordered(range(20), worker, workers=4, queue_size=2):
+        stats.record(100, True)
+        results.append(result)
+    
+    if results != [i * 2 for i in range(20)]:
+        print(f"❌ Nieprawidłowa kolejność wyników: {results}")
+        return False
+    if max_in_flight > 4:
+        print(f"❌ Przekroczono limit współbieżności: {max_in_flight}")
+        return False
+    
+    print(f"✅ Kolejność zachowana, maks. współbieżność: {max_in_flight}")
+    print(f"✅ Przepustowość: {stats.format_throughput()}")
+    
+    return True
+
+
+async def test_combined_upload():
+    """Test uploadu z walidacją w jednym żądaniu i powrotu do walidacji lokalnej"""
+    print("📨 Test uploadu z walidacją w jednym żądaniu...")
+    
+    import httpx
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        accepted = tmp_path / "paragon.jpg"
+        accepted.write_bytes(b"\xff\xd8\xff" + b"1" * 100)
+        rejected = tmp_path / "rozmazany.jpg"
+        rejected.write_bytes(b"\xff\xd8\xff" + b"2" * 100)
+        broken = tmp_path / "uszkodzony.jpg"
+        broken.write_bytes(b"nie jest obrazem")
+        
+        with env(DATA_DIR=str(tmp_path / "data"), RESULT_CACHE_ENABLED='false'):
+            processor = ReceiptProcessor(Config())
+            fallback = ReceiptProcessor(Config())
+        
+        requests = []
+        
+        def combined(request):
+            body = request.read()
+            requests.append(request.url.path)
+            if b'name="validate"' not in body:
+                return httpx.Response(400, text='brak pola validate')
+            if b'rozmazany.jpg' in body:
+                return httpx.Response(422, json={'issues': ['Zdjęcie nieostre']})
+            return httpx.Response(200, json={
+                'text': 'SUMA PLN 12,50', 'message': 'ok', 'validation': {'can_process': True}
+            })
+        
+        await processor.client.aclose()
+        processor.client = httpx.AsyncClient(transport=httpx.MockTransport(combined))
+        ok = await processor.process_file(accepted)
+        bad = await processor.process_file(rejected)
+        await processor.close()
+        
+        if requests != ['/api/v1/receipts/process'] * 2:
+            print(f"❌ Oczekiwano jednego żądania na plik: {requests}")
+            return False
+        if not ok['success'] or ok['text'] != 'SUMA PLN 12,50':
+            print(f"❌ Niepoprawny wynik uploadu z walidacją: {ok}")
+            return False
+        if bad['success'] or 'Zdjęcie nieostre' not in bad['error']:
+            print(f"❌ Odrzucenie 422 nie trafiło do wyniku: {bad}")
+            return False
+        
+        requests.clear()
+        
+        def legacy(request):
+            requests.append(request.url.path)
+            if request.url.path.endswith('process'):
+                return httpx.Response(404)
+            return httpx.Response(200, json={'text': 'SUMA PLN 12,50', 'message': 'ok'})
+        
+        await fallback.client.aclose()
+        fallback.client = httpx.AsyncClient(transport=httpx.MockTransport(legacy))
+        first = await fallback.process_file(accepted)
+        second = await fallback.process_file(accepted)
+        local_reject = await fallback.process_file(broken)
+        await fallback.close()
+        
+        expected = ['/api/v1/receipts/process', '/api/v1/receipts/upload', '/api/v1/receipts/upload']
+        if requests != expected:
+            print(f"❌ Niepoprawny powrót do walidacji lokalnej: {requests}")
+            return False
+        if not (first['success'] and second['success']) or first['validation'].get('source') != 'local':
+            print(f"❌ Brak walidacji lokalnej po 404: {first}")
+            return False
+        if local_reject['success'] or 'nie odpowiada' not in local_reject['error']:
+            print(f"❌ Uszkodzony plik nie został odrzucony lokalnie: {local_reject}")
+            return False
+        
+        # Backend ignorujący validate=true (200 bez `validation`) - walidacja lokalna
+        requests.clear()
+        
+        def ignoring(request):
+            requests.append(request.url.path)
+            return httpx.Response(200, json={'text': 'SUMA PLN 12,50', 'message': 'ok'})
+        
+        with env(DATA_DIR=str(tmp_path / "data"), RESULT_CACHE_ENABLED='false'):
+            unvalidated = ReceiptProcessor(Config())
+        await unvalidated.client.aclose()
+        unvalidated.client = httpx.AsyncClient(transport=httpx.MockTransport(ignoring))
+        ignored_reject = await unvalidated.process_file(broken)
+        later = await unvalidated.process_file(accepted)
+        await unvalidated.close()
+        
+        if ignored_reject['success'] or requests != ['/api/v1/receipts/process', '/api/v1/receipts/upload']:
+            print(f"❌ Brak walidacji lokalnej przy ignorowanym validate: {requests}, {ignored_reject}")
+            return False
+        if not later['success'] or later['validation'].get('source') != 'local':
+            print(f"❌ Niepoprawny wynik po ignorowanej walidacji: {later}")
+            return False
+        
+        print("✅ Jedno żądanie na plik, odrzucenie 422, po 404 walidacja lokalna bez ponownej próby")
+    
+    return True
+
+
+async def test_result_cache():
+    """Test cache wyników kluczowanego skrótem zawartości"""
+    print("🗄️  Test cache wyników...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        receipt = tmp_path / "paragon.jpg"
+        receipt.write_bytes(b"\xff\xd8\xff" + b"0" * 100)
+        
+        cache = ResultCache(tmp_path / "cache", max_size_bytes=10 * 1024 * 1024, max_age_seconds=3600)
+        key = ResultCache.make_key(cache.file_hash(receipt), {'ocr_language': 'pol'})
+        other_key = ResultCache.make_key(cache.file_hash(receipt), {'ocr_language': 'eng'})
+        
+        if cache.get(key) is not None:
+            print("❌ Pusty cache zwrócił wynik")
+            return False
+        
+        cache.put(key, {'success': True, 'text': 'SUMA 10,00'})
+        cache.flush()
+        
+        # Nowa instancja - cache musi przetrwać restart
+        cache = ResultCache(tmp_path / "cache", max_size_bytes=10 * 1024 * 1024, max_age_seconds=3600)
+        if (cache.get(key) or {}).get('text') != 'SUMA 10,00':
+            print("❌ Brak wyniku w cache po ponownym otwarciu")
+            return False
+        if cache.get(other_key) is not None:
+            print("❌ Zmiana ustawień OCR nie unieważniła wpisu")
+            return False
+        
+        print("✅ Cache zachowuje wyniki i uwzględnia ustawienia OCR")
+    
+    return True
+
+
+async def test_batch_journal():
+    """Test dziennika przetwarzania wsadowego"""
+    print("📓 Test dziennika wsadu...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_dir = Path(tmp)
+        journal = BatchJournal.create(journal_dir, "/paragony", total=3)
+        journal.record({'file': '/paragony/a.jpg', 'success': True})
+        journal.record({'file': '/paragony/b.jpg', 'success': False, 'error': 'timeout'})
+        journal.close()
+        
+        # Symulacja awarii w trakcie zapisu ostatniej linii
+        with open(journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"type": "result", "file": "/paragony/c.j')
+        
+        resumed = BatchJournal.latest(journal_dir, "/paragony", unfinished_only=True)
+        if resumed is None:
+            print("❌ Nie znaleziono niedokończonego dziennika")
+            return False
+        if resumed.successful_files != {'/paragony/a.jpg'} or resumed.failed_files != {'/paragony/b.jpg'}:
+            print(f"❌ Nieprawidłowy stan dziennika: {resumed.summary()}")
+            return False
+        
+        resumed.mark_complete()
+        resumed.close()
+        if BatchJournal.latest(journal_dir, "/paragony", unfinished_only=True) is not None:
+            print("❌ Zakończony wsad nadal oznaczony jako niedokończony")
+            return False
+        
+        print("✅ Dziennik odtwarza stan po awarii")
+    
+    return True
+
+
+async def test_adaptive_limiter():
+    """Test adaptacyjnego limitu współbieżności"""
+    print("🎚️  Test adaptacyjnego limitu współbieżności...")
+    
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=1, max_limit=8)
+    
+    async def request(status_code: int):
+        async with limiter.slot() as slot:
+            await asyncio.sleep(0.001)
+            slot.record_status(status_code)
+    
+    # Stabilne opóźnienie - limit rośnie do maksimum
+    for _ in range(20):
+        await asyncio.gather(*(request(200) for _ in range(limiter.current_limit)))
+    if limiter.current_limit != 8:
+        print(f"❌ Limit nie wzrósł do maksimum: {limiter.current_limit}")
+        return False
+    
+    # Przeciążenie backendu (503) - limit maleje
+    await request(503)
+    if limiter.current_limit >= 8:
+        print(f"❌ Limit nie zmalał po odpowiedzi 503: {limiter.current_limit}")
+        return False
+    
+    # Szybkie błędy (odmowa połączenia, 404) nie zaniżają opóźnienia bazowego
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, max_limit=8, min_latency_delta=0.005)
+    
+    async def timed_request(delay: float, status_code: int = 200):
+        async with limiter.slot() as slot:
+            await asyncio.sleep(delay)
+            slot.record_status(status_code)
+    
+    async def refused():
+        try:
+            async with limiter.slot():
+                raise ConnectionError("odmowa połączenia")
+        except ConnectionError:
+            pass
+    
+    await timed_request(0.02)
+    for _ in range(5):
+        await refused()
+        await request(404)
+    for _ in range(10):
+        await timed_request(0.02)
+    if limiter.current_limit < 8 or (limiter.baseline_latency or 0.0) < 0.015:
+        print(f"❌ Szybkie błędy zaniżyły opóźnienie bazowe: {limiter.to_dict()}")
+        return False
+    
+    print(f"✅ Limit reaguje na przeciążenie: {limiter.to_dict()}")
+    
+    return True
+
+
+async def test_retry_policy():
+    """Test ponowień z wykładniczym opóźnieniem i budżetem"""
+    print("🔁 Test ponowień żądań...")
+    
+    import httpx
+    
+    attempts = []
+    
+    def handler(request):
+        attempts.append(request.url.path)
+        if len(attempts) < 3:
+            return httpx.Response(503, headers={'Retry-After': '0'})
+        return httpx.Response(200, json={'ok': True})
+    
+    policy = RetryPolicy(max_retries=3, base_delay=0.001, max_delay=0.01, budget=RetryBudget(ratio=0.0, min_retries=5))
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response = await retry_async(lambda: client.get("http://backend/api/health"), policy, retry_hint=httpx_retry_hint)
+    
+    if response.status_code != 200 or len(attempts) != 3:
+        print(f"❌ Nieprawidłowe ponowienia: status {response.status_code}, prób {len(attempts)}")
+        return False
+    
+    # Wyczerpany budżet - brak kolejnych ponowień
+    policy.budget = RetryBudget(ratio=0.0, min_retries=0)
+    attempts.clear()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response = await retry_async(lambda: client.get("http://backend/api/health"), policy, retry_hint=httpx_retry_hint)
+    if response.status_code != 503 or len(attempts) != 1:
+        print("❌ Budżet ponowień nie został uwzględniony")
+        return False
+    
+    if parse_retry_after('7') != 7.0 or parse_retry_after('nieprawidłowy') is not None:
+        print("❌ Nieprawidłowe parsowanie Retry-After")
+        return False
+    
+    # Upload nie jest idempotentny - ponowienie tylko, gdy żądanie nie dotarło
+    with tempfile.TemporaryDirectory() as tmp:
+        receipt = Path(tmp) / "paragon.jpg"
+        receipt.write_bytes(b"\xff\xd8\xff" + b"0" * 100)
+        with env(DATA_DIR=str(Path(tmp) / "dane")):
+            processor = ReceiptProcessor(Config())
+        processor.retry_policy = RetryPolicy(max_retries=3, base_delay=0.001, max_delay=0.01)
+        failures = []
+        
+        def upload_handler(request):
+            attempts.append(request.url.path)
+            if failures:
+                raise failures.pop(0)("symulowany błąd", request=request)
+            return httpx.Response(200, json={'id': 1})
+        
+        await processor.client.aclose()
+        processor.client = httpx.AsyncClient(transport=httpx.MockTransport(upload_handler))
+        attempts.clear()
+        failures.append(httpx.ReadTimeout)
+        timed_out = await processor._upload_and_process(receipt)
+        read_timeout_attempts = len(attempts)
+        attempts.clear()
+        failures.append(httpx.ConnectError)
+        connected = await processor._upload_and_process(receipt)
+        await processor.close()
+        if read_timeout_attempts != 1 or 'error' not in timed_out or len(attempts) != 2 or connected != {'id': 1}:
+            print(f"❌ Niepoprawne ponowienia uploadu: {read_timeout_attempts}, {len(attempts)}")
+            return False
+    
+    print("✅ Ponowienia respektują limit prób, Retry-After i budżet")
+    
+    return True
+
+
+async def test_circuit_breaker():
+    """Test bezpiecznika endpointu podczas awarii backendu"""
+    print("⛔ Test bezpiecznika (circuit breaker)...")
+    
+    import httpx
+    
+    backend = {'up': False, 'calls': 0}
+    
+    def handler(request):
+        backend['calls'] += 1
+        if not backend['up']:
+            return httpx.Response(503)
+        return httpx.Response(200, json={'ok': True})
+    
+    async def probe():
+        return backend['up']
+    
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.02, park_timeout=5.0, probe=probe)
+    policy = RetryPolicy(max_retries=0)
+    
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        async def call(park=True):
+            return await retry_async(lambda: client.get("http://backend/api/v1/receipts/upload"),
+                                     policy, breaker=breaker, park=park)
+        
+        await call()
+        await call()
+        if breaker.state != CircuitBreaker.OPEN:
+            print(f"❌ Obwód nie otworzył się po błędach: {breaker.state}")
+            return False
+        
+        # Otwarty obwód - żądanie bez parkowania kończy się od razu
+        calls_before = backend['calls']
+        try:
+            await call(park=False)
+            print("❌ Żądanie przeszło przez otwarty obwód")
+            return False
+        except CircuitOpenError:
+            pass
+        
+        # Zaparkowane żądania ruszają po powrocie backendu
+        parked = [asyncio.create_task(call()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        if backend['calls'] != calls_before:
+            print("❌ Zaparkowane żądania trafiły do niedostępnego backendu")
+            return False
+        backend['up'] = True
+        responses = await asyncio.wait_for(asyncio.gather(*parked), timeout=2)
+    
+    if any(r.status_code != 200 for r in responses) or breaker.state != CircuitBreaker.CLOSED:
+        print(f"❌ Obwód nie wrócił do stanu zamkniętego: {breaker.to_dict()}")
+        return False
+    
+    print("✅ Bezpiecznik wstrzymuje ruch i wznawia go po udanej sondzie")
+    
+    return True
+
+
+async def test_streaming_upload():
+    """Test strumieniowego ciała multipart"""
+    print("📤 Test strumieniowego wysyłania pliku...")
+    
+    from email.parser import BytesParser
+    from email import policy
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "paragon.jpg"
+        payload = bytes(range(256)) * 300
+        path.write_bytes(payload)
+        
+        upload = MultipartFileUpload(path, "image/jpeg", data={'auto_enhance': 'true'}, chunk_size=4096)
+        body = b"".join([chunk async for chunk in upload])
+    
+    if len(body) != upload.content_length:
+        print(f"❌ Content-Length {upload.content_length} != {len(body)}")
+        return False
+    
+    message = BytesParser(policy=policy.HTTP).parsebytes(
+        f"Content-Type: {upload.headers['Content-Type']}\r\n\r\n".encode() + body
+    )
+    parts = {part.get_param('name', header='content-disposition'): part for part in message.iter_parts()}
+    if parts['auto_enhance'].get_content() != 'true':
+        print("❌ Niepoprawne pole formularza")
+        return False
+    if parts['file'].get_filename() != "paragon.jpg" or parts['file'].get_content() != payload:
+        print("❌ Niepoprawna zawartość pliku w ciele żądania")
+        return False
+    
+    print("✅ Ciało multipart poprawne, plik wysyłany porcjami")
+    
+    return True
+
+
+async def test_image_preprocessing():
+    """Test zmniejszania zdjęć przed wysłaniem"""
+    print("🖼️  Test wstępnego przetwarzania zdjęć...")
+    
+    from types import SimpleNamespace
+    from PIL import Image
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        config = SimpleNamespace(
+            DATA_DIR=tmp, PREPROCESS_MAX_DIMENSION=1200, PREPROCESS_GRAYSCALE=True,
+            PREPROCESS_JPEG_QUALITY=85, PROCESS_POOL_WORKERS=2
+        )
+        preprocessor = ImagePreprocessor(config)
+        
+        photo = tmp_path / "zdjecie.png"
+        Image.effect_noise((3000, 2000), 40).convert('RGB').save(photo)
+        
+        preprocessing = await preprocessor.preprocess(photo)
+        if not preprocessing['applied'] or max(preprocessing['width'], preprocessing['height']) > 1200:
+            print(f"❌ Zdjęcie nie zostało zmniejszone: {preprocessing}")
+            return False
+        with Image.open(preprocessing['path']) as shrunk:
+            if shrunk.mode != 'L' or shrunk.format != 'JPEG':
+                print(f"❌ Niepoprawny format kopii: {shrunk.format} {shrunk.mode}")
+                return False
+        
+        stats = ProcessingStats(total_files=1)
+        stats.record(preprocessing['original_size'], True, saved_bytes=ImagePreprocessor.bytes_saved(preprocessing))
+        if stats.to_dict()['saved_bytes'] <= 0:
+            print("❌ Brak zaoszczędzonych bajtów w statystykach")
+            return False
+        
+        preprocessor.cleanup(preprocessing)
+        if Path(preprocessing['path']).exists():
+            print("❌ Kopia robocza nie została usunięta")
+            return False
+        
+        # Mały plik - przetworzona kopia nie byłaby mniejsza, wysyłany jest oryginał
+        small = tmp_path / "maly.jpg"
+        Image.new('L', (200, 100), 255).save(small, quality=50)
+        if (await preprocessor.preprocess(small))['path'] != small:
+            print("❌ Dla małego pliku nie wysłano oryginału")
+            return False
+        
+        print(f"✅ Zdjęcie zmniejszone ({stats.format_throughput()})")
+    
+    return True
+
+
+async def test_quality_check():
+    """Test lokalnej oceny jakości zdjęć"""
+    print("🔍 Test lokalnej oceny jakości...")
+    
+    from types import SimpleNamespace
+    from PIL import Image, ImageDraw, ImageFilter
+    
+    config = SimpleNamespace(
+        QUALITY_MIN_SHARPNESS=50, QUALITY_MIN_CONTRAST=40, QUALITY_MIN_RESOLUTION=400, PROCESS_POOL_WORKERS=2
+    )
+    checker = ImageQualityChecker(config)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        receipt = Image.new('L', (800, 2000), 235)
+        draw = ImageDraw.Draw(receipt)
+        for y in range(40, 1960, 40):
+            draw.text((40, y), "CHLEB PSZENNY 1 x 4,50  4,50 A", fill=20)
+        
+        receipt.save(tmp_path / "ostry.jpg", quality=90)
+        receipt.filter(ImageFilter.GaussianBlur(8)).save(tmp_path / "rozmazany.jpg", quality=90)
+        receipt.point(lambda v: 120 + v * 0.08).save(tmp_path / "blady.jpg", quality=90)
+        receipt.resize((120, 300)).save(tmp_path / "maly.jpg", quality=90)
+        
+        sharp = await checker.check(tmp_path / "ostry.jpg")
+        if not sharp['can_process'] or sharp['source'] != 'local' or 'sharpness' not in sharp['metrics']:
+            print(f"❌ Odrzucono poprawne zdjęcie: {sharp}")
+            return False
+        
+        for name, expected in [("rozmazany.jpg", "rozmazane"), ("blady.jpg", "kontrast"), ("maly.jpg", "rozdzielczość")]:
+            validation = await checker.check(tmp_path / name)
+            if validation['can_process'] or not any(expected in issue for issue in validation['issues']):
+                print(f"❌ Nie odrzucono pliku {name}: {validation}")
+                return False
+        
+        pdf = tmp_path / "skan.pdf"
+        pdf.write_bytes(b"%PDF-1.4")
+        if not (await checker.check(pdf))['can_process']:
+            print("❌ Ocena jakości odrzuciła plik PDF")
+            return False
+        
+        print(f"✅ Ocena jakości odrzuca nieczytelne zdjęcia (ostry: {sharp['quality_score']})")
+    
+    return True
+
+
+async def test_local_ocr_engine():
+    """Test wyboru i obsługi lokalnego silnika OCR"""
+    print("🔤 Test lokalnego silnika OCR...")
+    
+    from types import SimpleNamespace
+    
+    config = SimpleNamespace(OCR_LANGUAGE='pol', OCR_TIMEOUT=30, PROCESS_POOL_WORKERS=0)
+    if not LocalOCREngine(config).is_available():
+        print("⏭️  Pominięto - Tesseract (pytesseract) niedostępny")
+        return True
+    
+    import pytesseract
+    
+    original_cmd = pytesseract.pytesseract.tesseract_cmd
+    pytesseract.pytesseract.tesseract_cmd = '/nieistniejacy/tesseract'
+    try:
+        engine = LocalOCREngine(config)
+        if engine.is_available():
+            print("❌ Silnik zgłasza dostępność bez programu tesseract")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            receipt = Path(tmp) / "paragon.jpg"
+            receipt.write_bytes(b"\xff\xd8\xff" + b"0" * 100)
+            result = await engine.process(receipt)
+            if 'error' not in result:
+                print(f"❌ Brak błędu przy niedostępnym OCR: {result}")
+                return False
+            
+            # Tryb auto bez Tesseracta wraca do backendu
+            with env(OCR_ENGINE='auto', DATA_DIR=str(Path(tmp) / "data")):
+                processor = ReceiptProcessor(Config())
+            uses_local = processor.uses_local_ocr
+            await processor.close()
+            if uses_local:
+                print("❌ Tryb auto wybrał niedostępny lokalny OCR")
+                return False
+    finally:
+        pytesseract.pytesseract.tesseract_cmd = original_cmd
+    
+    print("✅ Lokalny OCR wykrywa brak Tesseracta, tryb auto używa backendu")
+    
+    return True
+
+
+async def test_pdf_pages():
+    """Test równoległego przetwarzania stron PDF"""
+    print("📑 Test przetwarzania PDF strona po stronie...")
+    
+    from types import SimpleNamespace
+    from PIL import Image
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        config = SimpleNamespace(DATA_DIR=tmp, PDF_RASTER_DPI=72, PDF_PAGE_WORKERS=3, PROCESS_POOL_WORKERS=2)
+        pages = [Image.new('L', (200, 300), 40 * i) for i in range(5)]
+        document = tmp_path / "faktura.pdf"
+        pages[0].save(document, save_all=True, append_images=pages[1:])
+        single = tmp_path / "paragon.pdf"
+        pages[0].save(single)
+        
+        active = {'now': 0, 'max': 0}
+        
+        async def recognize_page(page_path):
+            page_number = int(page_path.stem.rsplit('_', 1)[1])
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+            # Późniejsze strony kończą się szybciej - kolejność musi zostać zachowana
+            await asyncio.sleep(0.01 * (6 - page_number))
+            active['now'] -= 1
+            return {'text': f"strona {page_number}"}
+        
+        processor = PdfPageProcessor(config)
+        result = await processor.process(document, recognize_page)
+        assert result is not None
+        expected = "\n\n".join(f"strona {i}" for i in range(1, 6))
+        if result.get('text') != expected or result['processing_info']['pages'] != 5:
+            print(f"❌ Niepoprawny wynik: {result}")
+            return False
+        if active['max'] < 2:
+            print("❌ Strony nie były przetwarzane równolegle")
+            return False
+        if await processor.process(single, recognize_page) is not None:
+            print("❌ Dokument jednostronicowy nie powinien być dzielony")
+            return False
+        if any(processor.temp_root.iterdir()):
+            print("❌ Pozostały pliki tymczasowe stron")
+            return False
+        
+        print(f"✅ 5 stron przetworzonych równolegle (maks. {active['max']} naraz), tekst w kolejności stron")
+    
+    return True
+
+
+def _write_text_pdf(path: Path, lines, pages: int = 1, blank_pages: int = 0):
+    """Minimalny PDF z warstwą tekstową (`lines` na każdej stronie, z numerem strony) i pustymi stronami na końcu"""
+    total = pages + blank_pages
+    font = 3 + 2 * total
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [" + " ".join(f"{3 + 2 * i} 0 R" for i in range(total)) + f"] /Count {total} >>",
+    ]
+    for i in range(total):
+        page_lines = lines if pages == 1 else [f"Strona {i + 1}"] + list(lines)
+        stream = "BT /F1 12 Tf 50 780 Td 14 TL " + " ".join(f"({line}) '" for line in page_lines) + " ET"
+        if i >= pages:
+            stream = ""
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    body = "%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n"
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_bytes(body.encode('latin-1'))
+
+
+async def test_pdf_text_layer():
+    """Test szybkiej ścieżki dla PDF z warstwą tekstową"""
+    print("⚡ Test odczytu warstwy tekstowej PDF...")
+    
+    from PIL import Image
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        invoice = tmp_path / "e-faktura.pdf"
+        # Pusta ostatnia strona (np. regulamin jako obraz) nie wyłącza szybkiej ścieżki
+        _write_text_pdf(invoice, ["FAKTURA VAT 123/2024", "Mleko 2 x 3,49 6,98", "RAZEM PLN 6,98"], blank_pages=1)
+        scan = tmp_path / "skan.pdf"
+        Image.new('L', (200, 300), 200).save(scan)
+        
+        text_layer = extract_pdf_text(str(invoice), min_chars_per_page=20)
+        if not text_layer or "RAZEM PLN 6,98" not in text_layer['text'] or text_layer['pages'] != 2:
+            print(f"❌ Nie odczytano warstwy tekstowej: {text_layer}")
+            return False
+        if extract_pdf_text(str(scan), min_chars_per_page=20) is not None:
+            print("❌ Skan bez tekstu uznany za dokument z warstwą tekstową")
+            return False
+        
+        # Przetwarzanie bez żadnego żądania do backendu
+        with env(DATA_DIR=str(tmp_path / "data")):
+            processor = ReceiptProcessor(Config())
+        
+        import httpx
+        
+        def handler(request):
+            raise AssertionError(f"Nieoczekiwane żądanie: {request.url}")
+        
+        await processor.client.aclose()
+        processor.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        stats = ProcessingStats(total_files=1)
+        results = await processor.process_files([invoice], show_progress=False, stats=stats)
+        await processor.close()
+        
+        if not results[0]['success'] or "FAKTURA VAT" not in results[0]['text']:
+            print(f"❌ Niepoprawny wynik szybkiej ścieżki: {results[0]}")
+            return False
+        if stats.to_dict()['fast_path_files'] != 1:
+            print(f"❌ Brak trafienia w statystykach: {stats.to_dict()}")
+            return False
+        
+        print(f"✅ E-faktura odczytana bez OCR ({results[0]['processing_info']['duration']:.3f}s)")
+    
+    return True
+
+
+async def test_directory_watcher():
+    """Test obserwatora katalogu z pomijaniem częściowo zapisanych plików"""
+    print("👀 Test obserwowania katalogu...")
+    
+    for use_inotify in (True, False):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            (tmp_path / "stary.jpg").write_bytes(b"\xff\xd8\xff")
+            (tmp_path / "przetworzony.jpg").write_bytes(b"\xff\xd8\xff")
+            
+            async def not_processed(path):
+                return path.name != "przetworzony.jpg"
+            
+            watcher = DirectoryWatcher(tmp_path, ['.jpg', '.pdf'], debounce=0.3, poll_interval=0.1,
+                                       use_inotify=use_inotify, recursive=True, existing_filter=not_processed)
+            seen = []
+            
+            async def collect():
+                async for path in watcher.watch():
+                    seen.append((path.name, path.stat().st_size))
+            
+            task = asyncio.create_task(collect())
+            await asyncio.sleep(0.2)
+            
+            # Skaner zapisuje plik porcjami - zgłoszenie dopiero po zakończeniu zapisu
+            with open(tmp_path / "nowy.pdf", 'wb') as f:
+                for _ in range(4):
+                    f.write(b"%" * 1000)
+                    f.flush()
+                    await asyncio.sleep(0.1)
+            (tmp_path / "notatka.txt").write_text("pomijany")
+            # Nowy podkatalog - plik zapisany w nim zaraz po utworzeniu
+            (tmp_path / "2024" / "maj").mkdir(parents=True)
+            (tmp_path / "2024" / "maj" / "skan.jpg").write_bytes(b"\xff\xd8\xff" * 10)
+            
+            for _ in range(40):
+                if len(seen) >= 3:
+                    break
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(0.4)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            
+            if sorted(seen) != [("nowy.pdf", 4000), ("skan.jpg", 30), ("stary.jpg", 3)]:
+                print(f"❌ Niepoprawne zgłoszenia ({watcher.mode}): {seen}")
+                return False
+    
+    print("✅ Nowe pliki (także w podkatalogach i zastane przy starcie) zgłaszane po zakończeniu zapisu")
+    
+    return True
+
+
+async def test_file_scanner():
+    """Test jednoprzebiegowego skanera katalogów"""
+    print("🗂️  Test skanera katalogów...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "2024" / "styczen").mkdir(parents=True)
+        (root / ".ukryty").mkdir()
+        for name in ["a.jpg", "B.JPG", "c.Pdf", "notatka.txt", "2024/d.png", "2024/styczen/e.tiff", ".ukryty/f.jpg"]:
+            (root / name).write_bytes(b"x" * 10)
+        # Dowiązanie do tego samego pliku nie może dać duplikatu
+        os.symlink(root / "a.jpg", root / "link.jpg")
+        
+        found = list(scan_directory(root, RECEIPT_EXTENSIONS))
+        names = sorted(entry.name for entry in found)
+        if names not in (["B.JPG", "a.jpg", "c.Pdf", "d.png", "e.tiff"], ["B.JPG", "c.Pdf", "d.png", "e.tiff", "link.jpg"]):
+            print(f"❌ Niepoprawne pliki: {names}")
+            return False
+        if any(entry.size != 10 for entry in found) or str(found[0]) != os.fspath(found[0].path):
+            print("❌ Niepoprawne dane wpisów skanera")
+            return False
+        
+        flat = sorted(entry.name for entry in scan_directory(root, RECEIPT_EXTENSIONS, recursive=False))
+        if "d.png" in flat or "B.JPG" not in flat:
+            print(f"❌ Skanowanie bez podkatalogów: {flat}")
+            return False
+        
+        # Leniwe zwracanie - pierwszy plik dostępny przed przejściem całego drzewa
+        first = next(scan_directory(root, RECEIPT_EXTENSIONS))
+        if not isinstance(first, ScannedFile):
+            print("❌ Skaner nie zwraca wpisów ScannedFile")
+            return False
+        
+        # Strumień ze skanera - liczba plików ustalana w trakcie przetwarzania
+        with env(DATA_DIR=str(root / ".dane"), OCR_ENGINE='backend'):
+            processor = ReceiptProcessor(Config())
+        
+        async def fake_process(file_path):
+            return {'success': True, 'file': str(file_path), 'text': ''}
+        
+        processor.process_file = fake_process
+        stats = ProcessingStats()
+        await processor.process_files(scan_directory(root, RECEIPT_EXTENSIONS), show_progress=False, stats=stats)
+        await processor.close()
+        if stats.total_files != len(found) or stats.processed_files != len(found):
+            print(f"❌ Niepoprawna liczba plików strumienia: {stats.to_dict()}")
+            return False
+        
+        print(f"✅ Skaner znalazł {len(found)} plików jednym przebiegiem (bez duplikatów i ukrytych)")
+    
+    return True
+
+
+async def test_result_store():
+    """Test magazynu wyników SQLite"""
+    print("🗄️  Test magazynu wyników...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "results.db"
+        store = ResultStore(db_path, batch_size=3)
+        
+        store.add_receipt_result({'file': 'a.jpg', 'file_hash': 'h1', 'success': False, 'error': 'timeout'})
+        store.add_receipt_result({'file': 'b.jpg', 'file_hash': 'h2', 'success': True, 'text': 'Biedronka'})
+        # Partia niepełna - nic jeszcze nie trafiło do bazy
+        if store._conn.execute("SELECT COUNT(*) FROM receipt_results").fetchone()[0] != 0:
+            print("❌ Wyniki zapisane przed zapełnieniem partii")
+            return False
+        store.add_receipt_result({'file': 'a.jpg', 'file_hash': 'h1', 'success': True, 'text': 'Lidl', 'cached': True})
+        store.add_receipt_result({'file': 'c.jpg', 'file_hash': 'h3', 'success': False, 'error': 'zły format'})
+        
+        latest = store.receipt_results(latest_only=True)
+        if sorted(r['file'] for r in latest) != ['a.jpg', 'b.jpg', 'c.jpg']:
+            print(f"❌ Niepoprawne ostatnie wyniki: {latest}")
+            return False
+        if len(store.receipt_results(file='a.jpg')) != 2 or len(store.receipt_results(file_hash='h2')) != 1:
+            print("❌ Niepoprawne wyszukiwanie po pliku lub skrócie")
+            return False
+        if [r['file'] for r in store.receipt_results(status=STATUS_FAILED)] != ['c.jpg', 'a.jpg']:
+            print("❌ Niepoprawne wyszukiwanie po statusie")
+            return False
+        if store.receipt_results(since='2000-01-01', until='2000-12-31'):
+            print("❌ Niepoprawne wyszukiwanie po dacie")
+            return False
+        
+        if store.failed_files() != ['c.jpg'] or store.failed_files(['a.jpg', 'b.jpg']):
+            print(f"❌ Niepoprawne pliki z błędami: {store.failed_files()}")
+            return False
+        
+        store.add_rag_search("mleko", [
+            {'source': 'ceny.md', 'similarity': 0.9, 'content': 'mleko 3,49'},
+            {'source': 'sklepy.md', 'similarity': 0.5, 'content': 'Lidl'}
+        ])
+        stats = store.statistics()
+        expected = {'processed_total': 4, 'successful': 2, 'failed': 2, 'from_cache': 1,
+                    'unique_files': 3, 'unique_contents': 3, 'rag_searches': 1}
+        if any(stats[key] != value for key, value in expected.items()):
+            print(f"❌ Niepoprawne statystyki: {stats}")
+            return False
+        store.close()
+        
+        # Dane przetrwają ponowne otwarcie bazy
+        reopened = ResultStore(db_path)
+        rag = reopened.rag_results()
+        if [r['source'] for r in rag] != ['ceny.md', 'sklepy.md'] or rag[0]['query'] != 'mleko':
+            print(f"❌ Niepoprawne wyniki RAG po ponownym otwarciu: {rag}")
+            return False
+        if reopened.statistics()['processed_total'] != 4:
+            print("❌ Wyniki paragonów utracone po ponownym otwarciu")
+            return False
+        reopened.close()
+
+        
+        # Tryb strumieniowy (obserwowanie katalogu) zatwierdza każdy wynik od razu
+        with env(DATA_DIR=str(Path(tmp) / "dane")):
+            processor = ReceiptProcessor(Config())
+        
+        async def fake_process(file_path):
+            return {'success': True, 'file': str(file_path), 'text': 'Lidl'}
+        
+        processor._process_file = fake_process
+        committed = []
+        
+        async def stream():
+            yield Path(tmp) / "d.jpg"
+            await asyncio.sleep(0.05)
+            with sqlite3.connect(str(processor.config.get_result_store_path())) as conn:
+                committed.append(conn.execute("SELECT COUNT(*) FROM receipt_results").fetchone()[0])
+        
+        await processor.process_stream(stream(), lambda result: None)
+        await processor.close()
+        if committed != [1]:
+            print(f"❌ Wynik strumienia niezatwierdzony przed końcem strumienia: {committed}")
+            return False
+        
+        # Bez cache wynik rozpoznawany po ścieżce i zawartości - plik podmieniony pod tą samą nazwą jest nowy
+        import httpx
+        
+        with env(DATA_DIR=str(Path(tmp) / "bez_cache"), RESULT_CACHE_ENABLED='false'):
+            processor = ReceiptProcessor(Config())
+        await processor.client.aclose()
+        processor.client = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={'text': 'Lidl', 'validation': {'can_process': True}})
+        ))
+        receipt = Path(tmp) / "paragon.jpg"
+        receipt.write_bytes(b"\xff\xd8\xff" + b"1" * 100)
+        await processor.process_file(receipt)
+        known = await processor.is_processed(receipt)
+        receipt.write_bytes(b"\xff\xd8\xff" + b"2" * 100)
+        replaced = await processor.is_processed(receipt)
+        await processor.close()
+        if not known or replaced:
+            print(f"❌ Podmieniony plik uznany za przetworzony bez cache: {known}, {replaced}")
+            return False
+        
+        print(f"✅ Magazyn wyników: {stats['processed_total']} wyników, zapis partiami, trwały po ponownym otwarciu")
+    
+    return True
+
+
+async def test_receipt_parser():
+    """Test parsera tekstu paragonów"""
+    print("🧾 Test parsera paragonów...")
+    
+    text = """BIEDRONKA "JERONIMO MARTINS POLSKA" S.A.
+ul. Żniwna 5, 62-025 Kostrzyn
+NIP 779-10-11-327
+15.03.2024          nr wydr. 123456
+PARAGON FISKALNY
+Mleko 3,2% 1L      2 x3,49     6,98 C
+Jabłka luz      1,250 kg x4,00  5,00 C
+Rabat              -1,00 C
+Piwo jasne         1 *3,99     3,99 A
+Reklamówka                 0,99 A
+SPRZEDAŻ OPODATKOWANA A     4,98
+PTU A 23,00%               0,93
+SPRZEDAŻ OPODATKOWANA C    10,98
+PTU C 5,00%                0,52
+SUMA PTU                   1,45
+SUMA PLN                  15,96
+GOTÓWKA                   20,00
+RESZTA                     4,04
+"""
+    record = parse_receipt_text(text)
+    if (record['shop'], record['nip'], record['date']) != ('Biedronka', '7791011327', '2024-03-15'):
+        print(f"❌ Niepoprawny nagłówek: {record['shop']}, {record['nip']}, {record['date']}")
+        return False
+    names = [item['name'] for item in record['items']]
+    if names != ['Mleko 3,2% 1L', 'Jabłka luz', 'Piwo jasne', 'Reklamówka']:
+        print(f"❌ Niepoprawne pozycje: {names}")
+        return False
+    apples = record['items'][1]
+    if (apples['quantity'], apples['unit_price'], apples['discount'], apples['vat_group']) != (1.25, 4.0, -1.0, 'C'):
+        print(f"❌ Niepoprawna pozycja z rabatem: {apples}")
+        return False
+    if record['vat_rates'] != {'A': 23.0, 'C': 5.0} or record['total_vat'] != 1.45:
+        print(f"❌ Niepoprawne PTU: {record['vat_rates']}, {record['total_vat']}")
+        return False
+    if record['total'] != 15.96 or not record['complete']:
+        print(f"❌ Niepoprawna suma: {record['total']} (pozycje {record['items_total']})")
+        return False
+    
+    # Błędny NIP (cyfra kontrolna) i brak sumy
+    broken = parse_receipt_text("Sklep u Jana\nNIP 123-456-78-90\nChleb 1 x4,99 4,99 C")
+    if broken['nip'] is not None or broken['total'] is not None or broken['complete']:
+        print(f"❌ Niepoprawne parsowanie niepełnego paragonu: {broken}")
+        return False
+    
+    # Partie w puli procesów - kolejność i wynik jak przy parsowaniu pojedynczym
+    from types import SimpleNamespace
+    parser = ReceiptParser(SimpleNamespace(RECEIPT_PARSER_BATCH_SIZE=2, PROCESS_POOL_WORKERS=2))
+    texts = [text, "Sklep u Jana\nChleb 1 x4,99 4,99 C", text]
+    if await parser.parse_many(texts) != [parse_receipt_text(t) for t in texts]:
+        print("❌ Parsowanie partiami różni się od pojedynczego")
+        return False
+    if parser.parse("   ") is not None:
+        print("❌ Pusty tekst powinien dać None")
+        return False
+    
+    # Rekord paragonu zapisany w cache - trafienie nie parsuje tekstu ponownie
+    import httpx
+    from console_app import receipt_processor as receipt_processor_module
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        receipt = tmp_path / "paragon.jpg"
+        receipt.write_bytes(b"\xff\xd8\xff" + b"0" * 100)
+        with env(DATA_DIR=str(tmp_path / "dane")):
+            processor = ReceiptProcessor(Config())
+        await processor.client.aclose()
+        processor.client = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={'text': text, 'validation': {'can_process': True}})
+        ))
+        assert processor.store is not None
+        parsed = []
+        
+        class CountingParser(ReceiptParser):
+            def parse(self, text):
+                parsed.append(text)
+                return super().parse(text)
+        
+        processor.parser = CountingParser(processor.config)
+        
+        first = await processor.process_file(receipt)
+        second = await processor.process_file(receipt)
+        if len(parsed) != 1 or not second.get('cached') or second.get('receipt') != first.get('receipt'):
+            print(f"❌ Trafienie w cache parsuje tekst ponownie ({len(parsed)} parsowań)")
+            return False
+        
+        # Duplikat percepcyjny - ten sam tekst, z założenia bez rekordu paragonu
+        processor.store.add_receipt_result({
+            'success': True, 'file': str(tmp_path / "kopia.jpg"), 'file_hash': 'kopia',
+            'text': text, 'duplicate_of': str(receipt)
+        })
+        
+        # Zmiana PARSER_VERSION - zapisane rekordy parsowane ponownie partiami
+        original_version = receipt_processor_module.PARSER_VERSION
+        receipt_processor_module.PARSER_VERSION = original_version + 1
+        try:
+            reparsed = await processor.reparse_stored_receipts()
+        finally:
+            receipt_processor_module.PARSER_VERSION = original_version
+        stored = {Path(r['file']).name: r for r in processor.store.receipt_results(latest_only=True)}
+        months = processor.store.rollups()['month']
+        await processor.close()
+        if (reparsed != 1 or stored['paragon.jpg']['receipt'] != first['receipt']
+                or stored['kopia.jpg'].get('receipt') is not None or months != [('2024-03', 15.96, 1)]):
+            print(f"❌ Niepoprawne ponowne parsowanie zapisanych paragonów: {reparsed}, {months}")
+            return False
+    
+    print(f"✅ Parser: {record['shop']}, {len(record['items'])} pozycji, suma {record['total']:.2f} zgodna z pozycjami")
+    return True
+
+
+async def test_spending_analytics():
+    """Test lokalnych analiz wydatków"""
+    print("📈 Test analiz wydatków...")
+    
+    def receipt(shop, date, items):
+        total = round(sum(value for _, value in items), 2)
+        return {
+            'shop': shop, 'date': date, 'total': total, 'items_total': total,
+            'items': [{'name': name, 'quantity': 1.0, 'unit_price': value, 'total': value, 'discount': 0.0}
+                      for name, value in items]
+        }
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(Path(tmp) / "results.db")
+        store.add_receipt_result({'file': 'a.jpg', 'success': True, 'text': '',
+                                  'receipt': receipt('Lidl', '2024-01-10', [('Mleko 1L', 3.5), ('Chleb', 4.5)])})
+        store.add_receipt_result({'file': 'b.jpg', 'success': True, 'text': '',
+                                  'receipt': receipt('Biedronka', '2024-02-03', [('Piwo jasne', 4.0)])})
+        store.add_receipt_result({'file': 'c.jpg', 'success': False, 'error': 'timeout'})
+        
+        analytics = SpendingAnalytics(store)
+        summary = analytics.summary()
+        if summary['receipts'] != 2 or summary['total_spent'] != 12.0:
+            print(f"❌ Niepoprawne podsumowanie: {summary['receipts']}, {summary['total_spent']}")
+            return False
+        categories = {row['category']: row['total'] for row in summary['categories']}
+        if categories != {'Nabiał': 3.5, 'Pieczywo': 4.5, 'Alkohol': 4.0}:
+            print(f"❌ Niepoprawne kategorie: {categories}")
+            return False
+        if summary['trend']['change_pct'] != -50.0:
+            print(f"❌ Niepoprawny trend: {summary['trend']}")
+            return False
+        if analytics.summary() is not summary:
+            print("❌ Podsumowanie nie jest pamiętane bez nowych danych")
+            return False
+        
+        # Przyrostowo: nowy paragon i ponownie przetworzony plik (zastępuje poprzedni wynik)
+        store.add_receipt_result({'file': 'd.jpg', 'success': True, 'text': '',
+                                  'receipt': receipt('Lidl', '2024-02-20', [('Jabłka', 6.0)])})
+        store.add_receipt_result({'file': 'a.jpg', 'success': True, 'text': '',
+                                  'receipt': receipt('Lidl', '2024-01-10', [('Mleko 1L', 3.5)])})
+        summary = analytics.summary()
+        shops = {row['shop']: (row['total'], row['receipts']) for row in summary['shops']}
+        if shops != {'Lidl': (9.5, 2), 'Biedronka': (4.0, 1)} or summary['receipts'] != 3:
+            print(f"❌ Niepoprawna aktualizacja przyrostowa: {shops}")
+            return False
+        if any(row['category'] == 'Pieczywo' for row in summary['categories']):
+            print("❌ Kategoria zastąpionego paragonu nie została odjęta")
+            return False
+        
+        store.close()
+        
+        print(f"✅ Analizy: {summary['receipts']} paragonów, {len(summary['months'])} miesiące, aktualizacja przyrostowa")
+    
+    return True
+
+
+async def test_receipt_rollups():
+    """Test agregatów wydatków utrzymywanych przez magazyn wyników"""
+    print("🧮 Test agregatów wydatków...")
+    
+    def result(file, shop, date, total, items):
+        return {'file': file, 'success': True, 'text': '', 'receipt': {
+            'shop': shop, 'date': date, 'total': total, 'items_total': total,
+            'items': [{'name': name, 'total': value, 'discount': 0.0} for name, value in items]
+        }}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "results.db"
+        store = ResultStore(db_path, batch_size=2)
+        store.add_receipt_result(result('a.jpg', 'Lidl', '2024-03-02', 10.0, [('Mleko', 4.0), ('Chleb', 6.0)]))
+        store.add_receipt_result(result('b.jpg', 'Lidl', '2024-03-05', 20.5, [('Kawa', 20.5)]))
+        first = store.rollups()
+        
+        # Ten sam wynik zapisany ponownie nie zmienia agregatów
+        store.add_receipt_result(result('a.jpg', 'Lidl', '2024-03-02', 10.0, [('Mleko', 4.0), ('Chleb', 6.0)]))
+        if store.rollups() != first:
+            print("❌ Ponowny zapis tego samego paragonu zmienił agregaty")
+            return False
+        
+        # Paragon dodany z opóźnieniem trafia do miesiąca z daty na paragonie
+        store.add_receipt_result(result('c.jpg', 'Żabka', '2024-01-15', 7.0, [('Woda', 7.0)]))
+        # Poprawiony wynik pliku zastępuje poprzedni wkład
+        store.add_receipt_result(result('b.jpg', 'Lidl', '2024-03-05', 15.0, [('Kawa', 15.0)]))
+        rollups = store.rollups()
+        if rollups['month'] != [('2024-01', 7.0, 1), ('2024-03', 25.0, 2)]:
+            print(f"❌ Niepoprawne agregaty miesięczne: {rollups['month']}")
+            return False
+        if dict((bucket, (total, count)) for bucket, total, count in rollups['shop']) != {
+                'Lidl': (25.0, 2), 'Żabka': (7.0, 1)}:
+            print(f"❌ Niepoprawne agregaty sklepów: {rollups['shop']}")
+            return False
+        if ('Napoje', 22.0, 2) not in rollups['category'] or [b for b, _, _ in rollups['amount']] != ['10', '15', '7']:
+            print(f"❌ Niepoprawne agregaty kategorii lub kwot: {rollups['category']}, {rollups['amount']}")
+            return False
+        
+        # Ten sam paragon zapisany pod inną nazwą (ten sam skrót zawartości) liczony raz
+        copy = result('kopia/a.jpg', 'Lidl', '2024-03-02', 10.0, [('Mleko', 4.0), ('Chleb', 6.0)])
+        store.add_receipt_result({**result('d.jpg', 'Dino', '2024-02-01', 3.0, [('Bułka', 3.0)]), 'file_hash': 'h-d'})
+        store.add_receipt_result({**copy, 'file': 'e.jpg', 'file_hash': 'h-e'})
+        store.add_receipt_result({**copy, 'file_hash': 'h-e'})
+        rollups = store.rollups()
+        if rollups['month'] != [('2024-01', 7.0, 1), ('2024-02', 3.0, 1), ('2024-03', 35.0, 3)]:
+            print(f"❌ Duplikat paragonu policzony ponownie: {rollups['month']}")
+            return False
+        # Plik z nową zawartością odejmuje wkład poprzedniej
+        store.add_receipt_result({**result('d.jpg', 'Dino', '2024-02-01', 4.0, [('Bułka', 4.0)]), 'file_hash': 'h-d2'})
+        rollups = store.rollups()
+        if ('2024-02', 4.0, 1) not in rollups['month']:
+            print(f"❌ Zmieniona zawartość pliku policzona podwójnie: {rollups['month']}")
+            return False
+        store.close()
+        
+        # Agregaty przeliczone od zera są takie same jak utrzymywane przyrostowo
+        reopened = ResultStore(db_path)
+        reopened.rebuild_rollups()
+        if reopened.rollups() != rollups:
+            print("❌ Przeliczone agregaty różnią się od przyrostowych")
+            return False
+        reopened.close()
+        
+        print(f"✅ Agregaty: {len(rollups['month'])} miesiące, {len(rollups['shop'])} sklepy, zapis idempotentny")
+    
+    return True
+
+
+async def test_rag_incremental_sync():
+    """Test przyrostowej synchronizacji bazy wiedzy"""
+    print("📚 Test synchronizacji RAG z manifestem...")
+    
+    import json
+    import time
+    import httpx
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        wiedza = Path(tmp) / "wiedza"
+        (wiedza / "sklepy").mkdir(parents=True)
+        for name, text in [('ceny.md', 'Mleko 3,49'), ('sklepy/lidl.txt', 'Lidl'), ('promocje.txt', 'Masło -20%')]:
+            (wiedza / name).write_text(text, encoding='utf-8')
+        
+        requests = []
+        sources = {}
+        delete_status = {'code': 200}
+        
+        def handler(request):
+            requests.append((request.method, request.url.params.get('source_id') or request.url.path))
+            if request.method == 'DELETE':
+                return httpx.Response(delete_status['code'], json={})
+            documents = json.loads(request.content)['documents']
+            for d in documents:
+                sources[Path(d['metadata']['filename']).name] = d['source_id']
+            return httpx.Response(200, json={'results': [
+                {'success': True, 'processed_chunks': 1, 'source_id': d['source_id']} for d in documents
+            ]})
+        
+        def manager() -> RAGManager:
+            with env(DATA_DIR=str(Path(tmp) / "data"), RESULT_STORE_ENABLED='false'):
+                rag = RAGManager(Config())
+            rag.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            return rag
+        
+        rag = manager()
+        first = await rag.add_directory(wiedza)
+        # Małe dokumenty w jednym wspólnym żądaniu
+        if first['successful'] != 3 or len(requests) != 1:
+            print(f"❌ Niepoprawna pierwsza synchronizacja: {first}")
+            return False
+        
+        # Bez zmian, także po zmianie samego mtime
+        requests.clear()
+        os.utime(wiedza / 'ceny.md', (time.time() + 60, time.time() + 60))
+        again = await rag.add_directory(wiedza)
+        if requests or again['unchanged'] != 3:
+            print(f"❌ Niezmienione dokumenty wysłane ponownie: {requests}")
+            return False
+        
+        # Zmieniona treść - wysyłana pod tym samym id (fragmenty nadpisują poprzednią wersję);
+        # usunięty plik znika z bazy
+        (wiedza / 'promocje.txt').write_text('Masło -30%', encoding='utf-8')
+        (wiedza / 'sklepy' / 'lidl.txt').unlink()
+        await rag.close()
+        rag = manager()
+        synced = await rag.add_directory(wiedza)
+        promocje, lidl = str(wiedza / 'promocje.txt'), str(wiedza / 'sklepy' / 'lidl.txt')
+        expected = [('POST', '/api/v2/rag/add_batch'), ('DELETE', lidl)]
+        if (requests != expected or sources['promocje.txt'] != promocje
+                or (synced['successful'], synced['unchanged'], synced['removed']) != (1, 1, 1)):
+            print(f"❌ Niepoprawna synchronizacja zmian: {requests}, {synced}")
+            return False
+        
+        # Backend bez DELETE (405) - zapamiętane, kolejne usunięcia bez żądań
+        requests.clear()
+        delete_status['code'] = 405
+        (wiedza / 'ceny.md').unlink()
+        (wiedza / 'promocje.txt').unlink()
+        unsupported = await rag.add_directory(wiedza)
+        await rag.close()
+        if len(requests) != 1 or requests[0][0] != 'DELETE' or unsupported['removed'] != 0:
+            print(f"❌ Brak DELETE nie został zapamiętany: {requests}, {unsupported}")
+            return False
+        
+        print("✅ Wysyłane tylko nowe i zmienione dokumenty, usunięte pliki usuwane z bazy")
+    
+    return True
+
+
+async def test_rag_concurrent_ingestion():
+    """Test współbieżnego dodawania dokumentów do bazy wiedzy"""
+    print("📥 Test współbieżnego dodawania dokumentów RAG...")
+    
+    import json
+    import httpx
+    from console_app.file_scanner import DOCUMENT_EXTENSIONS
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        wiedza = Path(tmp) / "wiedza"
+        wiedza.mkdir()
+        for i in range(6):
+            (wiedza / f"notatka_{i}.md").write_text(f"Notatka {i}", encoding='utf-8')
+        _write_text_pdf(wiedza / "cennik.pdf", ["Cennik mleka 3,49 PLN"])
+        
+        active = {'now': 0, 'max': 0}
+        contents = {}
+        
+        async def handler(request):
+            documents = json.loads(request.content)['documents']
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+            # Pierwsze dokumenty odpowiadają najwolniej - raport musi zachować kolejność
+            await asyncio.sleep(0.05 if not contents else 0.01)
+            for document in documents:
+                contents[document['source_id']] = " ".join(chunk['content'] for chunk in document['chunks'])
+            active['now'] -= 1
+            return httpx.Response(200, json={'results': [{'processed_chunks': 1} for _ in documents]})
+        
+        # Po 2 fragmenty w żądaniu - kilka wspólnych żądań wysyłanych równolegle
+        settings = {'DATA_DIR': str(Path(tmp) / "data"), 'RESULT_STORE_ENABLED': 'false',
+                    'RAG_INCREMENTAL_SYNC': 'false', 'ADAPTIVE_CONCURRENCY': 'false',
+                    'RAG_CHUNKS_PER_REQUEST': '2'}
+        with env(**settings):
+            rag = RAGManager(Config())
+        await rag.client.aclose()
+        rag.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        result = await rag.add_directory(wiedza)
+        await rag.close()
+        
+        scanned = [str(entry.path) for entry in scan_directory(wiedza, DOCUMENT_EXTENSIONS)]
+        if [r['file'] for r in result['results']] != scanned or result['successful'] != 7:
+            print(f"❌ Wyniki poza kolejnością skanowania: {result}")
+            return False
+        if 'Cennik mleka' not in contents.get(str(wiedza / "cennik.pdf"), ''):
+            print("❌ Nie odczytano warstwy tekstowej PDF")
+            return False
+        if active['max'] < 2:
+            print("❌ Dokumenty nie były wysyłane równolegle")
+            return False
+        
+        print(f"✅ 7 dokumentów (w tym PDF), maks. {active['max']} wysyłek naraz, wyniki w kolejności")
+    
+    return True
+
+
+async def test_text_chunker():
+    """Test strumieniowego podziału dokumentów na fragmenty i ich wysyłki partiami"""
+    print("✂️  Test podziału dokumentów na fragmenty...")
+    
+    import json
+    import httpx
+    from console_app.text_chunker import chunk_text
+    
+    sentences = [f"Zdanie numer {i} opisuje ceny {'mleka' if i % 2 else 'chleba'} w sklepie." for i in range(60)]
+    text = " ".join(sentences)
+    chunks = list(chunk_text([text], 200, 40))
+    # Ten sam wynik niezależnie od wielkości bloków odczytu
+    if list(chunk_text([text[i:i + 7] for i in range(0, len(text), 7)], 200, 40)) != chunks:
+        print("❌ Fragmenty zależą od podziału wejścia na bloki")
+        return False
+    if any(len(chunk) > 200 or not chunk.endswith('.') for chunk in chunks):
+        print(f"❌ Fragment za długi lub przecięty w środku zdania: {chunks}")
+        return False
+    if not all(chunks[i + 1].split('.')[0] + '.' in chunks[i] for i in range(len(chunks) - 1)):
+        print("❌ Brak zakładki między kolejnymi fragmentami")
+        return False
+    if not chunks[-1].endswith(sentences[-1]) or list(chunk_text(['  '], 200, 40)):
+        print("❌ Niepoprawna końcówka tekstu")
+        return False
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        document = Path(tmp) / "instrukcja.md"
+        document.write_text(text, encoding='utf-8')
+        requests = []
+        
+        def handler(request):
+            data = json.loads(request.content)
+            requests.append(data['chunks'])
+            return httpx.Response(200, json={'processed_chunks': len(data['chunks']), 'source_id': data['source_id']})
+        
+        settings = {'DATA_DIR': str(Path(tmp) / "data"), 'RESULT_STORE_ENABLED': 'false',
+                    'RAG_CHUNK_SIZE': '200', 'RAG_OVERLAP': '40', 'RAG_CHUNKS_PER_REQUEST': '4'}
+        with env(**settings):
+            rag = RAGManager(Config())
+        await rag.client.aclose()
+        rag.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        result = await rag.add_document(document)
+        first_ids = [chunk['id'] for batch in requests for chunk in batch]
+        requests.clear()
+        await rag.add_document(document)
+        await rag.close()
+        
+        sent = [chunk['content'] for batch in requests for chunk in batch]
+        if sent != chunks or result['processed_chunks'] != len(chunks) or max(len(b) for b in requests) != 4:
+            print(f"❌ Niepoprawna wysyłka fragmentów: {result}")
+            return False
+        if [chunk['id'] for batch in requests for chunk in batch] != first_ids or first_ids[1] != f"{document}#1":
+            print("❌ Identyfikatory fragmentów nie są stabilne")
+            return False
+        
+        # Starszy backend czyta tylko `content` - cały dokument w jednym żądaniu
+        legacy = []
+        
+        def legacy_handler(request):
+            data = json.loads(request.content)
+            legacy.append(sorted(data))
+            if 'content' not in data:
+                return httpx.Response(422, json={'detail': 'content: field required'})
+            return httpx.Response(200, json={'processed_chunks': 3})
+        
+        with env(**settings):
+            rag = RAGManager(Config())
+        await rag.client.aclose()
+        rag.client = httpx.AsyncClient(transport=httpx.MockTransport(legacy_handler))
+        old_first = await rag.add_document(document)
+        old_second = await rag.add_document(document)
+        await rag.close()
+        content_only = ['content', 'metadata', 'source_id']
+        if (not (old_first['success'] and old_second['success'])
+                or legacy != [['chunks', 'metadata', 'source_id'], content_only, content_only]):
+            print(f"❌ Brak powrotu do pola `content` dla starszego backendu: {legacy}")
+            return False
+        
+        print(f"✅ {len(chunks)} fragmentów ≤ 200 znaków na granicach zdań, {len(requests)} żądań po ≤ 4")
+    
+    return True
+
+
+async def test_rag_batch_add():
+    """Test pakowania wielu dokumentów do wspólnych żądań"""
+    print("📦 Test wsadowego dodawania dokumentów RAG...")
+    
+    import json
+    import httpx
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        notes = [Path(tmp) / f"notatka_{i}.md" for i in range(10)]
+        for i, note in enumerate(notes):
+            note.write_text(f"Notatka {i}. " * 5, encoding='utf-8')
+        manual = Path(tmp) / "instrukcja.txt"
+        manual.write_text("Procedura serwisowa urządzenia. " * 200, encoding='utf-8')
+        paths = notes[:4] + [Path(tmp) / "brak.md", manual] + notes[4:]
+        batches, single = [], []
+        
+        def handler(request):
+            data = json.loads(request.content)
+            if request.url.path.endswith('add_batch'):
+                batches.append([d['source_id'] for d in data['documents']])
+                if sum(len(json.dumps(d)) for d in data['documents']) > 2048 + 1024:
+                    return httpx.Response(413, text="za duże żądanie")
+                return httpx.Response(200, json={'results': [
+                    {'success': False, 'error': 'odrzucony'} if d['source_id'].endswith('notatka_7.md')
+                    else {'success': True, 'processed_chunks': len(d['chunks'])}
+                    for d in data['documents']
+                ]})
+            single.append(len(data['chunks']))
+            return httpx.Response(200, json={'processed_chunks': len(data['chunks'])})
+        
+        settings = {'DATA_DIR': str(Path(tmp) / "data"), 'RESULT_STORE_ENABLED': 'false',
+                    'RAG_CHUNKS_PER_REQUEST': '4', 'RAG_REQUEST_MAX_KB': '2'}
+        with env(**settings):
+            rag = RAGManager(Config())
+        await rag.client.aclose()
+        rag.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        results = await rag.add_documents(paths)
+        await rag.close()
+        
+        if [r['file'] for r in results] != [str(p) for p in paths]:
+            print("❌ Wyniki nie odpowiadają kolejności dokumentów")
+            return False
+        failed = {Path(r['file']).name: r['error'] for r in results if not r['success']}
+        if set(failed) != {'brak.md', 'notatka_7.md'} or failed['notatka_7.md'] != 'odrzucony':
+            print(f"❌ Niepoprawne wyniki poszczególnych dokumentów: {failed}")
+            return False
+        if any(len(batch) > 4 for batch in batches) or sum(len(batch) for batch in batches) != 10:
+            print(f"❌ Przekroczony limit fragmentów w żądaniu: {batches}")
+            return False
+        if len(batches) >= 10 or sum(single) < 5 or max(single) > 4:
+            print(f"❌ Duży dokument nie został wysłany osobno partiami: {single}")
+            return False
+        
+        # Wyjątek podczas wysyłki partii - każdy dokument dostaje wynik z błędem zamiast zawieszenia
+        class BrokenBatchManager(RAGManager):
+            async def _send_batch(self, prepared):
+                raise ValueError("uszkodzona odpowiedź")
+        
+        with env(**settings):
+            rag = BrokenBatchManager(Config())
+        broken = await asyncio.wait_for(rag.add_documents(notes), timeout=5)
+        await rag.close()
+        if [r['error'] for r in broken] != ["uszkodzona odpowiedź"] * len(notes):
+            print(f"❌ Błąd partii nie został przekazany dokumentom: {broken}")
+            return False
+        
+        # Backend bez /rag/add_batch - zapamiętane, każdy dokument osobno na /rag/add
+        routes = []
+        
+        def legacy_handler(request):
+            routes.append(request.url.path)
+            if request.url.path.endswith('add_batch'):
+                return httpx.Response(404, text="Not Found")
+            data = json.loads(request.content)
+            return httpx.Response(200, json={'processed_chunks': len(data['chunks'])})
+        
+        with env(**settings):
+            rag = RAGManager(Config())
+        await rag.client.aclose()
+        rag.client = httpx.AsyncClient(transport=httpx.MockTransport(legacy_handler))
+        fallback = await rag.add_documents(notes)
+        routes.clear()
+        again = await rag.add_documents(notes)
+        await rag.close()
+        if not all(r['success'] for r in fallback + again):
+            print(f"❌ Brak powrotu do pojedynczych żądań: {fallback}")
+            return False
+        if routes != ['/api/v2/rag/add'] * len(notes):
+            print(f"❌ Nie każdy dokument wysłany osobno: {routes}")
+            return False
+        
+        print(f"✅ 10 notatek w {len(batches)} żądaniach, duży dokument w {len(single)}, wynik dla każdego pliku")
+    
+    return True
+
+
+async def test_pdf_streaming_extraction():
+    """Test strumieniowego odczytu PDF strona po stronie"""
+    print("📖 Test odczytu PDF strona po stronie...")
+    
+    import json
+    import httpx
+    from console_app.pdf_processing import iter_pdf_text
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manual = Path(tmp) / "instrukcja.pdf"
+        _write_text_pdf(manual, ["Instrukcja obslugi kasy fiskalnej."], pages=40)
+        
+        progress = []
+        pages = iter_pdf_text(
+            str(manual), pages_per_task=16, progress=lambda done, total: progress.append((done, total))
+        )
+        first = next(pages)
+        # Generator oddaje pierwszą stronę, zanim odczyta resztę dokumentu
+        if not first.startswith("Strona 1\n") or progress[-1] != (1, 40):
+            print(f"❌ Niepoprawna pierwsza strona: {first!r}, postęp {progress}")
+            return False
+        rest = list(pages)
+        if len(rest) != 39 or not rest[-1].startswith("Strona 40") or progress[-1] != (40, 40):
+            print(f"❌ Niepoprawne kolejne strony: {len(rest)}, postęp {progress[-1]}")
+            return False
+        
+        sent = []
+        
+        def handler(request):
+            data = json.loads(request.content)
+            sent.extend(chunk['content'] for chunk in data['chunks'])
+            return httpx.Response(200, json={'processed_chunks': len(data['chunks'])})
+        
+        settings = {'DATA_DIR': str(Path(tmp) / "data"), 'RESULT_STORE_ENABLED': 'false',
+                    'RAG_CHUNK_SIZE': '200', 'RAG_OVERLAP': '0', 'RAG_CHUNKS_PER_REQUEST': '3'}
+        with env(**settings):
+            rag = RAGManager(Config())
+        await rag.client.aclose()
+        rag.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        pages_read = []
+        result = await rag.add_document(manual, progress=lambda done, total: pages_read.append(done))
+        await rag.close()
+        
+        text = " ".join(sent)
+        if not result['success'] or pages_read != list(range(1, 41)) or "Strona 40" not in text:
+            print(f"❌ Dokument nie został wysłany strona po stronie: {result}")
+            return False
+        if text.index("Strona 2") > text.index("Strona 3") or any(len(chunk) > 200 for chunk in sent):
+            print("❌ Niepoprawna kolejność lub długość fragmentów")
+            return False
+        
+        print(f"✅ 40 stron odczytanych zakresami w puli procesów, {len(sent)} fragmentów, postęp co stronę")
+    
+    return True
+
+
+def _draw_receipt(path: Path, seed: int, photographed: bool = False):
+    """Syntetyczny paragon (wiersze tekstu jako paski); `photographed` - zdjęcie na tle stołu"""
+    import random
+    from PIL import Image, ImageDraw, ImageFilter
+    
+    rng = random.Random(seed)
+    image = Image.new('L', (600, 1600), 245)
+    draw = ImageDraw.Draw(image)
+    y = 40
+    while y < 1500:
+        draw.rectangle([40, y, 40 + rng.randint(100, 520), y + 14], fill=30)
+        if rng.random() < 0.6:
+            draw.rectangle([480, y, 560, y + 14], fill=30)
+        y += rng.randint(22, 40)
+    if photographed:
+        table = Image.new('L', (800, 1900), 90)
+        table.paste(image.rotate(0.7, fillcolor=245), (90, 120))
+        image = table.resize((1200, 2850)).filter(ImageFilter.GaussianBlur(1.5))
+    image.save(path, 'JPEG', quality=70)
+
+
+async def test_duplicate_detection():
+    """Test pomijania powtórnych zdjęć paragonu"""
+    print("🔗 Test wykrywania duplikatów zdjęć...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        originals = [tmp_path / f"paragon_{i}.jpg" for i in range(3)]
+        for seed, path in enumerate(originals):
+            _draw_receipt(path, seed)
+        copy = tmp_path / "paragon_0_drugie_zdjecie.jpg"
+        _draw_receipt(copy, 0, photographed=True)
+        
+        hashes = [difference_hash(str(path)) for path in originals]
+        copy_distance = (difference_hash(str(copy)) ^ hashes[0]).bit_count()
+        other_distance = min((a ^ b).bit_count() for i, a in enumerate(hashes) for b in hashes[i + 1:])
+        if not copy_distance < 32 < other_distance:
+            print(f"❌ Hash nie odróżnia kopii ({copy_distance}) od innych paragonów ({other_distance})")
+            return False
+        
+        index = HashIndex(32, capacity=2)
+        for i, value in enumerate(hashes):
+            index.add(value, i)
+        if [value for _, value in index.search(hashes[1] ^ 0b111, 3)] != [1]:
+            print("❌ Niepoprawne wyszukiwanie w indeksie hashy")
+            return False
+        
+        with env(DATA_DIR=str(tmp_path / "data"), DUPLICATE_DETECTION='true'):
+            processor = ReceiptProcessor(Config())
+        
+        import httpx
+        uploads = []
+        
+        def handler(request):
+            if request.url.path.endswith('validate'):
+                return httpx.Response(200, json={'can_process': True})
+            if request.url.path.endswith('process'):
+                return httpx.Response(404)
+            uploads.append(request.url.path)
+            return httpx.Response(200, json={'text': f'PARAGON {len(uploads)}', 'message': 'ok'})
+        
+        await processor.client.aclose()
+        processor.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        stats = ProcessingStats()
+        results = await processor.process_files(originals, workers=1, show_progress=False, stats=stats)
+        duplicate = await processor.process_file(copy)
+        await processor.close()
+        
+        if len(uploads) != 3 or duplicate.get('duplicate_of') != str(originals[0]):
+            print(f"❌ Duplikat przetworzony ponownie: {len(uploads)} wysyłek, {duplicate}")
+            return False
+        if duplicate['text'] != results[0]['text'] or 'receipt' in duplicate:
+            print(f"❌ Duplikat niepowiązany z wynikiem oryginału: {duplicate}")
+            return False
+        
+        # Indeks odtwarzany z magazynu wyników po ponownym uruchomieniu
+        with env(DATA_DIR=str(tmp_path / "data"), DUPLICATE_DETECTION='true'):
+            restarted = ReceiptProcessor(Config())
+        assert restarted.duplicates is not None
+        match = restarted.duplicates.find(difference_hash(str(copy)), copy)
+        await restarted.close()
+        if not match or match['file'] != str(originals[0]):
+            print(f"❌ Indeks duplikatów nie przetrwał ponownego uruchomienia: {match}")
+            return False
+        
+        print(f"✅ Kopia rozpoznana (odległość {copy_distance}, inne paragony ≥ {other_distance}) bez ponownego OCR")
+    
+    return True
+
+
 async def main():
     """Główna funkcja testowa"""
     print("🧪 Test aplikacji konsolowej Agenty")
@@ -159,7 +1801,32 @@ async def main():
         test_directories,
         test_docker_compose,
         test_dockerfile,
-        test_requirements
+        test_requirements,
+        test_pipeline,
+        test_combined_upload,
+        test_result_cache,
+        test_batch_journal,
+        test_adaptive_limiter,
+        test_retry_policy,
+        test_circuit_breaker,
+        test_streaming_upload,
+        test_image_preprocessing,
+        test_quality_check,
+        test_local_ocr_engine,
+        test_pdf_pages,
+        test_pdf_text_layer,
+        test_directory_watcher,
+        test_file_scanner,
+        test_result_store,
+        test_receipt_parser,
+        test_spending_analytics,
+        test_receipt_rollups,
+        test_duplicate_detection,
+        test_rag_incremental_sync,
+        test_rag_concurrent_ingestion,
+        test_text_chunker,
+        test_rag_batch_add,
+        test_pdf_streaming_extraction
     ]
     
     results = []
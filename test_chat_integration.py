@@ -20,6 +20,13 @@ class MockConfig:
         self.BACKEND_URL = "http://localhost:8000"
         self.PARAGONY_DIR = "PARAGONY"
         self.WIEDZA_RAG_DIR = "WIEDZA_RAG"
+        self.HTTP_RETRIES = 3
+        self.HTTP_RETRY_BASE_DELAY = 0.5
+        self.HTTP_RETRY_MAX_DELAY = 30.0
+        self.HTTP_RETRY_BUDGET_RATIO = 0.2
+        self.CIRCUIT_FAILURE_THRESHOLD = 5
+        self.CIRCUIT_RESET_TIMEOUT = 15.0
+        self.CIRCUIT_PARK_TIMEOUT = 600.0
 
 console = Console()
 